@@ -0,0 +1,94 @@
+"""Compare the regex scraping of exiftool console output with JSON decoding.
+
+Usage:
+
+    python -m benchmarks.exiftool_parsing [--outputs 100000] [--extra-tags 0]
+
+--extra-tags adds unrelated tags before the dates, to simulate verbose outputs.
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Callable, List
+
+from gpy.exiftool.client import parse_datetime
+from gpy.exiftool.tags import decode_json_output
+
+
+def build_console_output(rng: random.Random, extra_tags: int) -> str:
+    seconds = rng.randrange(60)
+    extra = "".join(f"{f'Tag {i}':<32}: {i}\n" for i in range(extra_tags))
+    return (
+        f"{extra}"
+        f"Date/Time Original              : 2019:02:02 18:44:{seconds:02}\n"
+        f"Create Date                     : 2019:02:02 18:44:{seconds:02}\n"
+        f"Modify Date                     : 2019:02:02 18:44:{seconds:02}\n"
+        f"Create Date                     : 2019:02:02 18:44:{seconds:02}.001+01:00\n"
+    )
+
+
+def build_json_output(rng: random.Random, extra_tags: int) -> str:
+    seconds = rng.randrange(60)
+    extra = {f"IFD0:Tag{i}": i for i in range(extra_tags)}
+    return json.dumps(
+        [
+            {
+                "SourceFile": "IMG_20190202_184442_353.jpg",
+                **extra,
+                "ExifIFD:DateTimeOriginal": f"2019:02:02 18:44:{seconds:02}",
+                "ExifIFD:CreateDate": f"2019:02:02 18:44:{seconds:02}",
+                "IFD0:ModifyDate": f"2019:02:02 18:44:{seconds:02}",
+                "XMP-xmp:CreateDate": f"2019:02:02 18:44:{seconds:02}.001+01:00",
+            }
+        ]
+    )
+
+
+def parse_console(output: str) -> None:
+    parse_datetime(output)
+
+
+def parse_json(output: str) -> None:
+    for file_tags in decode_json_output(output):
+        file_tags.metadata_date
+        file_tags.google_date
+
+
+def measure(name: str, parse: Callable[[str], None], outputs: List[str]) -> float:
+    start = time.perf_counter()
+    for output in outputs:
+        parse(output)
+    elapsed = time.perf_counter() - start
+
+    per_output = elapsed / len(outputs) * 1_000_000
+    print(f"{name:<8} {elapsed:8.3f}s total {per_output:8.2f}us/output")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--outputs", type=int, default=100_000)
+    parser.add_argument("--extra-tags", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    console_outputs = [
+        build_console_output(rng, args.extra_tags) for _ in range(args.outputs)
+    ]
+    json_outputs = [
+        build_json_output(rng, args.extra_tags) for _ in range(args.outputs)
+    ]
+
+    print(
+        f"Parsing {args.outputs} canned exiftool outputs "
+        f"with {args.extra_tags} extra tags"
+    )
+    regex = measure("regex", parse_console, console_outputs)
+    structured = measure("json", parse_json, json_outputs)
+    print(f"json/regex: {structured / regex:.2f}")
+
+
+if __name__ == "__main__":
+    main()
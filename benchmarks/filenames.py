@@ -0,0 +1,124 @@
+"""Compare the single-pass file name parser with sequential ones.
+
+Usage:
+
+    python -m benchmarks.filenames [--names 1000000] [--unknown 0.2]
+
+"former" is the parser that only knew 4 schemes and tried them one after the
+other, while "per-scheme" tries every registered scheme one after the other.
+--unknown is the share of file names that follow no known scheme, which is the
+worst case for sequential parsers.
+"""
+
+import argparse
+import datetime
+import random
+import re
+import time
+from typing import Callable, List, Optional, Sequence
+
+from gpy.filenames import SCHEMES, parse_many
+
+# Patterns of the parser that tried one scheme after the other
+SEQUENTIAL_PATTERNS = (
+    r"IMG_([0-9]{4})([0-9]{2})([0-9]{2})_([0-9]{2})([0-9]{2})([0-9]{2})_[0-9]{3}.jpg",
+    r"VID_([0-9]{4})([0-9]{2})([0-9]{2})_([0-9]{2})([0-9]{2})([0-9]{2})_[0-9]{3}.mp4",
+    r"IMG-([0-9]{4})([0-9]{2})([0-9]{2})-WA[0-9]{4}.jpeg",
+    r"VID-([0-9]{4})([0-9]{2})([0-9]{2})-WA[0-9]{4}.mp4",
+)
+
+
+def to_datetime(
+    groups: Sequence[str], tzinfo: Optional[datetime.tzinfo]
+) -> datetime.datetime:
+    values = [int(group) for group in groups]
+    values += [0] * (6 - len(values))  # date-only schemes
+    year, month, day, hour, minute, second = values
+    return datetime.datetime(year, month, day, hour, minute, second, tzinfo=tzinfo)
+
+
+def parse_former(file_name: str) -> Optional[datetime.datetime]:
+    for pattern in SEQUENTIAL_PATTERNS:
+        matches = re.match(pattern, file_name)
+        if matches:
+            return to_datetime(matches.groups(), tzinfo=None)
+
+    return None
+
+
+PER_SCHEME_REGEXES = [
+    (re.compile(scheme.to_regex()), scheme.tzinfo)
+    for scheme in SCHEMES
+    if scheme.fields
+]
+
+
+def parse_per_scheme(file_name: str) -> Optional[datetime.datetime]:
+    for regex, tzinfo in PER_SCHEME_REGEXES:
+        matches = regex.match(file_name)
+        if matches:
+            try:
+                return to_datetime(matches.groups()[1:], tzinfo=tzinfo)
+            except ValueError:
+                return None
+
+    return None
+
+
+def build_name(rng: random.Random, unknown: float) -> str:
+    if rng.random() < unknown:
+        return f"holidays_{rng.randrange(10_000):04}.jpg"
+
+    ts = datetime.datetime(2015, 1, 1) + datetime.timedelta(
+        seconds=rng.randrange(10 * 365 * 24 * 3600)
+    )
+    counter = rng.randrange(1000)
+    templates = (
+        f"IMG_{ts:%Y%m%d_%H%M%S}_{counter:03}.jpg",
+        f"VID_{ts:%Y%m%d_%H%M%S}_{counter:03}.mp4",
+        f"IMG-{ts:%Y%m%d}-WA{counter:04}.jpeg",
+        f"VID-{ts:%Y%m%d}-WA{counter:04}.mp4",
+        f"PXL_{ts:%Y%m%d_%H%M%S}{counter:03}.jpg",
+        f"{ts:%Y%m%d_%H%M%S}.jpg",
+        f"Screenshot_{ts:%Y%m%d-%H%M%S}.png",
+        f"WhatsApp Image {ts:%Y-%m-%d at %H.%M.%S}.jpeg",
+        f"DSC_{counter:04}.JPG",
+    )
+    return rng.choice(templates)
+
+
+def measure(
+    name: str,
+    parse: Callable[[List[str]], List[Optional[datetime.datetime]]],
+    names: List[str],
+) -> float:
+    start = time.perf_counter()
+    parse(names)
+    elapsed = time.perf_counter() - start
+
+    per_name = elapsed / len(names) * 1_000_000_000
+    print(f"{name:<12} {elapsed:8.3f}s total {per_name:8.0f}ns/name")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--unknown", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [build_name(rng, args.unknown) for _ in range(args.names)]
+
+    print(f"Parsing {args.names} synthetic file names, {args.unknown:.0%} unknown")
+    former = measure("former", lambda names: [parse_former(n) for n in names], names)
+    per_scheme = measure(
+        "per-scheme", lambda names: [parse_per_scheme(n) for n in names], names
+    )
+    single_pass = measure("single-pass", parse_many, names)
+    print(f"single-pass/former: {single_pass / former:.2f}")
+    print(f"single-pass/per-scheme: {single_pass / per_scheme:.2f}")
+
+
+if __name__ == "__main__":
+    main()
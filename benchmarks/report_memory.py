@@ -0,0 +1,90 @@
+"""Compare the memory taken by scan reports held in memory.
+
+Usage:
+
+    python -m benchmarks.report_memory [--reports 1000000] [--files-per-dir 500]
+
+"dict" reports are the Report instances with a __dict__ that gpy used to
+create, "slotted" ones are today's Report instances, and "table" is a
+ReportTable, which stores the same data column by column.
+"""
+
+import argparse
+import datetime
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import attr
+
+from gpy.columnar import ReportTable
+from gpy.types import GpsCoordinates, Report
+
+CET = datetime.timezone(datetime.timedelta(hours=1))
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class DictReport:
+    path: Path
+    filename_date: Optional[datetime.datetime] = None
+    metadata_date: Optional[datetime.datetime] = None
+    google_date: Optional[datetime.datetime] = None
+    gps: Optional[GpsCoordinates] = None
+
+
+def build_reports(count: int, files_per_dir: int) -> Iterator[Report]:
+    start = datetime.datetime(2015, 1, 1)
+    for i in range(count):
+        ts = start + datetime.timedelta(seconds=97 * i)
+        yield Report(
+            path=Path(f"/photos/{i // files_per_dir:05}/IMG_{ts:%Y%m%d_%H%M%S}.jpg"),
+            filename_date=ts,
+            metadata_date=ts + datetime.timedelta(seconds=1),
+            google_date=ts.replace(tzinfo=CET) if i % 2 else None,
+        )
+
+
+def measure(name: str, build: Callable[[], object], count: int) -> int:
+    tracemalloc.start()
+    held = build()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+
+    mib = 1024 * 1024
+    print(
+        f"{name:<8} {size / mib:8.1f} MiB held {peak / mib:8.1f} MiB peak "
+        f"{size / count:6.0f} B/report"
+    )
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--files-per-dir", type=int, default=500)
+    args = parser.parse_args()
+
+    def reports() -> Iterator[Report]:
+        return build_reports(args.reports, args.files_per_dir)
+
+    print(f"Holding {args.reports} reports in memory")
+    dict_size = measure(
+        "dict",
+        lambda: [DictReport(**attr.asdict(r, recurse=False)) for r in reports()],
+        args.reports,
+    )
+    slotted_size = measure("slotted", lambda: list(reports()), args.reports)
+
+    def build_table() -> ReportTable:
+        table = ReportTable()
+        table.extend(reports())
+        return table
+
+    table_size = measure("table", build_table, args.reports)
+    print(f"slotted/dict: {slotted_size / dict_size:.2f}")
+    print(f"table/dict: {table_size / dict_size:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare how long it takes to load reports in each format.
+
+Usage:
+
+    python -m benchmarks.reports [--reports 1000000] [--files-per-dir 500]
+
+Columnar reports can be loaded straight into columns, turned into the
+FileReport instances uploaded by `gpy upload_report`, or turned into Report
+instances like the JSON formats.
+"""
+
+import argparse
+import datetime
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+from gpy.cli.upload_report import read_file_reports
+from gpy.columnar import read_table
+from gpy.filesystem import read_reports, write_reports
+from gpy.types import Report
+
+CET = datetime.timezone(datetime.timedelta(hours=1))
+
+
+def build_reports(count: int, files_per_dir: int) -> Iterator[Report]:
+    start = datetime.datetime(2015, 1, 1)
+    for i in range(count):
+        ts = start + datetime.timedelta(seconds=97 * i)
+        yield Report(
+            path=Path(f"/photos/{i // files_per_dir:05}/IMG_{ts:%Y%m%d_%H%M%S}.jpg"),
+            filename_date=ts,
+            metadata_date=ts,
+            google_date=ts.replace(tzinfo=CET) if i % 2 else None,
+        )
+
+
+def measure(name: str, load: Callable[[], object], path: Path) -> None:
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+
+    size = path.stat().st_size / 1024 / 1024
+    print(f"{name:<26} {elapsed:8.3f}s {size:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--files-per-dir", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"Loading {args.reports} reports")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("report.json", "report.jsonl", "report.jsonl.gz", "report.gpyr"):
+            path = Path(tmp_dir) / name
+            write_reports(path, build_reports(args.reports, args.files_per_dir))
+            measure(f"{name} (reports)", lambda: list(read_reports(path)), path)
+
+        measure("report.gpyr (columns)", lambda: read_table(path), path)
+        measure(
+            "report.gpyr (file reports)", lambda: list(read_file_reports(path)), path
+        )
+
+
+if __name__ == "__main__":
+    main()
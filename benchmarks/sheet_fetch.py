@@ -0,0 +1,140 @@
+"""Compare fetching a tracker spreadsheet in full with fetching its index.
+
+Usage:
+
+    python -m benchmarks.sheet_fetch [--rows 500000] [--page-rows 10000]
+
+The spreadsheet is a local stand-in which returns new lists of the requested
+cells on every call, like decoding the response of the Sheets API would, and
+counts the characters it returns: most of the time of a real fetch is spent
+transferring them. "full" fetches every row with get_all_records() and builds a GSheetRow per
+row, which is what merging used to need. "index" fetches the ID and hashed
+columns in pages with fetch_sheet_index().
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, TypeVar
+
+from gspread.utils import a1_to_rowcol
+
+from gpy.google_sheet import (
+    FileReport,
+    SheetIndex,
+    fetch_sheet_index,
+    fetch_worksheet,
+    merge_changes,
+)
+
+T = TypeVar("T")
+
+HEADER = (
+    "ID",
+    "Last filename",
+    "Last dir",
+    "Filename and metadata dates do match",
+    "has GPhotos timestamp",
+    "uploaded",
+    "albumId",
+    "albumName",
+)
+
+
+class SyntheticWorksheet:
+    def __init__(self, rows: int) -> None:
+        self.grid = [self._row(i) for i in range(rows)]
+        self.chars_sent = 0
+
+    @property
+    def row_count(self) -> int:
+        return len(self.grid) + 1  # and the header
+
+    @staticmethod
+    def _row(i: int) -> List[str]:
+        directory = f"/photos/{i // 500:05}"
+        name = f"IMG_{i:08}.jpg"
+        flags = ["TRUE" if (i >> bit) & 1 else "FALSE" for bit in range(3)]
+        return [f"{directory}/{name}", name, directory, *flags, "", ""]
+
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        self.chars_sent += sum(len(cell) for row in self.grid for cell in row)
+        return [dict(zip(HEADER, row)) for row in self.grid]
+
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        value_ranges = []
+        for cells in ranges:
+            start, end = cells.split(":")
+            first_row, first_col = a1_to_rowcol(start)
+            last_row, last_col = a1_to_rowcol(end)
+            # Rows start below the header, which the grid leaves out
+            grid_rows = slice(first_row - 2, last_row - 1)
+            columns = slice(first_col - 1, last_col)
+            rows = [row[columns] for row in self.grid[grid_rows]]
+            self.chars_sent += sum(len(cell) for row in rows for cell in row)
+            value_ranges.append(rows)
+        return value_ranges
+
+
+class SyntheticSpreadsheet:
+    def __init__(self, rows: int) -> None:
+        self.sheet1 = SyntheticWorksheet(rows)
+
+
+def measure(name: str, sh: "SyntheticSpreadsheet", fetch: Callable[[], T]) -> T:
+    sh.sheet1.chars_sent = 0
+    start = time.perf_counter()
+    fetch()
+    elapsed = time.perf_counter() - start
+    chars_sent = sh.sheet1.chars_sent
+
+    # Memory is measured apart, as tracing allocations slows the fetch down
+    tracemalloc.start()
+    held = fetch()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mib = 1024 * 1024
+    print(
+        f"{name:<6} {elapsed:6.2f} s {chars_sent / mib:8.1f} M chars sent "
+        f"{size / mib:8.1f} MiB held {peak / mib:8.1f} MiB peak"
+    )
+    return held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--page-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    sh = SyntheticSpreadsheet(args.rows)
+    spreadsheet: Any = sh
+
+    print(f"Fetching a sheet of {args.rows} rows")
+    gsheet = measure("full", sh, lambda: fetch_worksheet(spreadsheet))
+    index = measure(
+        "index",
+        sh,
+        lambda: fetch_sheet_index(spreadsheet, page_rows=args.page_rows),
+    )
+    assert index == SheetIndex.from_gsheet(gsheet)
+
+    # Every hundredth row has its dates fixed
+    report = [
+        FileReport(
+            path=Path(id), dates_match=True, has_ghotos_timestamp=False, uploaded=False
+        )
+        for id in list(gsheet)[:: args.rows // 100 or 1]
+    ]
+    del gsheet
+
+    start = time.perf_counter()
+    changes = merge_changes(index, report)
+    elapsed = time.perf_counter() - start
+    print(f"merge  {elapsed:6.2f} s ({len(changes.modified)} rows modified)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare serial and concurrent directory walks on a high-latency filesystem.
+
+A synthetic tree is created in a temporary directory, and every directory
+listing is delayed to simulate a network mount (SMB/NFS), without needing FUSE.
+
+Usage:
+
+    python -m benchmarks.walk [--latency-ms 5] [--dirs 10] [--depth 3] [--files 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import ContextManager, Iterator, List
+
+from gpy.filesystem import walk_files
+
+
+def build_tree(root: Path, dirs: int, depth: int, files: int) -> int:
+    """Create `dirs` subdirectories per level, with `files` files each."""
+    total = 0
+    for i in range(files):
+        (root / f"IMG_{i:04}.jpg").touch()
+        total += 1
+
+    if depth == 0:
+        return total
+
+    for i in range(dirs):
+        subdir = root / f"dir_{i:03}"
+        subdir.mkdir()
+        total += build_tree(subdir, dirs, depth - 1, files)
+
+    return total
+
+
+class SlowScandir:
+    """os.scandir() wrapper which sleeps before listing each directory."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def __call__(self, path: Path) -> ContextManager[Iterator[os.DirEntry]]:
+        time.sleep(self.latency)
+        return os.scandir(path)
+
+
+def walk(root: Path, workers: int, scandir: SlowScandir) -> List[Path]:
+    file_entries = walk_files(root_path=root, workers=workers, scandir=scandir)
+    return [file_entry.path for file_entry in file_entries]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--dirs", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    scandir = SlowScandir(latency=args.latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        total = build_tree(root, args.dirs, args.depth, args.files)
+        print(
+            f"Walking {total} files with {args.latency_ms}ms of latency "
+            "per directory listing"
+        )
+
+        expected = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            paths = walk(root, workers, scandir)
+            elapsed = time.perf_counter() - start
+
+            if expected is None:
+                expected = paths
+            assert paths == expected, "walk order changed"
+
+            print(f"workers={workers:<4} {elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import sys
 import click
 
 from gpy.cli.meta import meta_group
+from gpy.cli.reshard_sheet import reshard_sheet_command
 from gpy.cli.scan import scan_group
 from gpy.cli.upload_report import upload_report_command
 from gpy.log import ConditionalFormatter
@@ -24,4 +25,5 @@ def gpy_cli(debug: bool) -> None:
 
 gpy_cli.add_command(meta_group)
 gpy_cli.add_command(scan_group)
+gpy_cli.add_command(reshard_sheet_command)
 gpy_cli.add_command(upload_report_command)
@@ -1,18 +1,26 @@
 import datetime
 import logging
+from contextlib import closing
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, Optional
 
 import click
 
 from gpy import config
-from gpy.exiftool import client as exiftool
-from gpy.exiftool.client import ExifToolError
+from gpy.exiftool.client import DatesTriple, ExifTool, ExifToolError, ExifToolSession
 from gpy.filenames import parse_datetime
 from gpy.filesystem import get_paths_recursive
+from gpy.iterables import chunked
+from gpy.journal import FAILED, SKIPPED, WRITTEN, Journal, JournalEntry, journal_path
+from gpy.log import format_bytes
+from gpy.metadata.client import MetadataClient
+from gpy.plan import PlanEntry, read_plan, read_progress, write_plan, write_progress
 
 logger = logging.getLogger(__name__)
 
+# Number of files whose current dates are read with a single exiftool command
+BATCH_SIZE = 500
+
 
 @click.group(name="meta")
 def meta_group() -> None:
@@ -35,19 +43,98 @@ def meta_group() -> None:
     help="write file name date to metadata",
 )
 @click.option("--input", help="manually input date and time (YYYY-MM-DD_hh:mm:ss.ms)")
+@click.option(
+    "--walkers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of threads listing directories in parallel (for network mounts)",
+)
+@click.option(
+    "--exiftool-only",
+    is_flag=True,
+    default=False,
+    help="write every file with exiftool, even those which gpy can patch in place",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="write every file, even those whose dates are already correct",
+)
+@click.option(
+    "--plan",
+    type=click.Path(dir_okay=False, writable=True),
+    help="save the dates to write to a file, to write them later with `gpy meta apply`",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="skip the files done by the previous run on the same path, if it died",
+)
 @click.argument("path", type=click.Path(exists=True))
 def meta_date_command(
     path: str,
     from_filename: bool,
     input: Optional[str],
     backup: bool,
+    walkers: int,
+    exiftool_only: bool,
+    force: bool,
+    plan: Optional[str],
+    resume: bool,
 ) -> None:
-    edit_metadata_datetime(
-        path=Path(path),
-        read_datetime_from_filename=from_filename,
-        input=input,
-        backup=backup,
-    )
+    if plan:
+        edit_metadata_datetime(
+            path=Path(path),
+            read_datetime_from_filename=from_filename,
+            input=input,
+            backup=backup,
+            walkers=walkers,
+            plan=Path(plan),
+        )
+        return
+
+    journal = Journal(journal_path("meta-date", Path(path)), resume=resume)
+    try:
+        with journal:
+            edit_metadata_datetime(
+                path=Path(path),
+                read_datetime_from_filename=from_filename,
+                input=input,
+                backup=backup,
+                walkers=walkers,
+                exiftool_only=exiftool_only,
+                force=force,
+                journal=journal,
+            )
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, run again with --resume to carry on")
+        raise
+
+    journal.remove()
+
+
+@meta_group.command(
+    name="apply", help="Write the dates saved with `gpy meta date --plan`."
+)
+@click.option(
+    "--backup",
+    is_flag=True,
+    default=False,
+    help="keep a backup copy of the edited files",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=BATCH_SIZE,
+    show_default=True,
+    help="number of files written by each exiftool process",
+)
+@click.argument("plan", type=click.Path(exists=True, dir_okay=False))
+def meta_apply_command(plan: str, backup: bool, batch_size: int) -> None:
+    apply_plan(plan_path=Path(plan), backup=backup, batch_size=batch_size)
 
 
 def edit_metadata_datetime(
@@ -55,7 +142,23 @@ def edit_metadata_datetime(
     read_datetime_from_filename: bool,
     input: Optional[str],
     backup: bool,
+    walkers: int = 1,
+    exiftool_only: bool = False,
+    force: bool = False,
+    plan: Optional[Path] = None,
+    journal: Optional[Journal] = None,
 ) -> None:
+    """Write a date to the metadata of all the supported files in a path.
+
+    The current dates are read first, in batches, and files which already
+    have the dates that would be written are skipped, unless `force` is set.
+
+    If `plan` is set, no file is read or written: the dates to write are
+    saved to the plan instead, to write them later with apply_plan().
+
+    If a journal is provided, the outcome of each file is recorded in it, and
+    the files it resumed are skipped.
+    """
     metadata_datetime: Optional[datetime.datetime] = None
 
     if input and read_datetime_from_filename:
@@ -71,22 +174,161 @@ def edit_metadata_datetime(
             input_datetime = set_timezone_to_default(input_datetime)
         metadata_datetime = input_datetime
 
-    for path in get_paths_recursive(root_path=Path(path)):
+    files_written = 0
+    files_skipped = 0
+    files_failed = 0
+    bytes_written = 0
+    bytes_saved = 0
+
+    paths = get_paths_recursive(root_path=Path(path), workers=walkers)
+
+    if journal:
+        paths = (path for path in paths if not journal.is_done(path))
+
+    if plan:
+        entries = _plan_entries(paths, read_datetime_from_filename, metadata_datetime)
+        files_planned = write_plan(plan, entries)
+        logger.info(f"{files_planned} files planned in {plan}")
+        return
+
+    # exiftool is only started once a file needs it: files which gpy reads
+    # and patches natively do not
+    with closing(ExifToolSession()) as session:
+        exiftool = session if exiftool_only else MetadataClient(session)
+        for batch in chunked(paths, BATCH_SIZE):
+            targets: Dict[Path, Optional[datetime.datetime]] = {}
+            for path in batch:
+                if read_datetime_from_filename:
+                    metadata_datetime = _read_filename_date(path)
+                targets[path] = metadata_datetime
+
+            current_dates: Dict[Path, DatesTriple] = {}
+            if not force:
+                readable = [path for path, ts in targets.items() if ts]
+                current_dates = exiftool.read_dates_many(readable)
+
+            for path, ts in targets.items():
+                if ts is None:
+                    logger.warning(f"no date found to write to {path}")
+                    files_failed += 1
+                    _record(journal, path, FAILED)
+                    continue
+
+                dates = current_dates.get(path)
+                if dates and _dates_match(dates, ts):
+                    logger.debug(f"skipping {path}, its dates are already correct")
+                    files_skipped += 1
+                    bytes_saved += path.stat().st_size
+                    _record(journal, path, SKIPPED)
+                    continue
+
+                formatted_date = ts.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                logger.info(
+                    f"writing date {formatted_date} as metadata to {path}",
+                )
+                try:
+                    result = exiftool.write_ts(path, ts=ts, backup=backup)
+                except ExifToolError as exc:
+                    logger.warning(exc.args[0])
+                    files_failed += 1
+                    _record(journal, path, FAILED)
+                    continue
+
+                files_written += 1
+                _record(journal, path, WRITTEN)
+                bytes_written += result.bytes_written
+                logger.debug(f"  rewrote {format_bytes(result.bytes_written)}")
+
+    logger.debug(f"{format_bytes(bytes_written)} written")
+    logger.info(
+        f"{files_written} written, "
+        f"{files_skipped} skipped ({format_bytes(bytes_saved)} saved), "
+        f"{files_failed} failed"
+    )
+
+
+def _record(journal: Optional[Journal], path: Path, outcome: str) -> None:
+    if journal:
+        journal.record(JournalEntry(path=path, outcome=outcome))
+
+
+def _plan_entries(
+    paths: Iterable[Path],
+    read_datetime_from_filename: bool,
+    metadata_datetime: Optional[datetime.datetime],
+) -> Iterator[PlanEntry]:
+    for path in paths:
         if read_datetime_from_filename:
-            filename_date = parse_datetime(path.name)
-            if filename_date and not filename_date.tzinfo:
-                filename_date = set_timezone_to_default(filename_date)
-            metadata_datetime = filename_date
-
-        assert metadata_datetime
-        formatted_date = metadata_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        logger.info(
-            f"writing date {formatted_date} as metadata to {path}",
-        )
-        try:
-            exiftool.write_ts(path, ts=metadata_datetime, backup=backup)
-        except ExifToolError as exc:
-            logger.warning(exc.args[0])
+            metadata_datetime = _read_filename_date(path)
+
+        if metadata_datetime is None:
+            logger.warning(f"no date found to write to {path}")
+            continue
+
+        # The plan may be applied from another working directory
+        yield PlanEntry(path=path.absolute(), ts=metadata_datetime)
+
+
+def apply_plan(plan_path: Path, backup: bool, batch_size: int = BATCH_SIZE) -> None:
+    """Write the dates of a plan, a batch of files per exiftool process.
+
+    The progress is saved after each batch, so that applying the plan again
+    resumes after the last completed batch.
+    """
+    applied = read_progress(plan_path)
+    if applied:
+        logger.info(f"resuming {plan_path} after {applied} files")
+
+    exiftool = ExifTool()
+    files_written = 0
+    files_failed = 0
+
+    for batch in chunked(read_plan(plan_path, start=applied), batch_size):
+        logger.info(f"writing dates to files {applied + 1}-{applied + len(batch)}")
+        timestamps = [(entry.path, entry.ts) for entry in batch]
+        errors = exiftool.write_ts_many(timestamps, backup=backup)
+
+        for error in errors.values():
+            if error:
+                logger.warning(error)
+                files_failed += 1
+            else:
+                files_written += 1
+
+        applied += len(batch)
+        write_progress(plan_path, applied)
+
+    logger.info(f"{files_written} written, {files_failed} failed")
+
+
+def _read_filename_date(path: Path) -> Optional[datetime.datetime]:
+    filename_date = parse_datetime(path.name)
+    if filename_date and not filename_date.tzinfo:
+        return set_timezone_to_default(filename_date)
+
+    if filename_date:
+        # e.g. Pixel file names, which are in UTC
+        return filename_date.astimezone(config.DEFAULT_ZONEINFO)
+
+    return None
+
+
+def _dates_match(dates: DatesTriple, ts: datetime.datetime) -> bool:
+    """Tell whether a file already has the dates write_ts() would write.
+
+    The metadata date has no subseconds, and usually no timezone either, while
+    the Google date has milliseconds and timezone.
+    """
+    if dates.metadata_date is None or dates.google_date is None:
+        return False
+
+    metadata_date = ts.replace(microsecond=0)
+    if not dates.metadata_date.tzinfo:
+        metadata_date = metadata_date.replace(tzinfo=None)
+
+    google_date = ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+    return dates.metadata_date == metadata_date and dates.google_date == google_date
 
 
 def set_timezone_to_default(ts: datetime.datetime) -> datetime.datetime:
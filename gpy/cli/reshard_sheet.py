@@ -0,0 +1,47 @@
+import logging
+
+import click
+import gspread
+
+from gpy import config
+from gpy.google_sheet import SheetIndex
+from gpy.sheet_cache import sheet_cache_path, update_shard_caches
+from gpy.sheet_shards import SHARD_ROWS, ShardLayoutError, reshard
+from gpy.sheets_client import RateLimitedClient
+
+logger = logging.getLogger(__name__)
+
+
+@click.command(name="reshard_sheet")
+@click.option(
+    "--shard-rows",
+    type=click.IntRange(min=1),
+    default=SHARD_ROWS,
+    show_default=True,
+    help="number of rows of each worksheet",
+)
+def reshard_sheet_command(shard_rows: int) -> None:
+    """Split the rows of Google Spreadsheet across worksheets.
+
+    Rows are partitioned by directory, into worksheets of up to --shard-rows
+    rows, and the "Shards" worksheet keeps the first directory of each one.
+    Run it again once shards grow too large, to rebalance them.
+    """
+    logger.info("Authenticating with Google Spreadsheet API...")
+    gc = RateLimitedClient.from_client(gspread.oauth())
+    sh = gc.open(config.SPREADSHEET_NAME)
+
+    try:
+        layout, shards = reshard(sh, shard_rows=shard_rows)
+    except ShardLayoutError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    # The local copies of the previous worksheets are of no use anymore
+    try:
+        sheet_cache_path(sh.id).unlink()
+    except FileNotFoundError:
+        pass
+    indexes = {title: SheetIndex.from_gsheet(rows) for title, rows in shards.items()}
+    update_shard_caches(sh, indexes, version=None)
+
+    logger.info(f"The spreadsheet rows are split across {len(layout.titles)} shards")
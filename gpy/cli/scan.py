@@ -1,17 +1,32 @@
+import datetime
 import logging
+from contextlib import closing
 from pathlib import Path
-from typing import Any, List, Optional  # TODO: find namespace type
+from typing import Any, Dict, Generator, List, Optional  # TODO: find namespace type
 
+import attr
 import click
 
-from gpy.exiftool import client as exiftool_client
+from gpy import config
+from gpy.exiftool.client import DatesTriple, ExifToolPool
 from gpy.filenames import DatetimeParser
 from gpy.filenames import parse_datetime as datetime_parser
-from gpy.filesystem import get_paths_recursive, write_reports
+from gpy.filesystem import FileEntry, open_report_writer, walk_files
+from gpy.iterables import chunked
+from gpy.journal import SCANNED, Journal, JournalEntry, journal_path
+from gpy.metadata.client import MetadataClient
+from gpy.pipeline import Pipeline
+from gpy.scan_index import Fingerprint, ScanIndex
 from gpy.types import Report, print_report
 
 logger = logging.getLogger(__name__)
 
+# Number of files whose metadata is read with a single exiftool command
+BATCH_SIZE = 500
+
+# Number of batches waiting for each stage of the scan pipeline
+QUEUE_SIZE = 2
+
 
 @click.group(name="scan")
 def scan_group() -> None:
@@ -21,8 +36,79 @@ def scan_group() -> None:
 
 @scan_group.command(name="date")
 @click.option("--report", "report_output", type=click.Path())
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of exiftool processes reading metadata in parallel",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=BATCH_SIZE,
+    show_default=True,
+    help="number of files read by each exiftool command",
+)
+@click.option(
+    "--walkers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of threads listing directories in parallel (for network mounts)",
+)
+@click.option(
+    "--parsers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of threads parsing dates from file names",
+)
+@click.option(
+    "--queue-size",
+    type=click.IntRange(min=1),
+    default=QUEUE_SIZE,
+    show_default=True,
+    help="number of batches waiting for each stage, bounding memory use",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="read the metadata of every file, ignoring and not updating the scan index",
+)
+@click.option(
+    "--rebuild-cache",
+    is_flag=True,
+    default=False,
+    help="discard the scan index and read the metadata of every file again",
+)
+@click.option(
+    "--exiftool-only",
+    is_flag=True,
+    default=False,
+    help="read every file with exiftool, even those which gpy can read natively",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="skip the files scanned by the previous run on the same path, if it died",
+)
 @click.argument("path", type=click.Path(exists=True))
-def scan_date_command(report_output: Optional[str], path: str) -> None:
+def scan_date_command(
+    report_output: Optional[str],
+    jobs: int,
+    batch_size: int,
+    walkers: int,
+    parsers: int,
+    queue_size: int,
+    no_cache: bool,
+    rebuild_cache: bool,
+    exiftool_only: bool,
+    resume: bool,
+    path: str,
+) -> None:
     """Scan files and directories.
 
     Scan files and directories looking and report:
@@ -30,33 +116,219 @@ def scan_date_command(report_output: Optional[str], path: str) -> None:
      - Date tag: the supported file does/doesn't have date tag.
      - GPS tag: the supported file does/doesn't have GPS tag.
     """
-    reports = scan_date(exiftool_client, datetime_parser, Path(path))
+    index = None if no_cache else ScanIndex(config.SCAN_INDEX_PATH)
+    if index and rebuild_cache:
+        index.clear()
+
+    journal = Journal(
+        journal_path("scan-date", Path(path)), resume=resume, flush_every=batch_size
+    )
+
+    report_writer = open_report_writer(Path(report_output)) if report_output else None
 
-    if report_output:
-        report_path = Path(report_output)
-        write_reports(path=report_path, reports=reports)
+    try:
+        with ExifToolPool(size=jobs) as exiftool:
+            reports = iter_scan_date(
+                exiftool if exiftool_only else MetadataClient(exiftool),
+                datetime_parser,
+                Path(path),
+                batch_size=batch_size,
+                jobs=jobs,
+                walkers=walkers,
+                parsers=parsers,
+                queue_size=queue_size,
+                index=index,
+                journal=journal,
+            )
+            # The pipeline threads are stopped before the pool closes the
+            # exiftool sessions they use
+            with closing(reports):
+                for report in reports:
+                    if report_writer:
+                        report_writer.write(report)
+    except KeyboardInterrupt:
+        # The report is left with the files scanned so far
+        logger.warning("Interrupted, run again with --resume to carry on")
+        raise
+    finally:
+        journal.close()
+        if report_writer:
+            report_writer.close()
+        if index:
+            index.close()
 
+    if index:
+        logger.info(f"Scan index: {index.hits} hits, {index.misses} misses")
 
-def scan_date(exiftool: Any, parse_datetime: DatetimeParser, dir: Path) -> List[Report]:
-    file_paths = get_paths_recursive(root_path=Path(dir))
+    journal.remove()
 
-    return [_scan_date(exiftool, parse_datetime, path) for path in file_paths]
+
+def scan_date(
+    exiftool: Any,
+    parse_datetime: DatetimeParser,
+    dir: Path,
+    batch_size: int = BATCH_SIZE,
+    jobs: int = 1,
+    walkers: int = 1,
+    parsers: int = 1,
+    queue_size: int = QUEUE_SIZE,
+    index: Optional[ScanIndex] = None,
+    journal: Optional[Journal] = None,
+) -> List[Report]:
+    """Scan the dates of all the supported files in a directory.
+
+    Refer to iter_scan_date() for further information.
+    """
+    return list(
+        iter_scan_date(
+            exiftool,
+            parse_datetime,
+            dir,
+            batch_size=batch_size,
+            jobs=jobs,
+            walkers=walkers,
+            parsers=parsers,
+            queue_size=queue_size,
+            index=index,
+            journal=journal,
+        )
+    )
+
+
+def iter_scan_date(
+    exiftool: Any,
+    parse_datetime: DatetimeParser,
+    dir: Path,
+    batch_size: int = BATCH_SIZE,
+    jobs: int = 1,
+    walkers: int = 1,
+    parsers: int = 1,
+    queue_size: int = QUEUE_SIZE,
+    index: Optional[ScanIndex] = None,
+    journal: Optional[Journal] = None,
+) -> Generator[Report, None, None]:
+    """Yield the date reports of all the supported files in a directory.
+
+    Files go through a pipeline in batches: the directory walk feeds batches to
+    `parsers` threads parsing dates from file names, which feed `jobs` threads
+    reading metadata with concurrent exiftool commands. The stages overlap, and
+    up to `queue_size` batches wait for each stage, so only a bounded number of
+    batches is kept in memory. Reports are printed and yielded in path order,
+    regardless of the order in which the batches complete.
+
+    The throughput and queue depth of each stage are logged for debugging.
+
+    If an index is provided, only the files which are not in the index, or
+    which changed since they were indexed, are read with exiftool.
+
+    If a journal is provided, the report of each file is recorded in it, and
+    the files it resumed are not scanned again: their journaled reports are
+    yielded instead.
+
+    Refer to walk_files() for the meaning of `walkers`.
+    """
+    batches = chunked(walk_files(root_path=Path(dir), workers=walkers), batch_size)
+
+    def parse_batch(batch: List[FileEntry]) -> _Batch:
+        return _Batch(
+            file_entries=batch,
+            filename_dates={
+                file_entry.path: parse_datetime(file_entry.path.name)
+                for file_entry in batch
+                if not (journal and journal.is_done(file_entry.path))
+            },
+        )
+
+    def read_batch(batch: _Batch) -> _Batch:
+        file_entries = batch.file_entries
+        if journal:
+            # Files scanned by the resumed run are reported from the journal
+            file_entries = [e for e in file_entries if not journal.is_done(e.path)]
+        pending = [file_entry.path for file_entry in file_entries]
+
+        if index is None:
+            logger.debug(f"reading metadata dates of {len(pending)} files...")
+            batch.dates_by_path = exiftool.read_dates_many(pending)
+            return batch
+
+        # The stat() results come from the directory walk, when available
+        fingerprints: Dict[Path, Fingerprint] = {}
+        for file_entry in file_entries:
+            try:
+                fingerprints[file_entry.path] = Fingerprint.from_stat(file_entry.stat())
+            except OSError as exc:
+                # E.g. the file was removed since the walk: it is not indexed,
+                # and exiftool reports why it cannot be read
+                logger.debug(f"cannot fingerprint {file_entry.path}: {exc}")
+        dates_by_path = index.lookup_many(fingerprints)
+
+        misses = [path for path in pending if path not in dates_by_path]
+        if misses:
+            logger.debug(f"reading metadata dates of {len(misses)} files...")
+            read_dates = exiftool.read_dates_many(misses)
+            index.store_many(
+                (path, fingerprints[path], read_dates[path])
+                for path in misses
+                if path in fingerprints
+            )
+            dates_by_path.update(read_dates)
+
+        batch.dates_by_path = dates_by_path
+        return batch
+
+    pipeline = Pipeline(batches, queue_size=queue_size)
+    pipeline.add_stage("parse", parse_batch, workers=parsers)
+    pipeline.add_stage("read", read_batch, workers=jobs)
+
+    with pipeline:
+        for batch in pipeline:
+            for file_entry in batch.file_entries:
+                path = file_entry.path
+                if journal and journal.is_done(path):
+                    yield _resumed_report(journal, path)
+                    continue
+
+                report = _report_dates(
+                    path, batch.filename_dates[path], batch.dates_by_path[path]
+                )
+                if journal:
+                    entry = JournalEntry(path=path, outcome=SCANNED, report=report)
+                    journal.record(entry)
+                yield report
+
+    for stats in pipeline.stats():
+        logger.debug(f"scan pipeline {stats.format()}")
+
+
+@attr.s(auto_attribs=True)
+class _Batch:
+    """Files going through the scan pipeline, with what was found so far."""
+
+    file_entries: List[FileEntry]
+    filename_dates: Dict[Path, Optional[datetime.datetime]]
+    dates_by_path: Dict[Path, DatesTriple] = attr.Factory(dict)
+
+
+def _resumed_report(journal: Journal, path: Path) -> Report:
+    report = journal.resumed[path.absolute()].report
+    assert report, f"{journal.path} has no report of {path}"
+    return report
 
 
-def _scan_date(exiftool: Any, parse_datetime: DatetimeParser, path: Path) -> Report:
+def _report_dates(
+    path: Path, filename_date: Optional[datetime.datetime], dates: DatesTriple
+) -> Report:
     logger.info(f"scanning {path}")
 
-    filename_date = parse_datetime(path.name)
-    metadata_date = exiftool.read_datetime(path)
-    google_date = exiftool.read_google_timestamp(path)
-    logger.debug("scan successfully completed")
+    if dates.error:
+        logger.warning(f"  failed to read metadata: {dates.error}")
 
     logger.debug("reporting scanned dates...")
     report = Report(
         path=path,
         filename_date=filename_date,
-        metadata_date=metadata_date,
-        google_date=google_date,
+        metadata_date=dates.metadata_date,
+        google_date=dates.google_date,
     )
     print_report(report)
 
@@ -6,49 +6,204 @@ subelos a gsheet
 
 import logging
 from pathlib import Path
+from typing import Dict, Iterable, Iterator
 
 import click
 import gspread
+from gspread.models import Spreadsheet
 
+from gpy import columnar, config
 from gpy.filesystem import read_reports
-from gpy.google_sheet import FileReport, fetch_worksheet, merge, upload_worksheet
+from gpy.google_sheet import (
+    FileReport,
+    SheetIndex,
+    apply_changes,
+    fetch_worksheet,
+    merge,
+    merge_changes,
+    upload_changes,
+    upload_worksheet,
+)
+from gpy.sheet_cache import (
+    fetch_cached_index,
+    fetch_cached_shard_indexes,
+    fetch_version,
+    sheet_cache_path,
+    update_cache,
+    update_shard_caches,
+)
+from gpy.sheet_shards import (
+    RESHARD_ROWS,
+    ShardLayout,
+    ShardLayoutError,
+    fetch_layout,
+    fetch_shard_worksheets,
+)
+from gpy.sheets_client import RateLimitedClient
 
 logger = logging.getLogger(__name__)
 
 
 @click.command(name="upload_report")
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="rewrite every row of the sheet, sorted by ID, instead of the changed ones",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="fetch every row of the sheet, even if the local copy is up to date",
+)
 @click.argument("path", type=click.Path(exists=True))
-def upload_report_command(path: str) -> None:
-    """Upload scan-report to Google Spreadsheet."""
-    upload_report(report_path=Path(path))
+def upload_report_command(full: bool, refresh: bool, path: str) -> None:
+    """Upload scan-report to Google Spreadsheet.
 
+    Only the rows which changed are written: existing rows are updated in
+    place, and new rows are appended at the end of the sheet.
 
-def upload_report(report_path: Path) -> None:
+    The rows of the sheet are kept in a local copy, which is used instead of
+    fetching them again as long as nobody changed the sheet.
+
+    If the spreadsheet is split across worksheets (see reshard_sheet), only
+    the worksheets holding the directories of the report are fetched and
+    written.
+    """
+    try:
+        upload_report(report_path=Path(path), full=full, refresh=refresh)
+    except ShardLayoutError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+
+def upload_report(report_path: Path, full: bool = False, refresh: bool = False) -> None:
     logger.info(f"Reading reports from {report_path}")
-    reports = read_reports(report_path)
+    # Reports are streamed from the file while merging
+    file_reports = read_file_reports(report_path)
+
+    logger.info("Authenticating with Google Spreadsheet API...")
+    gc = RateLimitedClient.from_client(gspread.oauth())
+
+    spreadsheet_name = config.SPREADSHEET_NAME
+    sh = gc.open(spreadsheet_name)
 
-    file_reports = [
-        FileReport(
+    layout = fetch_layout(sh)
+    if layout is not None:
+        upload_shards(sh, layout, file_reports, full=full, refresh=refresh)
+        return
+
+    cache_path = sheet_cache_path(sh.id)
+
+    if full:
+        logger.info(f"Fetching data from the {spreadsheet_name!r} spreadsheet...")
+        gsheet = fetch_worksheet(sh)
+
+        logger.info("Merging report data with the spreadsheet...")
+        updated_gsheet = merge(gsheet, file_reports)
+
+        logger.info("Uploading updated data to the spreadsheet...")
+        upload_worksheet(sh, updated_gsheet)
+        sorted_rows = sorted(updated_gsheet.values(), key=lambda r: r.id)
+        uploaded_index = SheetIndex.from_gsheet({row.id: row for row in sorted_rows})
+    else:
+        logger.info(f"Fetching data from the {spreadsheet_name!r} spreadsheet...")
+        index = fetch_cached_index(sh, cache_path, refresh=refresh)
+
+        logger.info("Merging report data with the spreadsheet...")
+        changes = merge_changes(index, file_reports)
+        if not changes.rows:
+            logger.info("The spreadsheet is already up to date")
+            return
+
+        logger.info(
+            f"Uploading {len(changes.inserted)} new and {len(changes.modified)} "
+            "modified rows to the spreadsheet..."
+        )
+        upload_changes(sh, changes)
+        uploaded_index = apply_changes(index, changes)
+
+    update_cache(sh, cache_path, uploaded_index)
+    logger.info("Report upload successfuly completed")
+
+
+def read_file_reports(path: Path) -> Iterator[FileReport]:
+    """Yield the FileReport of each report of a file.
+
+    Columnar reports are turned into FileReport straight from their columns,
+    instead of building a Report per row first.
+    """
+    if columnar.has_magic(path):
+        for table in columnar.iter_tables(path):
+            yield from table.iter_file_reports()
+        return
+
+    for report in read_reports(path):
+        yield FileReport(
             path=report.path,
             dates_match=report.dates_match,
             has_ghotos_timestamp=report.has_google_date,
             uploaded=False,
         )
-        for report in reports
-    ]
 
-    logger.info("Authenticating with Google Spreadsheet API...")
-    gc = gspread.oauth()
 
-    spreadsheet_name = "Photo backup tracker"
-    sh = gc.open(spreadsheet_name)
+def upload_shards(
+    sh: Spreadsheet,
+    layout: ShardLayout,
+    file_reports: Iterable[FileReport],
+    full: bool = False,
+    refresh: bool = False,
+) -> None:
+    worksheets = fetch_shard_worksheets(sh, layout)
+
+    logger.info("Splitting the report by shard...")
+    reports = layout.split(file_reports)
+    touched = [worksheets[title] for title in layout.titles if title in reports]
+    logger.info(
+        f"The report touches {len(touched)} of the {len(layout.titles)} shards "
+        "of the spreadsheet"
+    )
+
+    uploaded_indexes: Dict[str, SheetIndex] = {}
+
+    if full:
+        version = fetch_version(sh)
+        for worksheet in touched:
+            logger.info(f"Fetching data from the {worksheet.title!r} shard...")
+            gsheet = fetch_worksheet(sh, worksheet=worksheet)
+            updated_gsheet = merge(gsheet, reports[worksheet.title])
+
+            logger.info(f"Uploading updated data to the {worksheet.title!r} shard...")
+            upload_worksheet(sh, updated_gsheet, worksheet=worksheet)
+            sorted_rows = sorted(updated_gsheet.values(), key=lambda r: r.id)
+            uploaded_indexes[worksheet.title] = SheetIndex.from_gsheet(
+                {row.id: row for row in sorted_rows}
+            )
+    else:
+        version, indexes = fetch_cached_shard_indexes(sh, touched, refresh=refresh)
+        for worksheet in touched:
+            index = indexes[worksheet.title]
+            changes = merge_changes(index, reports[worksheet.title])
+            if not changes.rows:
+                continue
+
+            logger.info(
+                f"Uploading {len(changes.inserted)} new and {len(changes.modified)} "
+                f"modified rows to the {worksheet.title!r} shard..."
+            )
+            upload_changes(sh, changes, worksheet=worksheet)
+            uploaded_indexes[worksheet.title] = apply_changes(index, changes)
 
-    logger.info(f"Fetching data from the {spreadsheet_name!r} spreadsheet...")
-    gsheet = fetch_worksheet(sh)
+        if not uploaded_indexes:
+            logger.info("The spreadsheet is already up to date")
+            return
 
-    logger.info("Merging report data with the spreadsheet...")
-    updated_gsheet = merge(gsheet, file_reports)
+    for title, index in uploaded_indexes.items():
+        if len(index) > RESHARD_ROWS:
+            logger.warning(
+                f"The {title!r} shard has {len(index)} rows, "
+                "consider running reshard_sheet"
+            )
 
-    logger.info("Uploading updated data to the spreadsheet...")
-    upload_worksheet(sh, updated_gsheet)
+    update_shard_caches(sh, uploaded_indexes, version)
     logger.info("Report upload successfuly completed")
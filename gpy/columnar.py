@@ -0,0 +1,441 @@
+"""This module stores scan reports column by column, in a compact binary file.
+
+Loading a JSON report means decoding every value and structuring every report
+with cattr, which takes seconds for large libraries. Instead, each field is
+stored here as a typed column that is loaded in one go, block by block:
+
+- Paths are split into a dictionary of directories, an index to it per row,
+  and the file names. Names are joined with NUL, which cannot be part of a
+  path, so that they can be split back at once.
+- Dates are stored as microseconds since the Unix epoch (in wall clock time),
+  plus their UTC offset in seconds, if they have a timezone.
+- GPS coordinates are stored as doubles, with NaN for missing values.
+
+The file starts with a header (magic, version and number of rows), followed by
+blocks of up to BLOCK_ROWS rows. Each block starts with its number of rows,
+followed by its columns, each one prefixed with its size in bytes. Blocks have
+their own dictionary of directories, so that they can be written as reports
+come and read one at a time. Numbers are stored in little endian byte order.
+"""
+
+import datetime
+import math
+import struct
+import sys
+from array import array
+from decimal import Decimal
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Type
+
+import attr
+
+from gpy.google_sheet import FileReport
+from gpy.types import GpsCoordinates, Report, compare_dates
+
+MAGIC = b"GPYR"
+VERSION = 2
+HEADER = struct.Struct("<4sHI")
+BLOCK_HEADER = struct.Struct("<I")
+COLUMN_SIZE = struct.Struct("<Q")
+
+# Rows held in memory by ColumnarReportWriter before they are written
+BLOCK_ROWS = 65536
+
+SUFFIX = ".gpyr"
+
+# Paths are stored as UTF-8, and the bytes of file names which are not valid
+# UTF-8, which os.scandir() escapes as surrogates, are stored as they are
+PATH_ERRORS = "surrogateescape"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+NULL_DATE = -(2**63)
+NAIVE = -(2**31)
+SECOND = 1_000_000
+
+
+class ColumnarReportError(Exception):
+    pass
+
+
+def is_columnar(path: Path) -> bool:
+    return path.suffix.lower() == SUFFIX
+
+
+def has_magic(path: Path) -> bool:
+    with path.open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+@attr.s(auto_attribs=True)
+class DateColumn:
+    """Dates as microseconds since the epoch and UTC offsets in seconds."""
+
+    values: array = attr.Factory(lambda: array("q"))
+    offsets: array = attr.Factory(lambda: array("i"))
+
+    def append(self, d: Optional[datetime.datetime]) -> None:
+        if d is None:
+            self.values.append(NULL_DATE)
+            self.offsets.append(NAIVE)
+            return
+
+        offset = d.utcoffset()
+        wall_clock = d.replace(tzinfo=None)
+        self.values.append((wall_clock - EPOCH) // MICROSECOND)
+        self.offsets.append(NAIVE if offset is None else int(offset.total_seconds()))
+
+    def __iter__(self) -> Iterator[Optional[datetime.datetime]]:
+        timezones: Dict[int, Optional[datetime.timezone]] = {NAIVE: None}
+
+        for value, offset in zip(self.values, self.offsets):
+            yield _to_datetime(value, offset, timezones)
+
+    def matches(self, other: "DateColumn") -> Iterator[bool]:
+        """Yield whether the dates of each row are equal, as Report.dates_match.
+
+        Missing dates never match. Dates which are both naive or both aware are
+        compared as numbers, and the rest as datetimes, by compare_dates().
+        """
+        timezones: Dict[int, Optional[datetime.timezone]] = {NAIVE: None}
+
+        for value, offset, other_value, other_offset in zip(
+            self.values, self.offsets, other.values, other.offsets
+        ):
+            if NULL_DATE in (value, other_value):
+                yield False
+            elif offset == NAIVE and other_offset == NAIVE:
+                yield value == other_value
+            elif offset == NAIVE or other_offset == NAIVE:
+                yield compare_dates(
+                    _to_datetime(value, offset, timezones),
+                    _to_datetime(other_value, other_offset, timezones),
+                )
+            else:
+                yield value - offset * SECOND == other_value - other_offset * SECOND
+
+    def is_set(self) -> Iterator[bool]:
+        for value in self.values:
+            yield value != NULL_DATE
+
+
+def _to_datetime(
+    value: int, offset: int, timezones: Dict[int, Optional[datetime.timezone]]
+) -> Optional[datetime.datetime]:
+    """Return the date of a column value, caching its timezone in `timezones`."""
+    if value == NULL_DATE:
+        return None
+
+    if offset not in timezones:
+        timezones[offset] = datetime.timezone(datetime.timedelta(seconds=offset))
+
+    d = EPOCH + datetime.timedelta(microseconds=value)
+    tzinfo = timezones[offset]
+    return d if tzinfo is None else d.replace(tzinfo=tzinfo)
+
+
+@attr.s(auto_attribs=True)
+class ReportTable:
+    """Reports stored field by field.
+
+    A table takes a fraction of the memory of the Report instances it holds:
+    directories are stored once, and dates and coordinates are plain numbers.
+    Reports are only built while iterating the table.
+
+    The path of row `i` is `directories[directory_index[i]] / names[i]`.
+    """
+
+    directories: List[str] = attr.Factory(list)
+    directory_index: array = attr.Factory(lambda: array("I"))
+    names: List[str] = attr.Factory(list)
+    filename_date: DateColumn = attr.Factory(DateColumn)
+    metadata_date: DateColumn = attr.Factory(DateColumn)
+    google_date: DateColumn = attr.Factory(DateColumn)
+    longitude: array = attr.Factory(lambda: array("d"))
+    latitude: array = attr.Factory(lambda: array("d"))
+    # Row of each directory in `directories`
+    _directory_ids: Dict[str, int] = attr.ib(
+        factory=dict, init=False, repr=False, eq=False
+    )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[Report]:
+        gps_coordinates = (
+            (
+                None
+                if math.isnan(longitude)
+                else GpsCoordinates(
+                    longitude=Decimal(repr(longitude)), latitude=Decimal(repr(latitude))
+                )
+            )
+            for longitude, latitude in zip(self.longitude, self.latitude)
+        )
+
+        for path, filename_date, metadata_date, google_date, gps in zip(
+            self.iter_paths(),
+            self.filename_date,
+            self.metadata_date,
+            self.google_date,
+            gps_coordinates,
+        ):
+            yield Report(
+                path=path,
+                filename_date=filename_date,
+                metadata_date=metadata_date,
+                google_date=google_date,
+                gps=gps,
+            )
+
+    def iter_file_reports(self) -> Iterator[FileReport]:
+        """Yield the FileReport of each row, without building its Report.
+
+        Only the path and date columns are read, and dates are compared as
+        numbers.
+        """
+        for path, dates_match, has_google_date in zip(
+            self.iter_paths(),
+            self.filename_date.matches(self.metadata_date),
+            self.google_date.is_set(),
+        ):
+            yield FileReport(
+                path=path,
+                dates_match=dates_match,
+                has_ghotos_timestamp=has_google_date,
+                uploaded=False,
+            )
+
+    def iter_paths(self) -> Iterator[Path]:
+        directories = [Path(directory) for directory in self.directories]
+        for index, name in zip(self.directory_index, self.names):
+            yield directories[index] / name
+
+    def append(self, report: Report) -> None:
+        self.directory_index.append(self._directory_id(str(report.path.parent)))
+        self.names.append(report.path.name)
+        self.filename_date.append(report.filename_date)
+        self.metadata_date.append(report.metadata_date)
+        self.google_date.append(report.google_date)
+
+        gps = report.gps
+        self.longitude.append(math.nan if gps is None else float(gps.longitude))
+        self.latitude.append(math.nan if gps is None else float(gps.latitude))
+
+    def extend(self, reports: Iterable[Report]) -> None:
+        for report in reports:
+            self.append(report)
+
+    def extend_table(self, other: "ReportTable") -> None:
+        """Append the rows of another table, column by column."""
+        directory_ids = [self._directory_id(d) for d in other.directories]
+        self.directory_index.extend(
+            array("I", map(directory_ids.__getitem__, other.directory_index))
+        )
+        self.names.extend(other.names)
+        for column, other_column in zip(_arrays(self)[1:], _arrays(other)[1:]):
+            column.extend(other_column)
+
+    def _directory_id(self, directory: str) -> int:
+        if len(self._directory_ids) != len(self.directories):
+            # The directories were set from outside, e.g. read from a file
+            self._directory_ids = {d: i for i, d in enumerate(self.directories)}
+
+        directory_id = self._directory_ids.get(directory)
+        if directory_id is None:
+            directory_id = self._directory_ids[directory] = len(self.directories)
+            self.directories.append(directory)
+        return directory_id
+
+
+class ColumnarReportWriter:
+    """Write reports to a file in blocks of `block_rows` rows.
+
+    Only the rows of the current block are held in memory. The number of rows
+    in the header is only set once closed.
+    """
+
+    def __init__(self, path: Path, block_rows: int = BLOCK_ROWS) -> None:
+        if block_rows < 1:
+            raise ValueError(f"Block rows must be positive, got {block_rows}")
+
+        self.path = path
+        self.block_rows = block_rows
+        self.table = ReportTable()
+        self._written = 0
+        self._file = path.open("wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0))
+
+    def __enter__(self) -> "ColumnarReportWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @property
+    def count(self) -> int:
+        return self._written + len(self.table)
+
+    def write(self, report: Report) -> None:
+        self.table.append(report)
+        if len(self.table) >= self.block_rows:
+            self._flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+
+        try:
+            self._flush()
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, self._written))
+        finally:
+            self._file.close()
+
+    def _flush(self) -> None:
+        if not self.table:
+            return
+
+        _write_block(self._file, self.table)
+        self._written += len(self.table)
+        self.table = ReportTable()
+
+
+def write_table(path: Path, table: ReportTable) -> None:
+    with path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(table)))
+        if table:
+            _write_block(f, table)
+
+
+def iter_tables(path: Path) -> Iterator[ReportTable]:
+    """Yield the blocks of a file as tables, reading one block at a time."""
+    with path.open("rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ColumnarReportError(f"{path} is not a columnar report")
+
+        magic, version, rows = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ColumnarReportError(f"{path} is not a columnar report")
+        if version != VERSION:
+            raise ColumnarReportError(f"Unsupported columnar report version: {version}")
+
+        columns = 2 + len(_arrays(ReportTable()))
+        read_rows = 0
+        while True:
+            block_header = f.read(BLOCK_HEADER.size)
+            if not block_header:
+                break
+
+            if len(block_header) < BLOCK_HEADER.size:
+                raise ColumnarReportError(f"{path} is truncated")
+
+            (block_rows,) = BLOCK_HEADER.unpack(block_header)
+            chunks = []
+            for _ in range(columns):
+                (size,) = COLUMN_SIZE.unpack(_read_exactly(f, COLUMN_SIZE.size, path))
+                chunks.append(_read_exactly(f, size, path))
+
+            table = _decode(chunks)
+            if len(table) != block_rows or len(table.directory_index) != block_rows:
+                raise ColumnarReportError(f"{path} has columns of the wrong length")
+
+            read_rows += block_rows
+            yield table
+
+        if read_rows != rows:
+            raise ColumnarReportError(
+                f"{path} has {read_rows} rows, but its header says {rows}"
+            )
+
+
+def read_table(path: Path) -> ReportTable:
+    """Read every block of a file into a single table."""
+    tables = iter_tables(path)
+    table = next(tables, None)
+    if table is None:
+        return ReportTable()
+
+    for block in tables:
+        table.extend_table(block)
+    return table
+
+
+def read_reports(path: Path) -> Iterator[Report]:
+    for table in iter_tables(path):
+        yield from table
+
+
+def _write_block(f: BinaryIO, table: ReportTable) -> None:
+    f.write(BLOCK_HEADER.pack(len(table)))
+    for data in _encode(table):
+        f.write(COLUMN_SIZE.pack(len(data)))
+        f.write(data)
+
+
+def _read_exactly(f: BinaryIO, size: int, path: Path) -> bytes:
+    data = f.read(size)
+    if len(data) < size:
+        raise ColumnarReportError(f"{path} is truncated")
+    return data
+
+
+def _encode(table: ReportTable) -> Iterator[bytes]:
+    yield "\0".join(table.directories).encode(errors=PATH_ERRORS)
+    yield "\0".join(table.names).encode(errors=PATH_ERRORS)
+    for numbers in _arrays(table):
+        yield _to_little_endian(array(numbers.typecode, numbers)).tobytes()
+
+
+def _decode(chunks: List[bytes]) -> ReportTable:
+    table = ReportTable()
+
+    if len(chunks) != 2 + len(_arrays(table)):
+        raise ColumnarReportError(
+            f"Expected {2 + len(_arrays(table))} columns, got {len(chunks)}"
+        )
+
+    directories, names, *numbers = chunks
+    table.directories = _split(directories)
+    table.names = _split(names)
+
+    for column, data in zip(_arrays(table), numbers):
+        column.frombytes(data)
+        _to_little_endian(column)
+
+    return table
+
+
+def _arrays(table: ReportTable) -> List[array]:
+    return [
+        table.directory_index,
+        table.filename_date.values,
+        table.filename_date.offsets,
+        table.metadata_date.values,
+        table.metadata_date.offsets,
+        table.google_date.values,
+        table.google_date.offsets,
+        table.longitude,
+        table.latitude,
+    ]
+
+
+def _split(data: bytes) -> List[str]:
+    if not data:
+        return []
+
+    return data.decode(errors=PATH_ERRORS).split("\0")
+
+
+def _to_little_endian(numbers: array) -> array:
+    """Swap the byte order in place on big endian machines, and return it."""
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers
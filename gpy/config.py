@@ -1,4 +1,14 @@
+import os
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 DEFAULT_ZONEINFO = ZoneInfo("Europe/Madrid")
 # DEFAULT_ZONEINFO = ZoneInfo("Europe/London")
+
+# https://specifications.freedesktop.org/basedir-spec/latest/
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "gpy"
+SCAN_INDEX_PATH = CACHE_DIR / "scan-index.sqlite3"
+JOURNAL_DIR = CACHE_DIR / "journals"
+SHEET_CACHE_DIR = CACHE_DIR / "sheets"
+
+SPREADSHEET_NAME = "Photo backup tracker"
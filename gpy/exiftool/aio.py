@@ -0,0 +1,351 @@
+"""This module contains exiftool clients for asyncio applications.
+
+They mirror the clients in gpy.exiftool.client, but their methods are
+coroutines, so they can be awaited from an event loop without blocking it:
+
+    async with AsyncExifToolPool(size=4) as exiftool:
+        metadata_date = await exiftool.read_datetime(path)
+
+Arguments are built, and outputs parsed, by the same functions as the
+blocking clients, so both behave the same way.
+"""
+
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import re
+from concurrent.futures import Future
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from gpy.exiftool.client import (
+    EXIFTOOL_EXECUTABLE,
+    STATUS_MARKER_REGEX,
+    DatesTriple,
+    ExifToolError,
+    ExifToolResult,
+    WriteResult,
+    _exit_code,
+    parse_dates_many_result,
+    parse_datetime_result,
+    parse_google_timestamp_result,
+    parse_write_ts_result,
+    read_dates_many_args,
+    read_datetime_args,
+    read_google_timestamp_args,
+    write_ts_args,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# {readyNUM} is written to stdout by exiftool once it runs `-executeNUM`
+READY_REGEX = re.compile(r"^\{ready(?P<seq>\d+)\}$")
+
+
+class AsyncExifTool:
+    """asyncio exiftool client which launches a new exiftool process per command.
+
+    Every public method builds the exiftool arguments and delegates the actual
+    execution to execute(), so that subclasses only need to change how the
+    arguments reach exiftool.
+    """
+
+    executable = EXIFTOOL_EXECUTABLE
+
+    async def __aenter__(self) -> "AsyncExifTool":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        pass
+
+    async def execute(self, args: Sequence[str]) -> ExifToolResult:
+        """Run exiftool with the given arguments and return its output."""
+        process = await asyncio.create_subprocess_exec(
+            self.executable,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        assert process.returncode is not None
+        return ExifToolResult(
+            exit_code=process.returncode,
+            stdout=stdout.decode("utf-8"),
+            stderr=stderr.decode("utf-8"),
+        )
+
+    async def read_datetime(self, file_path: Path) -> datetime.datetime:
+        """Return Date/Time from file, if any. Otherwise, raise."""
+        result = await self.execute(read_datetime_args(file_path))
+        return parse_datetime_result(file_path, result)
+
+    async def read_google_timestamp(self, path: Path) -> Optional[datetime.datetime]:
+        """Return XMP:CreateDate from file, if any. Otherwise, raise."""
+        result = await self.execute(read_google_timestamp_args(path))
+        return parse_google_timestamp_result(path, result)
+
+    async def read_dates_many(self, paths: Sequence[Path]) -> Dict[Path, DatesTriple]:
+        """Return metadata and Google dates of many files with a single command."""
+        if not paths:
+            return {}
+
+        result = await self.execute(read_dates_many_args(paths))
+        return parse_dates_many_result(paths, result)
+
+    async def write_ts(
+        self, path: Path, *, ts: datetime.datetime, backup: bool = False
+    ) -> WriteResult:
+        """Write Date/Time to file, with a single exiftool command."""
+        if not ts.tzinfo:
+            raise ExifToolError(f"timezone required to write {path}")
+
+        result = await self.execute(write_ts_args(path, ts=ts, backup=backup))
+        return parse_write_ts_result(path, result)
+
+
+class AsyncExifToolSession(AsyncExifTool):
+    """asyncio exiftool client which reuses a single long-lived exiftool process.
+
+    It speaks the same `-stay_open` protocol as ExifToolSession. Commands are
+    run one at a time: concurrent calls wait for their turn.
+
+    A command which is cancelled (e.g. by asyncio.wait_for) keeps running in
+    exiftool. Its output is skipped by the next command, which reads until its
+    own sentinels, so the stream stays in sync.
+    """
+
+    def __init__(self, executable: str = EXIFTOOL_EXECUTABLE) -> None:
+        self.executable = executable
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._sequence = itertools.count()
+        # Created on first use, in the event loop of the caller
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> "AsyncExifToolSession":
+        await self.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+
+        cmd = [self.executable, "-stay_open", "True", "-@", "-"]
+        logger.debug(f"Starting exiftool session: {' '.join(cmd)}")
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as exc:
+            raise ExifToolError(f"Could not start exiftool >>> {exc}") from exc
+
+    async def close(self) -> None:
+        process = self._process
+        if process is None:
+            return
+
+        self._process = None
+        logger.debug("Closing exiftool session")
+
+        try:
+            assert process.stdin
+            process.stdin.write(b"-stay_open\nFalse\n")
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def execute(self, args: Sequence[str]) -> ExifToolResult:
+        """Run a command in the exiftool process and return its output."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if not self.running:
+                await self.start()
+
+            process = self._process
+            assert process and process.stdin and process.stdout and process.stderr
+
+            seq = next(self._sequence)
+            lines = [*args, "-echo4", f"=${{status}}=post{seq}", f"-execute{seq}"]
+            # The whole command is buffered at once, so that a cancellation
+            # never leaves half of it in the pipe
+            process.stdin.write(b"\n".join(os.fsencode(a) for a in lines) + b"\n")
+            try:
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as exc:
+                await self.close()
+                raise ExifToolError("exiftool session died unexpectedly") from exc
+
+            # stderr is read at the same time as stdout: exiftool could
+            # otherwise block writing to a full stderr pipe
+            stdout, (stderr, exit_code) = await asyncio.gather(
+                self._read_stdout(process.stdout, seq),
+                self._read_stderr(process.stderr, seq),
+            )
+
+        return ExifToolResult(exit_code=exit_code, stdout=stdout, stderr=stderr)
+
+    async def _read_stdout(self, stream: asyncio.StreamReader, seq: int) -> str:
+        lines: List[bytes] = []
+
+        while True:
+            line = await stream.readline()
+            if not line:
+                await self.close()
+                raise ExifToolError("exiftool session died unexpectedly")
+
+            matches = READY_REGEX.match(line.decode("utf-8").rstrip("\r\n"))
+            if matches is None:
+                lines.append(line)
+            elif int(matches.group("seq")) == seq:
+                break
+            else:
+                # Output of a cancelled command
+                lines = []
+
+        return b"".join(lines).decode("utf-8")
+
+    async def _read_stderr(
+        self, stream: asyncio.StreamReader, seq: int
+    ) -> Tuple[str, int]:
+        lines: List[str] = []
+
+        while True:
+            line = (await stream.readline()).decode("utf-8", errors="replace")
+            if not line:
+                await self.close()
+                raise ExifToolError("exiftool session died unexpectedly")
+
+            matches = STATUS_MARKER_REGEX.match(line.rstrip("\r\n"))
+            if matches is None:
+                lines.append(line)
+            elif int(matches.group("seq")) == seq:
+                break
+            else:
+                # Output of a cancelled command
+                lines = []
+
+        stderr = "".join(lines)
+
+        return stderr, _exit_code(matches.group("status"), stderr)
+
+
+class AsyncExifToolPool(AsyncExifTool):
+    """asyncio exiftool client which spreads commands over several sessions.
+
+    Up to `size` commands run at the same time, each one in an idle session;
+    the others wait for a session to be free. Sessions are started on first use.
+    """
+
+    def __init__(self, size: int, executable: str = EXIFTOOL_EXECUTABLE) -> None:
+        if size < 1:
+            raise ValueError(f"Pool size must be positive, got {size}")
+
+        self.size = size
+        self.executable = executable
+        self._sessions = [AsyncExifToolSession(executable) for _ in range(size)]
+        # Created on first use, in the event loop of the caller
+        self._idle: "Optional[asyncio.Queue[AsyncExifToolSession]]" = None
+
+    async def __aenter__(self) -> "AsyncExifToolPool":
+        return self
+
+    async def close(self) -> None:
+        await asyncio.gather(*(session.close() for session in self._sessions))
+
+    async def execute(self, args: Sequence[str]) -> ExifToolResult:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for session in self._sessions:
+                self._idle.put_nowait(session)
+
+        session = await self._idle.get()
+        try:
+            return await session.execute(args)
+        finally:
+            self._idle.put_nowait(session)
+
+
+class BlockingExifTool:
+    """Blocking facade of an asyncio exiftool client, for threaded code.
+
+    The coroutines of the client run in `loop`, which must be running in
+    another thread, and the calling thread waits for their results. This lets
+    scan_date() read metadata through the sessions of an asyncio service:
+
+        blocking = BlockingExifTool(exiftool, asyncio.get_running_loop())
+        reports = await loop.run_in_executor(
+            None, scan_date, blocking, parse_datetime, path
+        )
+    """
+
+    def __init__(
+        self, exiftool: AsyncExifTool, loop: asyncio.AbstractEventLoop
+    ) -> None:
+        self.exiftool = exiftool
+        self.loop = loop
+
+    def read_datetime(self, file_path: Path) -> datetime.datetime:
+        return self._run(self.exiftool.read_datetime(file_path))
+
+    def read_google_timestamp(self, path: Path) -> Optional[datetime.datetime]:
+        return self._run(self.exiftool.read_google_timestamp(path))
+
+    def read_dates_many(self, paths: Sequence[Path]) -> Dict[Path, DatesTriple]:
+        return self._run(self.exiftool.read_dates_many(paths))
+
+    def write_ts(
+        self, path: Path, *, ts: datetime.datetime, backup: bool = False
+    ) -> WriteResult:
+        return self._run(self.exiftool.write_ts(path, ts=ts, backup=backup))
+
+    def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        future: "Future[T]" = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
@@ -5,15 +5,23 @@
 # Create a wrapper function which detects via filename and writes the metadata
 
 import datetime
+import itertools
 import logging
+import os
+import queue
 import re
 import subprocess
+import tempfile
+import threading
 from pathlib import Path
 from textwrap import indent
-from typing import Optional
+from types import TracebackType
+from typing import IO, Dict, List, Optional, Sequence, Tuple, Type
 
 import attr
 
+from gpy.exiftool.tags import FileTags, decode_json_output
+from gpy.filesystem import is_video
 from gpy.types import GpsCoordinates
 
 # def exiftool() -> None:
@@ -23,8 +31,13 @@ from gpy.types import GpsCoordinates
 
 logger = logging.getLogger(__name__)
 
+EXIFTOOL_EXECUTABLE = "exiftool"
 EXIFTOOL_TIMESTAMP_FORMAT = "%Y-%m-%d %h:%M:%s"
 
+# Machine-readable output: JSON, no print conversion and family 1 group names.
+# -a is needed to get duplicated tags from different groups (EXIF and XMP).
+READ_ARGS = ("-j", "-n", "-G1", "-a")
+
 
 @attr.s(auto_attribs=True, frozen=True)
 class ExifToolDatetime:
@@ -45,29 +58,23 @@ class ExifToolError(Exception):
     pass
 
 
-def clean_metadata(file_path: str, no_backup: bool = False) -> bool:
-    """Erase all metadata in the file.
+@attr.s(auto_attribs=True, frozen=True)
+class WriteResult:
+    path: Path
+    bytes_written: int
 
-    :param file_path: path of the file
-    :param no_backup: if true, don't do backup copy of the file
-    :type file_path: str
-    :type no_backup: bool
-    :returns: true if successful, otherwise false
-    :rtype: bool
+
+@attr.s(auto_attribs=True, frozen=True)
+class DatesTriple:
+    """Dates read from a single file in a bulk read.
+
+    `error` is set when exiftool could not read the file, in which case both
+    dates are None.
     """
-    shell_instruction = f"exiftool -all= {file_path}"
-    if no_backup:
-        shell_instruction += " -overwrite_original"
-    completed_process = subprocess.run(
-        shell_instruction, capture_output=True, shell=True
-    )
 
-    if completed_process.returncode != 0:
-        error_message = f"Writing date and time to '{file_path}' >>> "
-        error_message += completed_process.stderr.decode("utf-8").rstrip("\n")
-        logging.error(error_message)
-        return False
-    return True
+    metadata_date: Optional[datetime.datetime] = None
+    google_date: Optional[datetime.datetime] = None
+    error: Optional[str] = None
 
 
 def parse_date_from_filename(file_path: str) -> datetime.datetime:
@@ -145,45 +152,23 @@ def parse_datetime(output: str) -> datetime.datetime:
     return timestamp
 
 
-def read_datetime(file_path: Path) -> datetime.datetime:
-    """Return Date/Time from file, if any. Otherwise, raise."""
-    cmd = f'exiftool -AllDates "{file_path}"'
-    completed_process = subprocess.run(cmd, capture_output=True, shell=True)
-
-    if completed_process.returncode != 0:
-        error_message = f"Reading date and time from {file_path!r} >>> "
-        error_message += completed_process.stderr.decode("utf-8").rstrip("\n")
-        raise ExifToolError(error_message)
-
-    # Extract timestamp and format it as 'YYYY-MM-DD hh:mm:ss'
-    output = completed_process.stdout.decode("utf-8")
-    timestamp = parse_datetime(output)
-    return timestamp
-
-
-def read_google_timestamp(path: Path) -> Optional[datetime.datetime]:
-    """Return XMP:CreateDate from file, if any. Otherwise, raise."""
-    # exiftool -XMP:CreateDate foo/bar.jpg
-    cmd = f"exiftool -XMP:CreateDate {path}"
-    completed_process = subprocess.run(cmd, capture_output=True, shell=True)
-
-    if completed_process.returncode != 0:
-        error_message = f"Reading Google timestamp from {path!r} >>> "
-        error_message += completed_process.stderr.decode("utf-8").rstrip("\n")
-        raise ExifToolError(error_message)
-
-    # Extract timestamp and format it as 'YYYY-MM-DD hh:mm:ss.fff'
-    output = completed_process.stdout.decode("utf-8")
-    if not output:
-        return None
+def parse_dates(file_tags: FileTags) -> DatesTriple:
+    """Return the metadata and Google dates of a file."""
+    error = file_tags.error
+    if error:
+        return DatesTriple(error=error)
 
-    timestamp = parse_datetime(output)
-    return timestamp
+    return DatesTriple(
+        metadata_date=file_tags.metadata_date,
+        google_date=file_tags.google_date,
+    )
 
 
-def read_gps(file_path: Path) -> GpsCoordinates:
-    """Return GPS coordinates from file, if any."""
-    raise NotImplementedError("TODO > find out how pull GPS data with exiftool")
+def decode_file_tags(output: str) -> List[FileTags]:
+    try:
+        return decode_json_output(output)
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise ExifToolError(f"Unexpected exiftool output:\n{quote(output)}") from exc
 
 
 def format_timestamp(ts: datetime.datetime) -> str:
@@ -196,42 +181,593 @@ def format_timestamp(ts: datetime.datetime) -> str:
     return f"{formatted_timestamp}{timezone}"
 
 
-def write_ts(path: Path, *, ts: datetime.datetime, backup: bool = False) -> None:
-    """Write Date/Time to file.
+# Date tags written on top of -AllDates (DateTimeOriginal, CreateDate and
+# ModifyDate) in QuickTime videos, where each track has its own dates
+QUICKTIME_DATE_TAGS = (
+    "QuickTime:TrackCreateDate",
+    "QuickTime:TrackModifyDate",
+    "QuickTime:MediaCreateDate",
+    "QuickTime:MediaModifyDate",
+)
+
+
+# QuickTime dates are whole seconds, with no timezone: like cameras do, and
+# gpy.metadata.mp4 too, the local time is stored, without converting it to UTC.
+# exiftool only converts them to UTC with its QuickTimeUTC option, which is
+# turned off in case it is set in the exiftool config file.
+QUICKTIME_LOCAL_TIME_ARGS = ("-api", "QuickTimeUTC=0")
 
-    The Date/Time tag refers to the moment when the image/video was captured.
-    """
-    if not ts.tzinfo:
-        # TODO: get timezone info from default and log warning
-        raise NotImplementedError("TODO: handle when timezone is not present")
 
+def write_ts_args(path: Path, *, ts: datetime.datetime, backup: bool) -> List[str]:
+    """Return the exiftool arguments to write all the date tags of a file."""
     formatted_datetime = format_timestamp(ts)
 
-    # exiftool -a -XMP:CreateDate="2020:01:01 13:01:01.001" foo/bar.jpg
-    cmd_1 = f'exiftool -a -XMP:CreateDate="{formatted_datetime}" {path}'
-    # exiftool -a "-AllDates<XMP:CreateDate" foo/bar.jpg
-    cmd_2 = f'exiftool -a "-AllDates<XMP:CreateDate" {path}'
+    # exiftool -XMP:CreateDate="2020:01:01 13:01:01.001+01:00" \
+    #   -AllDates="2020:01:01 13:01:01.001+01:00" foo/bar.jpg
+    args = [f"-XMP:CreateDate={formatted_datetime}"]
+
+    if is_video(path):
+        local_time = ts.strftime("%Y:%m:%d %H:%M:%S")
+        args.append(f"-AllDates={local_time}")
+        args.extend(f"-{tag}={local_time}" for tag in QUICKTIME_DATE_TAGS)
+        args.extend(QUICKTIME_LOCAL_TIME_ARGS)
+    else:
+        args.append(f"-AllDates={formatted_datetime}")
+
+    args.append(str(path))
 
     if backup is False:
-        cmd_1 += " -overwrite_original"
-        cmd_2 += " -overwrite_original"
+        args.append("-overwrite_original")
 
-    completed_process_1 = subprocess.run(cmd_1, capture_output=True, shell=True)
+    return args
 
-    if completed_process_1.returncode != 0:
-        error_message = f"Writing date and time to '{path}' >>> "
-        error_message += completed_process_1.stderr.decode("utf-8").rstrip("\n")
-        # TODO: raise context!
+
+def read_datetime_args(path: Path) -> List[str]:
+    # exiftool -j -n -G1 -a -AllDates foo/bar.jpg
+    return [*READ_ARGS, "-AllDates", str(path)]
+
+
+def parse_datetime_result(path: Path, result: ExifToolResult) -> datetime.datetime:
+    """Return the Date/Time read by exiftool, or raise."""
+    if result.exit_code != 0:
+        error_message = f"Reading date and time from {path!r} >>> "
+        error_message += result.stderr.rstrip("\n")
         raise ExifToolError(error_message)
 
-    completed_process_2 = subprocess.run(cmd_2, capture_output=True, shell=True)
+    if not result.stdout:
+        raise ExifToolError("Output is empty")
+
+    timestamp = None
+    for file_tags in decode_file_tags(result.stdout):
+        timestamp = file_tags.metadata_date
+
+    if timestamp is None:
+        raise ExifToolError(
+            "No supported timestamps found in the following output:\n"
+            f"{quote(result.stdout)}"
+        )
+
+    return timestamp
+
+
+def read_google_timestamp_args(path: Path) -> List[str]:
+    # exiftool -j -n -G1 -a -XMP:CreateDate foo/bar.jpg
+    return [*READ_ARGS, "-XMP:CreateDate", str(path)]
+
+
+def parse_google_timestamp_result(
+    path: Path, result: ExifToolResult
+) -> Optional[datetime.datetime]:
+    """Return the XMP:CreateDate read by exiftool, if any, or raise."""
+    if result.exit_code != 0:
+        error_message = f"Reading Google timestamp from {path!r} >>> "
+        error_message += result.stderr.rstrip("\n")
+        raise ExifToolError(error_message)
+
+    for file_tags in decode_file_tags(result.stdout):
+        return file_tags.google_date
+
+    return None
+
 
-    if completed_process_2.returncode != 0:
+def read_dates_many_args(paths: Sequence[Path]) -> List[str]:
+    return [*READ_ARGS, "-AllDates", "-XMP:CreateDate", *(str(p) for p in paths)]
+
+
+def parse_dates_many_result(
+    paths: Sequence[Path], result: ExifToolResult
+) -> Dict[Path, DatesTriple]:
+    """Return the dates of each file read by exiftool.
+
+    Files missing from the output are reported with an error.
+    """
+    tags_by_file = {
+        file_tags.source_file: file_tags
+        for file_tags in decode_file_tags(result.stdout)
+    }
+
+    missing_error = result.stderr.rstrip("\n") or "No output from exiftool"
+
+    dates: Dict[Path, DatesTriple] = {}
+    for path in paths:
+        tags = tags_by_file.get(str(path))
+        if tags is None:
+            dates[path] = DatesTriple(error=_file_error(missing_error, path))
+        else:
+            dates[path] = parse_dates(tags)
+
+    return dates
+
+
+def parse_write_ts_result(path: Path, result: ExifToolResult) -> WriteResult:
+    if result.exit_code != 0:
         error_message = f"Writing date and time to '{path}' >>> "
-        error_message += completed_process_2.stderr.decode("utf-8").rstrip("\n")
+        error_message += result.stderr.rstrip("\n")
         # TODO: raise context!
         raise ExifToolError(error_message)
 
+    # exiftool writes the whole file anew, even if only a tag changes
+    return WriteResult(path=path, bytes_written=path.stat().st_size)
+
+
+class ExifTool:
+    """exiftool client which launches a new exiftool process per command.
+
+    Every public method builds the exiftool arguments and delegates the actual
+    execution to execute(), so that subclasses only need to change how the
+    arguments reach exiftool.
+    """
+
+    executable = EXIFTOOL_EXECUTABLE
+
+    def execute(self, args: Sequence[str]) -> ExifToolResult:
+        """Run exiftool with the given arguments and return its output."""
+        completed_process = subprocess.run(
+            [self.executable, *args], capture_output=True
+        )
+        return ExifToolResult(
+            exit_code=completed_process.returncode,
+            stdout=completed_process.stdout.decode("utf-8"),
+            stderr=completed_process.stderr.decode("utf-8"),
+        )
+
+    def clean_metadata(self, file_path: str, no_backup: bool = False) -> bool:
+        """Erase all metadata in the file.
+
+        :param file_path: path of the file
+        :param no_backup: if true, don't do backup copy of the file
+        :type file_path: str
+        :type no_backup: bool
+        :returns: true if successful, otherwise false
+        :rtype: bool
+        """
+        args = ["-all=", file_path]
+        if no_backup:
+            args.append("-overwrite_original")
+        result = self.execute(args)
+
+        if result.exit_code != 0:
+            error_message = f"Writing date and time to '{file_path}' >>> "
+            error_message += result.stderr.rstrip("\n")
+            logging.error(error_message)
+            return False
+        return True
+
+    def read_datetime(self, file_path: Path) -> datetime.datetime:
+        """Return Date/Time from file, if any. Otherwise, raise."""
+        result = self.execute(read_datetime_args(file_path))
+        return parse_datetime_result(file_path, result)
+
+    def read_google_timestamp(self, path: Path) -> Optional[datetime.datetime]:
+        """Return XMP:CreateDate from file, if any. Otherwise, raise."""
+        result = self.execute(read_google_timestamp_args(path))
+        return parse_google_timestamp_result(path, result)
+
+    def read_dates_many(self, paths: Sequence[Path]) -> Dict[Path, DatesTriple]:
+        """Return metadata and Google dates of many files with a single command.
+
+        Files that exiftool fails to read are reported with an error, instead
+        of failing the whole batch.
+        """
+        if not paths:
+            return {}
+
+        result = self.execute(read_dates_many_args(paths))
+        return parse_dates_many_result(paths, result)
+
+    def read_gps(self, file_path: Path) -> GpsCoordinates:
+        """Return GPS coordinates from file, if any."""
+        raise NotImplementedError("TODO > find out how pull GPS data with exiftool")
+
+    def write_ts(
+        self, path: Path, *, ts: datetime.datetime, backup: bool = False
+    ) -> WriteResult:
+        """Write Date/Time to file.
+
+        The Date/Time tag refers to the moment when the image/video was captured.
+        All the date tags are written with a single exiftool command, so the file
+        is only rewritten once.
+        """
+        if not ts.tzinfo:
+            # TODO: get timezone info from default and log warning
+            raise NotImplementedError("TODO: handle when timezone is not present")
+
+        result = self.execute(write_ts_args(path, ts=ts, backup=backup))
+        return parse_write_ts_result(path, result)
+
+    def write_ts_many(
+        self, timestamps: Sequence[Tuple[Path, datetime.datetime]], *, backup: bool
+    ) -> Dict[Path, Optional[str]]:
+        """Write a Date/Time to each file with a single exiftool process.
+
+        The arguments of every file are put in an argfile, one command per
+        file, and exiftool runs them all in a new process, which reads the
+        argfile with `-@`. Return the error of each file, or None if the file
+        was written.
+        """
+        if not timestamps:
+            return {}
+
+        for path, ts in timestamps:
+            if not ts.tzinfo:
+                raise ExifToolError(f"timezone required to write {path}")
+
+        lines: List[str] = []
+        for seq, (path, ts) in enumerate(timestamps):
+            args = write_ts_args(path, ts=ts, backup=backup)
+            lines.extend([*args, "-echo4", f"=${{status}}=post{seq}", "-execute"])
+
+        with tempfile.NamedTemporaryFile(suffix=".args", delete=False) as argfile:
+            argfile.write(b"\n".join(os.fsencode(line) for line in lines))
+            argfile.write(b"\n")
+
+        try:
+            result = ExifTool.execute(self, ["-@", argfile.name])
+        finally:
+            os.unlink(argfile.name)
+
+        statuses, unfinished_stderr = _split_statuses(result.stderr)
+        missing_error = unfinished_stderr.rstrip("\n") or "No output from exiftool"
+
+        errors: Dict[Path, Optional[str]] = {}
+        for seq, (path, _) in enumerate(timestamps):
+            if seq not in statuses:
+                errors[path] = _file_error(missing_error, path)
+                continue
+
+            exit_code, stderr = statuses[seq]
+            errors[path] = None
+            if exit_code != 0:
+                error_message = f"Writing date and time to '{path}' >>> "
+                errors[path] = error_message + stderr.rstrip("\n")
+
+        return errors
+
+    def write_geolocation(
+        self,
+        file_path: str,
+        *,
+        north: float,
+        west: float,
+        no_backup: bool,
+    ) -> bool:
+        """Write GPS coordinates to file.
+
+        :param file_path: path of the file
+        :param north: latitude, North based
+        :param west: longitude, West based
+        :param no_backup: if true, don't do backup copy of the file
+        :type file_path: str
+        :type north: float
+        :type west: float
+        :type no_backup: bool
+        :returns: true if successful, otherwise false
+        :rtype: bool
+        """
+        args = [
+            f"-XMP:GPSLatitude={north}",
+            f"-XMP:GPSLongitude={west}",
+            "-GPSLatitudeRef=North",
+            "-GPSLongitudeRef=West",
+            file_path,
+        ]
+        if no_backup:
+            args.append("-overwrite_original")
+        result = self.execute(args)
+
+        if result.exit_code != 0:
+            error_message = f"Writing GPS coordinates to '{file_path}' >>> "
+            error_message += result.stderr.rstrip("\n")
+            logger.error(error_message)
+            return False
+        return True
+
+
+# Marker echoed to stderr once exiftool finishes a command. The ${status}
+# placeholder is replaced by exiftool with the exit status of the command.
+STATUS_MARKER_REGEX = re.compile(r"^=(?P<status>\S*)=post(?P<seq>\d+)$")
+
+
+class ExifToolSession(ExifTool):
+    """exiftool client which reuses a single long-lived exiftool process.
+
+    The process is started with `-stay_open True -@ -`, so exiftool reads
+    arguments (one per line) from stdin and runs them every time it reads an
+    `-executeNUM` line. Once done, it writes `{readyNUM}` to stdout and, thanks
+    to the `-echo4` option, a status marker to stderr. These sentinels are used
+    to know where the output of each command ends.
+
+    Use it as a context manager to make sure the process is terminated:
+
+        with ExifToolSession() as exiftool:
+            exiftool.read_datetime(path)
+    """
+
+    def __init__(self, executable: str = EXIFTOOL_EXECUTABLE) -> None:
+        self.executable = executable
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr_lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ExifToolSession":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        cmd = [self.executable, "-stay_open", "True", "-@", "-"]
+        logger.debug(f"Starting exiftool session: {' '.join(cmd)}")
+        try:
+            self._process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as exc:
+            raise ExifToolError(f"Could not start exiftool >>> {exc}") from exc
+
+        # stderr is drained in the background: exiftool could otherwise block
+        # writing to a full stderr pipe while we wait for stdout
+        self._stderr_lines = queue.Queue()
+        assert self._process.stderr
+        drainer = threading.Thread(
+            target=_drain_lines,
+            args=(self._process.stderr, self._stderr_lines),
+            daemon=True,
+        )
+        drainer.start()
+
+    def close(self) -> None:
+        # Wait for the command being run by another thread, if any
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        process = self._process
+        if process is None:
+            return
+
+        self._process = None
+        logger.debug("Closing exiftool session")
+
+        try:
+            assert process.stdin
+            process.stdin.write(b"-stay_open\nFalse\n")
+            process.stdin.flush()
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+        if process.stdout:
+            process.stdout.close()
+
+    def execute(self, args: Sequence[str]) -> ExifToolResult:
+        """Run a command in the exiftool process and return its output."""
+        with self._lock:
+            if not self.running:
+                self.start()
+
+            process = self._process
+            assert process and process.stdin and process.stdout
+
+            seq = next(self._sequence)
+            lines = [*args, "-echo4", f"=${{status}}=post{seq}", f"-execute{seq}"]
+            try:
+                process.stdin.write(b"\n".join(os.fsencode(a) for a in lines))
+                process.stdin.write(b"\n")
+                process.stdin.flush()
+            except BrokenPipeError as exc:
+                self._close()
+                raise ExifToolError("exiftool session died unexpectedly") from exc
+
+            stdout = self._read_stdout(process.stdout, seq)
+            stderr, exit_code = self._read_stderr(seq)
+
+        return ExifToolResult(exit_code=exit_code, stdout=stdout, stderr=stderr)
+
+    def _read_stdout(self, stream: IO[bytes], seq: int) -> str:
+        sentinel = f"{{ready{seq}}}".encode()
+        lines: List[bytes] = []
+
+        while True:
+            line = stream.readline()
+            if not line:
+                self._close()
+                raise ExifToolError("exiftool session died unexpectedly")
+
+            if line.rstrip(b"\r\n") == sentinel:
+                break
+
+            lines.append(line)
+
+        return b"".join(lines).decode("utf-8")
+
+    def _read_stderr(self, seq: int) -> Tuple[str, int]:
+        lines: List[str] = []
+
+        while True:
+            line = self._stderr_lines.get()
+            if line is None:
+                self._close()
+                raise ExifToolError("exiftool session died unexpectedly")
+
+            matches = STATUS_MARKER_REGEX.match(line.rstrip("\r\n"))
+            if matches is None:
+                lines.append(line)
+            elif int(matches.group("seq")) == seq:
+                break
+
+        stderr = "".join(lines)
+
+        return stderr, _exit_code(matches.group("status"), stderr)
+
+
+class ExifToolPool(ExifTool):
+    """exiftool client which spreads commands over several exiftool sessions.
+
+    Each command runs in the first idle session, so the pool can be shared by
+    as many threads as sessions it has. Sessions are started on first use.
+    """
+
+    def __init__(self, size: int, executable: str = EXIFTOOL_EXECUTABLE) -> None:
+        if size < 1:
+            raise ValueError(f"Pool size must be positive, got {size}")
+
+        self.size = size
+        self.executable = executable
+        self._sessions = [ExifToolSession(executable) for _ in range(size)]
+        self._idle: "queue.Queue[ExifToolSession]" = queue.Queue()
+        for session in self._sessions:
+            self._idle.put(session)
+
+    def __enter__(self) -> "ExifToolPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for session in self._sessions:
+            session.close()
+
+    def execute(self, args: Sequence[str]) -> ExifToolResult:
+        session = self._idle.get()
+        try:
+            return session.execute(args)
+        finally:
+            self._idle.put(session)
+
+
+def _exit_code(status: str, stderr: str) -> int:
+    if status.isdigit():
+        return int(status)
+
+    # exiftool versions which do not support ${status} echo it verbatim
+    return 1 if "Error" in stderr else 0
+
+
+def _split_statuses(stderr: str) -> Tuple[Dict[int, Tuple[int, str]], str]:
+    """Return the exit code and stderr of each command run from an argfile.
+
+    Each command echoes a status marker to stderr once it finishes, so the
+    lines before a marker belong to its command. The lines after the last
+    marker, if any, are returned too: they belong to unfinished commands.
+    """
+    statuses: Dict[int, Tuple[int, str]] = {}
+    lines: List[str] = []
+
+    for line in stderr.splitlines(keepends=True):
+        matches = STATUS_MARKER_REGEX.match(line.rstrip("\r\n"))
+        if matches is None:
+            lines.append(line)
+            continue
+
+        command_stderr = "".join(lines)
+        exit_code = _exit_code(matches.group("status"), command_stderr)
+        statuses[int(matches.group("seq"))] = (exit_code, command_stderr)
+        lines = []
+
+    return statuses, "".join(lines)
+
+
+def _file_error(stderr: str, path: Path) -> str:
+    """Return the stderr lines related to a given file, or all of them."""
+    lines = [line for line in stderr.splitlines() if str(path) in line]
+    if not lines:
+        return stderr
+
+    return "\n".join(lines)
+
+
+def _drain_lines(stream: IO[bytes], lines: "queue.Queue[Optional[str]]") -> None:
+    for line in iter(stream.readline, b""):
+        lines.put(line.decode("utf-8", errors="replace"))
+
+    lines.put(None)  # signal end of stream
+    stream.close()
+
+
+# Module level API kept for backwards compatibility: each call runs a one-off
+# exiftool process. Use ExifToolSession to reuse a single process instead.
+_exiftool = ExifTool()
+
+
+def clean_metadata(file_path: str, no_backup: bool = False) -> bool:
+    """Erase all metadata in the file."""
+    return _exiftool.clean_metadata(file_path, no_backup=no_backup)
+
+
+def read_datetime(file_path: Path) -> datetime.datetime:
+    """Return Date/Time from file, if any. Otherwise, raise."""
+    return _exiftool.read_datetime(file_path)
+
+
+def read_google_timestamp(path: Path) -> Optional[datetime.datetime]:
+    """Return XMP:CreateDate from file, if any. Otherwise, raise."""
+    return _exiftool.read_google_timestamp(path)
+
+
+def read_dates_many(paths: Sequence[Path]) -> Dict[Path, DatesTriple]:
+    """Return metadata and Google dates of many files with a single command."""
+    return _exiftool.read_dates_many(paths)
+
+
+def read_gps(file_path: Path) -> GpsCoordinates:
+    """Return GPS coordinates from file, if any."""
+    return _exiftool.read_gps(file_path)
+
+
+def write_ts(path: Path, *, ts: datetime.datetime, backup: bool = False) -> WriteResult:
+    """Write Date/Time to file."""
+    return _exiftool.write_ts(path, ts=ts, backup=backup)
+
 
 def write_geolocation(
     file_path: str,
@@ -240,29 +776,7 @@ def write_geolocation(
     west: float,
     no_backup: bool,
 ) -> bool:
-    """Write GPS coordinates to file.
-
-    :param file_path: path of the file
-    :param north: latitude, North based
-    :param west: longitude, West based
-    :param no_backup: if true, don't do backup copy of the file
-    :type file_path: str
-    :type north: float
-    :type west: float
-    :type no_backup: bool
-    :returns: true if successful, otherwise false
-    :rtype: bool
-    """
-    shell_instruction = f'exiftool -XMP:GPSLatitude="{north}" -XMP:GPSLongitude="{west}" -GPSLatitudeRef="North" -GPSLongitudeRef="West" {file_path}'  # noqa
-    if no_backup:
-        shell_instruction += " -overwrite_original"
-    completed_process = subprocess.run(
-        shell_instruction, capture_output=True, shell=True
+    """Write GPS coordinates to file."""
+    return _exiftool.write_geolocation(
+        file_path, north=north, west=west, no_backup=no_backup
     )
-
-    if completed_process.returncode != 0:
-        error_message = f"Writing GPS coordinates to '{file_path}' >>> "
-        error_message += completed_process.stderr.decode("utf-8").rstrip("\n")
-        logger.error(error_message)
-        return False
-    return True
@@ -0,0 +1,175 @@
+"""This module decodes the machine-readable output of `exiftool -j -n -G1`."""
+
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import attr
+
+# Key used by exiftool to report per-file errors in the JSON output
+ERROR_TAG = "Error"
+
+GroupAndTag = Tuple[str, str]
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class FileTags:
+    """Tags read from a single file, keyed by (family 1 group, tag name).
+
+    When exiftool runs without -G1 the group is an empty string.
+    """
+
+    source_file: str
+    tags: Dict[GroupAndTag, Any]
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "FileTags":
+        tags: Dict[GroupAndTag, Any] = {}
+        source_file = ""
+        for key, value in data.items():
+            if key == "SourceFile":
+                source_file = str(value)
+                continue
+
+            group, _, tag = key.rpartition(":")
+            tags[(group, tag)] = value
+
+        return cls(source_file=source_file, tags=tags)
+
+    @property
+    def error(self) -> Optional[str]:
+        for (_, tag), value in self.tags.items():
+            if tag == ERROR_TAG:
+                return str(value)
+
+        return None
+
+    def find_timestamp(
+        self, tag: str, group_prefix: str = "", exclude_prefix: Optional[str] = None
+    ) -> Optional[datetime.datetime]:
+        """Return the first valid timestamp in `tag`, if any."""
+        for (group, name), value in self.tags.items():
+            if name != tag or not group.startswith(group_prefix):
+                continue
+
+            if exclude_prefix and group.startswith(exclude_prefix):
+                continue
+
+            timestamp = parse_timestamp(value)
+            if timestamp:
+                return timestamp
+
+        return None
+
+    @property
+    def metadata_date(self) -> Optional[datetime.datetime]:
+        """Return the capture date, as `exiftool -AllDates` would show it.
+
+        DateTimeOriginal wins, then CreateDate from EXIF/QuickTime and, as a
+        last resort, the XMP CreateDate.
+        """
+        timestamp = self.find_timestamp("DateTimeOriginal")
+        if timestamp is None:
+            timestamp = self.find_timestamp("CreateDate", exclude_prefix="XMP")
+        if timestamp is None:
+            timestamp = self.find_timestamp("CreateDate", group_prefix="XMP")
+
+        return timestamp
+
+    @property
+    def google_date(self) -> Optional[datetime.datetime]:
+        """Return XMP:CreateDate, which is the date used by Google Photos."""
+        return self.find_timestamp("CreateDate", group_prefix="XMP")
+
+
+def decode_json_output(output: str) -> List[FileTags]:
+    """Decode the output of `exiftool -j` into one FileTags per file."""
+    if not output.strip():
+        return []
+
+    data = json.loads(output)
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of files, got {type(data).__name__}")
+
+    return [FileTags.from_json(file_data) for file_data in data]
+
+
+def parse_timestamp(value: Any) -> Optional[datetime.datetime]:
+    """Return the timestamp in an exiftool date value, if any.
+
+    Supported formats, where the separators may also be ISO 8601 ones:
+
+        2019:02:02 18:44:43
+        2019:02:02 18:44:43.001
+        2019:02:02 18:44:43.001+01:00
+        2019:02:02 18:44:43Z
+
+    The fields are sliced at fixed offsets instead of using regular expressions,
+    as this function runs once per tag and file.
+    """
+    if not isinstance(value, str) or len(value) < 19:
+        return None
+
+    if value[4] not in ":-" or value[7] not in ":-" or value[10] not in " T":
+        return None
+
+    try:
+        year = int(value[0:4])
+        month = int(value[5:7])
+        day = int(value[8:10])
+        hour = int(value[11:13])
+        minute = int(value[14:16])
+        second = int(value[17:19])
+    except ValueError:
+        return None
+
+    # 0000:00:00 00:00:00 is what cameras write when the clock is not set
+    if year == 0 or month == 0 or day == 0:
+        return None
+
+    rest = value[19:]
+
+    microsecond = 0
+    if rest.startswith("."):
+        end = 1
+        while end < len(rest) and rest[end].isdigit():
+            end += 1
+        fraction = rest[1:end]
+        rest = rest[end:]
+        if fraction:
+            microsecond = int(fraction[:6].ljust(6, "0"))
+
+    tzinfo = _parse_timezone(rest)
+
+    try:
+        return datetime.datetime(
+            year, month, day, hour, minute, second, microsecond, tzinfo=tzinfo
+        )
+    except ValueError:
+        return None
+
+
+_TIMEZONES: Dict[str, datetime.timezone] = {}
+
+
+def _parse_timezone(value: str) -> Optional[datetime.timezone]:
+    if value.startswith("Z"):
+        return datetime.timezone.utc
+
+    if len(value) < 6 or value[0] not in "+-" or value[3] != ":":
+        return None
+
+    offset = value[:6]
+    if offset not in _TIMEZONES:
+        try:
+            hours = int(offset[1:3])
+            minutes = int(offset[4:6])
+        except ValueError:
+            return None
+
+        delta = datetime.timedelta(hours=hours, minutes=minutes)
+        if offset[0] == "-":
+            delta = -delta
+        _TIMEZONES[offset] = datetime.timezone(delta)
+
+    return _TIMEZONES[offset]
@@ -1,90 +1,191 @@
-"""This module contains the logic to parse dates from file names."""
+"""This module contains the logic to parse dates from file names.
+
+Every supported naming scheme is registered in SCHEMES. All the schemes are
+compiled into a single regular expression, so a file name is matched against
+all of them in one pass, and the name of the matching group tells which scheme
+it follows.
+"""
+
 import datetime
 import re
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
 
-DatetimeParser = Callable[[str], Optional[datetime.datetime]]
+import attr
 
+DatetimeParser = Callable[[str], Optional[datetime.datetime]]
 
-def parse_datetime(file_name: str) -> Optional[datetime.datetime]:
-    """Return timestamp from file name."""
-    case_1 = _parse_case_a(file_name)
-    if case_1:
-        return case_1
-    case_2 = _parse_case_b(file_name)
-    if case_2:
-        return case_2
-    case_3 = _parse_case_c(file_name)
-    if case_3:
-        return case_3
-    case_4 = _parse_case_d(file_name)
-    if case_4:
-        return case_4
-
-    return None
-
-
-def _parse_case_a(file_name: str) -> Optional[datetime.datetime]:
-    """Return timestamp from file name.
-
-    IMG_YYYYMMDD_hhmmss_XXX.jpg, where XXX is a counter
+# Placeholders available in the scheme patterns, and what they match
+FIELDS = {
+    "Y": "[0-9]{4}",
+    "M": "[0-9]{2}",
+    "D": "[0-9]{2}",
+    "h": "[0-9]{2}",
+    "m": "[0-9]{2}",
+    "s": "[0-9]{2}",
+}
+FIELD_REGEX = re.compile(r"\{(" + "|".join(FIELDS) + r")\}")
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class FilenameScheme:
+    """File naming scheme.
+
+    `pattern` is a regular expression matched against the start of the file
+    name, where {Y}, {M}, {D}, {h}, {m} and {s} stand for the date and time
+    fields. Schemes without date fields are only identified.
     """
-    pattern = r"IMG_([0-9]{4})([0-9]{2})([0-9]{2})_([0-9]{2})([0-9]{2})([0-9]{2})_[0-9]{3}.jpg"
-    matches = re.match(pattern, file_name)
+
+    name: str
+    pattern: str
+    example: str
+    tzinfo: Optional[datetime.tzinfo] = None
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        return tuple(FIELD_REGEX.findall(self.pattern))
+
+    def to_regex(self) -> str:
+        """Return the pattern with its fields as named groups."""
+
+        def named_group(matches: "re.Match[str]") -> str:
+            field = matches.group(1)
+            return f"(?P<{self.name}__{field}>{FIELDS[field]})"
+
+        return f"(?P<{self.name}>{FIELD_REGEX.sub(named_group, self.pattern)})"
+
+
+SCHEMES = (
+    FilenameScheme(
+        name="android_image",
+        pattern=r"IMG_{Y}{M}{D}_{h}{m}{s}_[0-9]{3}(?i:\.jpg)",
+        example="IMG_20190101_085024_211.jpg",
+    ),
+    FilenameScheme(
+        name="android_video",
+        pattern=r"VID_{Y}{M}{D}_{h}{m}{s}_[0-9]{3}(?i:\.mp4)",
+        example="VID_20190101_085024_211.mp4",
+    ),
+    FilenameScheme(
+        name="whatsapp_image",
+        pattern=r"IMG-{Y}{M}{D}-WA[0-9]{4}(?i:\.jpe?g)",
+        example="IMG-20190101-WA0001.jpeg",
+    ),
+    FilenameScheme(
+        name="whatsapp_video",
+        pattern=r"VID-{Y}{M}{D}-WA[0-9]{4}(?i:\.mp4)",
+        example="VID-20190101-WA0001.mp4",
+    ),
+    FilenameScheme(
+        name="whatsapp_export",
+        pattern=r"WhatsApp (?:Image|Video) {Y}-{M}-{D} at {h}\.{m}\.{s}",
+        example="WhatsApp Image 2019-01-01 at 08.50.24.jpeg",
+    ),
+    FilenameScheme(
+        # Pixel phones name files after the UTC time
+        name="pixel",
+        pattern=r"PXL_{Y}{M}{D}_{h}{m}{s}[0-9]{3}",
+        example="PXL_20190101_085024211.jpg",
+        tzinfo=datetime.timezone.utc,
+    ),
+    FilenameScheme(
+        name="samsung",
+        pattern=r"{Y}{M}{D}_{h}{m}{s}(?:\([0-9]+\))?\.",
+        example="20190101_085024.jpg",
+    ),
+    FilenameScheme(
+        name="screenshot",
+        pattern=r"Screenshot_{Y}{M}{D}-{h}{m}{s}",
+        example="Screenshot_20190101-085024.png",
+    ),
+    FilenameScheme(
+        name="screenshot_dashed",
+        pattern=r"Screenshot_{Y}-{M}-{D}-{h}-{m}-{s}",
+        example="Screenshot_2019-01-01-08-50-24-211_com.android.chrome.jpg",
+    ),
+    FilenameScheme(
+        name="dsc",
+        pattern=r"DSC[_F]?[0-9]{4,5}\.",
+        example="DSC_0001.JPG",
+    ),
+    FilenameScheme(
+        name="gopro",
+        pattern=r"(?:GOPR[0-9]{4}|G[HX][0-9]{6})\.",
+        example="GOPR0001.MP4",
+    ),
+)
+
+COMBINED_REGEX: Pattern[str] = re.compile(
+    "|".join(scheme.to_regex() for scheme in SCHEMES)
+)
+
+# Group index of each scheme, as reported by Match.lastindex, and the group
+# indexes of its date fields, ready for Match.group(*indexes)
+_SCHEME_NAMES: Dict[int, str] = {
+    COMBINED_REGEX.groupindex[scheme.name]: scheme.name for scheme in SCHEMES
+}
+_DATE_FIELDS: Dict[int, Tuple[Tuple[int, ...], Optional[datetime.tzinfo]]] = {
+    COMBINED_REGEX.groupindex[scheme.name]: (
+        tuple(
+            COMBINED_REGEX.groupindex[f"{scheme.name}__{field}"]
+            for field in FIELDS
+            if field in scheme.fields
+        ),
+        scheme.tzinfo,
+    )
+    for scheme in SCHEMES
+    if scheme.fields
+}
+
+_NUMBERS: Dict[str, int] = {
+    **{f"{number:02}": number for number in range(100)},
+    **{f"{number:04}": number for number in range(10_000)},
+}
+
+
+def identify_scheme(file_name: str) -> Optional[str]:
+    """Return the name of the scheme the file name follows, if any."""
+    matches = COMBINED_REGEX.match(file_name)
     if matches is None:
         return None
-    year = int(matches.group(1))
-    month = int(matches.group(2))
-    day = int(matches.group(3))
-    h = int(matches.group(4))
-    m = int(matches.group(5))
-    s = int(matches.group(6))
-    return datetime.datetime(year, month, day, h, m, s)
 
+    assert matches.lastindex
+    return _SCHEME_NAMES[matches.lastindex]
 
-def _parse_case_b(file_name: str) -> Optional[datetime.datetime]:
-    """Return timestamp from file name.
 
-    VID_YYYYMMDD_hhmmss_XXX.mp4, where XXX is a counter
-    """
-    pattern = r"VID_([0-9]{4})([0-9]{2})([0-9]{2})_([0-9]{2})([0-9]{2})([0-9]{2})_[0-9]{3}.mp4"
-    matches = re.match(pattern, file_name)
+def parse_datetime(file_name: str) -> Optional[datetime.datetime]:
+    """Return timestamp from file name."""
+    matches = COMBINED_REGEX.match(file_name)
     if matches is None:
         return None
-    year = int(matches.group(1))
-    month = int(matches.group(2))
-    day = int(matches.group(3))
-    h = int(matches.group(4))
-    m = int(matches.group(5))
-    s = int(matches.group(6))
-    return datetime.datetime(year, month, day, h, m, s)
-
-
-def _parse_case_c(file_name: str) -> Optional[datetime.datetime]:
-    """Return timestamp from file name.
 
-    IMG-YYYYMMDD-WAXXXX.jpeg, where XXXX is a counter
-    """
-    pattern = r"IMG-([0-9]{4})([0-9]{2})([0-9]{2})-WA[0-9]{4}.jpeg"
-    matches = re.match(pattern, file_name)
-    if matches is None:
+    date_fields = _DATE_FIELDS.get(matches.lastindex)  # type: ignore[arg-type]
+    if date_fields is None:  # the scheme has no date
         return None
-    year = int(matches.group(1))
-    month = int(matches.group(2))
-    day = int(matches.group(3))
-    return datetime.datetime(year, month, day)
 
+    indexes, tzinfo = date_fields
+    if len(indexes) == 3:
+        year, month, day = matches.group(*indexes)
+        hour = minute = second = "00"
+    else:
+        year, month, day, hour, minute, second = matches.group(*indexes)
+
+    # Dictionary lookups are several times faster than int()
+    numbers = _NUMBERS
+    try:
+        return datetime.datetime(
+            numbers[year],
+            numbers[month],
+            numbers[day],
+            numbers[hour],
+            numbers[minute],
+            numbers[second],
+            tzinfo=tzinfo,
+        )
+    except ValueError:  # e.g. IMG_20191301_085024_211.jpg
+        return None
 
-def _parse_case_d(file_name: str) -> Optional[datetime.datetime]:
-    """Return timestamp from file name.
 
-    VID-YYYYMMDD-WAXXXX.mp4, where XXXX is a counter
-    """
-    pattern = r"VID-([0-9]{4})([0-9]{2})([0-9]{2})-WA[0-9]{4}.mp4"
-    matches = re.match(pattern, file_name)
-    if matches is None:
-        return None
-    year = int(matches.group(1))
-    month = int(matches.group(2))
-    day = int(matches.group(3))
-    return datetime.datetime(year, month, day)
+def parse_many(file_names: Iterable[str]) -> List[Optional[datetime.datetime]]:
+    """Return the timestamps of many file names, in the same order."""
+    parse = parse_datetime
+    return [parse(file_name) for file_name in file_names]
@@ -1,44 +1,277 @@
+import gzip
+import io
+import itertools
 import json
 import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict, Iterator, List
+from textwrap import indent
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
+from gpy import columnar
 from gpy.types import Report, structure, unstructure
 
 logger = logging.getLogger(__name__)
 
 
+VIDEO_SUFFIXES = (".mp4", ".3gp")
+
+# Characters read at once from JSON reports
+READ_CHUNK_SIZE = 1 << 16
+JSON_WHITESPACE = " \t\n\r"
+
+
 def is_supported(path: Path) -> bool:
-    return path.suffix.lower() in (".jpg", ".png", ".mp4", ".3gp")
+    return path.suffix.lower() in (".jpg", ".png", *VIDEO_SUFFIXES)
 
 
-def get_paths_recursive(*, root_path: Path) -> Iterator[Path]:
-    """Yield absolute path of supported files under root_path.
+def is_video(path: Path) -> bool:
+    return path.suffix.lower() in VIDEO_SUFFIXES
 
-    Refer to is_supported() for further information on supported files.
+
+class FileEntry:
+    """Supported file found while walking a directory tree.
+
+    The stat() result is cached, and comes for free from os.scandir() on some
+    platforms, so callers should use it instead of calling Path.stat() again.
+    """
+
+    __slots__ = ("path", "_entry", "_stat")
+
+    def __init__(self, path: Path, entry: Optional[os.DirEntry] = None) -> None:
+        self.path = path
+        self._entry = entry
+        self._stat: Optional[os.stat_result] = None
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.path!r})"
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = self._entry.stat() if self._entry else self.path.stat()
+        return self._stat
+
+
+Scandir = Callable[[Path], ContextManager[Iterator[os.DirEntry]]]
+DirectoryLister = Callable[[Path], List[os.DirEntry]]
+
+# Directory listings which can be read ahead of the walk, per walker thread
+PREFETCHED_LISTINGS_PER_WORKER = 64
+
+
+def walk_files(
+    *,
+    root_path: Path,
+    workers: int = 1,
+    scandir: Scandir = os.scandir,
+) -> Iterator[FileEntry]:
+    """Yield supported files under root_path, sorted by path.
+
+    Directories are read with os.scandir() and their entries are sorted by name,
+    which yields the same order as sorting all the paths in the tree, but without
+    having to list the whole tree first. Symbolic links to directories are not
+    followed.
+
+    With more than one worker, directories are listed ahead of the walk by a
+    pool of threads, so that sibling directories are read in parallel. This
+    pays off when listing a directory has a high latency (e.g. network mounts).
+    The order of the files does not change.
     """
     logger.debug(f"Recursivelly looking for files in {root_path}")
 
     if root_path.is_file():
         if is_supported(root_path):
             logger.debug(f"{root_path} is a supported file")
-            yield root_path
+            yield FileEntry(root_path)
         else:
             logger.debug(f"{root_path} is an unsupported file")
-            return
-    else:
-        logger.debug(f"{root_path} is a directory, scanning folders recursively...")
+        return
+
+    logger.debug(f"{root_path} is a directory, scanning folders recursively...")
+
+    def list_directory(dir_path: Path) -> List[os.DirEntry]:
+        return _list_directory(dir_path, scandir)
+
+    if workers <= 1:
+        yield from _walk_directory(root_path, list_directory)
+        return
+
+    lister = _PrefetchingLister(
+        list_directory,
+        workers=workers,
+        max_prefetched=workers * PREFETCHED_LISTINGS_PER_WORKER,
+    )
+    try:
+        yield from _walk_directory(root_path, lister.list)
+    finally:
+        lister.close()
+
+
+def _list_directory(dir_path: Path, scandir: Scandir) -> List[os.DirEntry]:
+    try:
+        with scandir(dir_path) as it:
+            return sorted(it, key=lambda entry: entry.name)
+    except OSError as exc:
+        logger.warning(f"Cannot read directory {dir_path}: {exc}")
+        return []
+
+
+def _is_directory(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+
+def _walk_directory(
+    dir_path: Path, list_directory: DirectoryLister
+) -> Iterator[FileEntry]:
+    for entry in list_directory(dir_path):
+        path = dir_path / entry.name
+
+        if _is_directory(entry):
+            yield from _walk_directory(path, list_directory)
+            continue
+
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+
+        if not is_supported(path):
+            logger.debug(f"{path} is an unsupported file")
+            continue
+
+        logger.debug(f"{path} is a supported file")
+        yield FileEntry(path, entry)
+
+
+class _PrefetchingLister:
+    """List directories, reading their subdirectories ahead in a thread pool.
+
+    Every time a directory is listed, its subdirectories are queued to be listed
+    by the worker threads, so that they are (hopefully) already listed when the
+    walk reaches them. The queue is sorted by path, so that workers list first
+    the directories the walk will need first.
+
+    At most `max_prefetched` listings are kept waiting to be consumed, in order
+    to bound the memory used; beyond that, directories are listed on demand.
+    Subdirectories are always queued before the listing of their parent is
+    returned, so a directory is never listed twice.
+    """
+
+    def __init__(
+        self, list_directory: DirectoryLister, *, workers: int, max_prefetched: int
+    ) -> None:
+        self._list_directory = list_directory
+        self._futures: Dict[Path, "Future[List[os.DirEntry]]"] = {}
+        self._lock = threading.Lock()
+        self._budget = threading.BoundedSemaphore(max_prefetched)
+        self._queue: "queue.PriorityQueue[Tuple[Tuple[str, ...], int, Any]]" = (
+            queue.PriorityQueue()
+        )
+        self._sequence = itertools.count()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"gpy-walker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+        # An empty key sorts before any path, so workers stop right away
+        for _ in self._threads:
+            self._queue.put(((), next(self._sequence), None))
+        for thread in self._threads:
+            thread.join()
+
+    def list(self, dir_path: Path) -> List[os.DirEntry]:
+        with self._lock:
+            future = self._futures.pop(dir_path, None)
+
+        if future is None:
+            return self._list_and_prefetch(dir_path)
+
+        self._budget.release()
+
+        # Do not wait for a worker to pick up the directory we need right now
+        if future.cancel():
+            return self._list_and_prefetch(dir_path)
+
+        return future.result()
+
+    def _list_and_prefetch(self, dir_path: Path) -> List[os.DirEntry]:
+        entries = self._list_directory(dir_path)
+
+        for entry in entries:
+            if _is_directory(entry):
+                self._prefetch(dir_path / entry.name)
+
+        return entries
+
+    def _prefetch(self, dir_path: Path) -> None:
+        if not self._budget.acquire(blocking=False):
+            return  # it will be listed on demand
+
+        future: "Future[List[os.DirEntry]]" = Future()
+        with self._lock:
+            if self._closed:
+                self._budget.release()
+                return
+
+            self._futures[dir_path] = future
+
+        self._queue.put((dir_path.parts, next(self._sequence), (dir_path, future)))
 
-        files_and_dirs = sorted(root_path.rglob("*"))
-        files = (path for path in files_and_dirs if path.is_file())
+    def _work(self) -> None:
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                return
 
-        for path in files:
-            if not is_supported(path):
-                logger.debug(f"{path} is an unsupported file")
+            dir_path, future = item
+            if not future.set_running_or_notify_cancel():
                 continue
 
-            logger.debug(f"{path} is a supported file")
-            yield path
+            try:
+                future.set_result(self._list_and_prefetch(dir_path))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+
+def get_paths_recursive(*, root_path: Path, workers: int = 1) -> Iterator[Path]:
+    """Yield absolute path of supported files under root_path.
+
+    Refer to is_supported() for further information on supported files, and to
+    walk_files() for the meaning of `workers`.
+    """
+    for file_entry in walk_files(root_path=root_path, workers=workers):
+        yield file_entry.path
 
 
 def read_json(path: Path) -> Dict[str, Any]:
@@ -51,14 +284,178 @@ def write_json(path: Path, content: Dict[str, Any]) -> None:
         json.dump(content, f, indent=2)
 
 
-def read_reports(path: Path) -> List[Report]:
-    data = read_json(path)
-    reports = structure(data, List[Report])
-    return reports
+def open_text(path: Path, mode: str) -> IO[str]:
+    """Open a text file, compressed with gzip or zstd if its suffix says so."""
+    suffix = path.suffix.lower()
+
+    if suffix == ".gz":
+        return io.TextIOWrapper(gzip.GzipFile(path, mode), encoding="utf-8")
+
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError(
+                f"Install the zstandard package to read or write {path}"
+            ) from exc
+
+        return zstandard.open(path, f"{mode}t", encoding="utf-8")
+
+    return path.open(mode, encoding="utf-8")
+
+
+def is_json_lines(path: Path) -> bool:
+    """Tell whether reports are written to a path as JSON Lines.
+
+    Compression suffixes are ignored, e.g. `report.jsonl.gz` is JSON Lines.
+    """
+    if path.suffix.lower() in (".gz", ".zst"):
+        path = path.with_suffix("")
+
+    return path.suffix.lower() == ".jsonl"
+
+
+def read_reports(path: Path) -> Iterator[Report]:
+    """Yield the reports of a file, one at a time.
+
+    The format is detected from the content: JSON Lines, JSON (a single array)
+    or columnar reports. All of them are streamed, columnar reports one block
+    at a time.
+    """
+    if columnar.has_magic(path):
+        yield from columnar.read_reports(path)
+        return
+
+    with open_text(path, "r") as f:
+        first_line = f.readline()
+        if first_line.lstrip().startswith("["):
+            for item in _iter_json_array(f, first_line):
+                yield structure(item, Report)
+            return
+
+        for line in itertools.chain([first_line], f):
+            if line.strip():
+                yield structure(json.loads(line), Report)
+
+
+def _iter_json_array(f: IO[str], text: str) -> Iterator[Any]:
+    """Yield the items of a JSON array as they are read from a file.
+
+    `text` is the start of the array, already read from the file. Only the
+    chunk being decoded is held in memory, plus the item it starts if any.
+    """
+    decoder = json.JSONDecoder()
+    pos = text.index("[") + 1
+    expecting_item = True
+    first = True
+
+    def read_more() -> bool:
+        nonlocal text, pos
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+
+        text, pos = text[pos:] + chunk, 0
+        return True
 
+    while True:
+        while pos < len(text) and text[pos] in JSON_WHITESPACE:
+            pos += 1
+        if pos == len(text):
+            if not read_more():
+                raise json.JSONDecodeError("Unterminated array", text, pos)
+            continue
+
+        char = text[pos]
+        if char == "]" and (first or not expecting_item):
+            return
+
+        if not expecting_item:
+            if char != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+            pos += 1
+            expecting_item = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            # The item goes on in the next chunk, unless the file is over
+            if read_more():
+                continue
+            raise
+
+        # A number at the end of the text may go on in the next chunk
+        if end == len(text) and read_more():
+            continue
+
+        pos = end
+        expecting_item = False
+        first = False
+        yield item
+
+
+def write_reports(path: Path, reports: Iterable[Report]) -> None:
+    with open_report_writer(path) as writer:
+        for report in reports:
+            writer.write(report)
+
+
+def open_report_writer(
+    path: Path,
+) -> Union["ReportWriter", columnar.ColumnarReportWriter]:
+    """Return a writer of reports in the format given by the file suffix."""
+    if columnar.is_columnar(path):
+        logger.info(f"Writing report to {path}")
+        return columnar.ColumnarReportWriter(path)
+
+    return ReportWriter(path)
+
+
+class ReportWriter:
+    """Write reports to a file as they come.
+
+    Reports are written as JSON Lines if the file suffix is `.jsonl`, and as
+    a JSON array otherwise. Either way, the file is only complete once closed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.json_lines = is_json_lines(path)
+        self.count = 0
+
+        logger.info(f"Writing report to {path}")
+        self._file = open_text(path, "w")
+        if not self.json_lines:
+            self._file.write("[")
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def write(self, report: Report) -> None:
+        content = unstructure(report)
+
+        if self.json_lines:
+            self._file.write(json.dumps(content) + "\n")
+        else:
+            separator = ",\n" if self.count else "\n"
+            self._file.write(separator + indent(json.dumps(content, indent=2), "  "))
+
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
 
-def write_reports(path: Path, reports: List[Report]) -> None:
-    content = unstructure(reports)
+        if not self.json_lines:
+            self._file.write("\n]" if self.count else "]")
 
-    logger.info(f"Writing report to {path}")
-    write_json(path=path, content=content)
+        self._file.close()
@@ -1,9 +1,45 @@
 import copy
+import hashlib
+import json
+from array import array
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import attr
-from gspread.models import Spreadsheet
+from gspread.models import Spreadsheet, Worksheet
+from gspread.utils import absolute_range_name
+
+HEADER = (
+    "ID",
+    "Last filename",
+    "Last dir",
+    "Filename and metadata dates do match",
+    "has GPhotos timestamp",
+    "uploaded",
+    "albumId",
+    "albumName",
+)
+
+# Rows below the header, which is in the first row of the sheet
+FIRST_ROW = 2
+LAST_COLUMN = "H"
+
+# Number of rows, and bytes of values, sent with a single values_batch_update
+# request, to stay below the recommended payload size of the Sheets API (2 MB)
+BATCH_ROWS = 5000
+BATCH_BYTES = 1_500_000
+
+# Number of rows read with a single batch_get request by fetch_sheet_index()
+PAGE_ROWS = 10000
 
 
 @attr.s(auto_attribs=True, frozen=True)
@@ -48,8 +84,9 @@ def cast_bool(s: str) -> bool:
     raise ValueError(f"String {s!r} cannot be converted to a boolean")
 
 
-def fetch_worksheet(sh: Spreadsheet) -> GSheet:
-    raw_sh = sh.sheet1.get_all_records()
+def fetch_worksheet(sh: Spreadsheet, worksheet: Optional[Worksheet] = None) -> GSheet:
+    """Fetch every row of the worksheet, the first one of `sh` by default."""
+    raw_sh = (worksheet or sh.sheet1).get_all_records()
 
     gsheet: GSheet = {}
 
@@ -101,7 +138,7 @@ class FileReport:
 Report = List[FileReport]
 
 
-def merge(gsheet: GSheet, report: Report) -> GSheet:
+def merge(gsheet: GSheet, report: Iterable[FileReport]) -> GSheet:
     merged = copy.copy(gsheet)
 
     for file in report:
@@ -112,7 +149,10 @@ def merge(gsheet: GSheet, report: Report) -> GSheet:
     return merged
 
 
-def upload_worksheet(sh: Spreadsheet, gsheet: GSheet) -> None:
+def upload_worksheet(
+    sh: Spreadsheet, gsheet: GSheet, worksheet: Optional[Worksheet] = None
+) -> None:
+    worksheet = worksheet or sh.sheet1
     last_row = len(gsheet) + 1
     range = f"A2:H{last_row}"
 
@@ -120,4 +160,246 @@ def upload_worksheet(sh: Spreadsheet, gsheet: GSheet) -> None:
 
     values = [row.to_gsheet() for row in sorted_rows]
 
-    sh.sheet1.update(range, values)
+    if last_row > worksheet.row_count:
+        worksheet.add_rows(last_row - worksheet.row_count)
+    worksheet.update(range, values)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class SheetChanges:
+    """Rows to write to a sheet to merge a report, keyed by row number.
+
+    Existing rows are updated in place, and new rows are appended after the
+    last one, so the rows which did not change are left untouched.
+    """
+
+    modified: Dict[int, GSheetRow] = attr.Factory(dict)
+    inserted: Dict[int, GSheetRow] = attr.Factory(dict)
+
+    @property
+    def rows(self) -> Dict[int, GSheetRow]:
+        return {**self.modified, **self.inserted}
+
+
+@attr.s(auto_attribs=True)
+class SheetIndex:
+    """Position of each row of a sheet by ID, and a hash of its values.
+
+    This is all merge_changes() needs to know about the rows of a sheet, in a
+    fraction of the memory of their GSheetRow: the hashes are plain numbers,
+    and the filename and directory columns are not kept, as they are derived
+    from the ID. Positions start at 0 for the first row below the header.
+    """
+
+    positions: Dict[str, int] = attr.Factory(dict)
+    hashes: array = attr.Factory(lambda: array("q"))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def append(self, id: str, row_hash: int) -> None:
+        if id:
+            self.positions[id] = len(self.hashes)
+        self.hashes.append(row_hash)
+
+    @classmethod
+    def from_gsheet(cls, gsheet: GSheet) -> "SheetIndex":
+        index = cls()
+        for row in gsheet.values():
+            index.append(row.id, row_hash(row))
+        return index
+
+
+# Columns of the sheet which are not derived from the ID: dates match, has
+# GPhotos timestamp, uploaded, album ID and album name
+HASHED_COLUMNS = ("D", "H")
+
+
+def row_hash(row: GSheetRow) -> int:
+    album = row.album
+    cells = [row.dates_match, row.has_ghotos_timestamp, row.uploaded]
+    texts = ["TRUE" if cell else "FALSE" for cell in cells]
+    texts.extend([album.id, album.name] if album else ["", ""])
+    return _hash_texts(texts)
+
+
+def _hash_texts(texts: Sequence[str]) -> int:
+    """Return a hash of cells, as formatted by Google Sheets.
+
+    The hash is stable across runs, so that it can be cached.
+    """
+    digest = hashlib.blake2b("\x1f".join(texts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def fetch_sheet_index(
+    sh: Spreadsheet, page_rows: int = PAGE_ROWS, worksheet: Optional[Worksheet] = None
+) -> SheetIndex:
+    """Fetch the IDs and a hash of the values of every row of the sheet.
+
+    Unlike fetch_worksheet(), only the ID and the hashed columns are read, in
+    pages of `page_rows` rows, and no GSheetRow is built.
+
+    The Sheets API leaves the empty rows at the end of each range out, so the
+    pages cover the grid of the worksheet, and the empty rows at the end of a
+    page are only indexed once a later page has rows with values.
+    """
+    if page_rows < 1:
+        raise ValueError(f"Page rows must be positive, got {page_rows}")
+
+    worksheet = worksheet or sh.sheet1
+    first_column, last_column = HASHED_COLUMNS
+    width = ord(last_column) - ord(first_column) + 1
+    empty_hash = _hash_texts([""] * width)
+
+    index = SheetIndex()
+    empty_rows = 0
+    for start in range(FIRST_ROW, worksheet.row_count + 1, page_rows):
+        end = min(start + page_rows - 1, worksheet.row_count)
+        ids, values = worksheet.batch_get(
+            [f"A{start}:A{end}", f"{first_column}{start}:{last_column}{end}"]
+        )
+
+        rows = max(len(ids), len(values))
+        if rows:
+            for _ in range(empty_rows):
+                index.append("", empty_hash)
+            empty_rows = 0
+
+        for i in range(rows):
+            id_cells = ids[i] if i < len(ids) else []
+            cells = [str(cell) for cell in values[i]] if i < len(values) else []
+            cells.extend([""] * (width - len(cells)))
+            index.append(id_cells[0] if id_cells else "", _hash_texts(cells))
+
+        empty_rows += end - start + 1 - rows
+
+    return index
+
+
+def merge_changes(index: SheetIndex, report: Iterable[FileReport]) -> SheetChanges:
+    """Return the rows which differ once the report is merged with the sheet.
+
+    Only the rows which are modified or inserted are built as GSheetRow.
+    """
+    next_row = FIRST_ROW + len(index)
+
+    changes = SheetChanges()
+    new_row_numbers: Dict[str, int] = {}
+
+    for file in report:
+        row = file.to_gsheet_row()
+
+        position = index.positions.get(row.id)
+        if position is not None:
+            row_number = FIRST_ROW + position
+            if row_hash(row) == index.hashes[position]:
+                changes.modified.pop(row_number, None)
+            else:
+                changes.modified[row_number] = row
+            continue
+
+        if row.id not in new_row_numbers:
+            new_row_numbers[row.id] = next_row
+            next_row += 1
+        changes.inserted[new_row_numbers[row.id]] = row
+
+    return changes
+
+
+def apply_changes(index: SheetIndex, changes: SheetChanges) -> SheetIndex:
+    """Return the index of the sheet once the changes are uploaded."""
+    updated = SheetIndex(
+        positions=dict(index.positions), hashes=array("q", index.hashes)
+    )
+    for row_number, row in changes.modified.items():
+        updated.hashes[row_number - FIRST_ROW] = row_hash(row)
+    for row_number in sorted(changes.inserted):
+        row = changes.inserted[row_number]
+        updated.append(row.id, row_hash(row))
+
+    return updated
+
+
+def upload_changes(
+    sh: Spreadsheet,
+    changes: SheetChanges,
+    batch_rows: int = BATCH_ROWS,
+    batch_bytes: int = BATCH_BYTES,
+    worksheet: Optional[Worksheet] = None,
+) -> int:
+    """Write the changed rows to the sheet and return the number of requests.
+
+    Consecutive rows are coalesced into a single range, and ranges are sent in
+    values_batch_update requests of up to `batch_rows` rows, whose values take
+    up to about `batch_bytes` bytes.
+    """
+    rows = changes.rows
+    if not rows:
+        return 0
+
+    worksheet = worksheet or sh.sheet1
+    last_row = max(rows)
+    if last_row > worksheet.row_count:
+        worksheet.add_rows(last_row - worksheet.row_count)
+
+    values = {row_number: row.to_gsheet() for row_number, row in rows.items()}
+    sizes = {row_number: len(json.dumps(v)) for row_number, v in values.items()}
+
+    requests = 0
+    for batch in _batched_ranges(sizes, batch_rows, batch_bytes):
+        data = [
+            {
+                "range": absolute_range_name(
+                    worksheet.title, f"A{start}:{LAST_COLUMN}{end}"
+                ),
+                "values": [values[n] for n in range(start, end + 1)],
+            }
+            for start, end in batch
+        ]
+        sh.values_batch_update(body={"valueInputOption": "RAW", "data": data})
+        requests += 1
+
+    return requests
+
+
+def _batched_ranges(
+    sizes: Dict[int, int], batch_rows: int, batch_bytes: int
+) -> Iterator[List[Tuple[int, int]]]:
+    """Yield batches of (first, last) row ranges.
+
+    A batch has up to `batch_rows` rows whose sizes add up to `batch_bytes`
+    at most, unless a single row is larger than that.
+    """
+    if batch_rows < 1:
+        raise ValueError(f"Batch rows must be positive, got {batch_rows}")
+
+    batch: List[Tuple[int, int]] = []
+    batch_size = 0
+    batch_total = 0
+    start = end = None
+
+    for row_number in sorted(sizes):
+        size = sizes[row_number]
+        full = batch_size == batch_rows or (
+            batch_size > 0 and batch_total + size > batch_bytes
+        )
+        if end is not None and (row_number != end + 1 or full):
+            assert start is not None
+            batch.append((start, end))
+            start = None
+        if full:
+            yield batch
+            batch = []
+            batch_size = 0
+            batch_total = 0
+
+        if start is None:
+            start = row_number
+        end = row_number
+        batch_size += 1
+        batch_total += size
+
+    assert start is not None and end is not None
+    batch.append((start, end))
+    yield batch
@@ -0,0 +1,17 @@
+import itertools
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield successive lists of up to `size` items."""
+    if size < 1:
+        raise ValueError(f"Chunk size must be positive, got {size}")
+
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,159 @@
+"""This module contains an append-only journal of the files a command completed.
+
+Long runs record the outcome of every file in a journal, so that a run that
+dies halfway can be resumed, skipping the files already done. Entries are
+appended to a JSON lines file and flushed to disk in batches, so a crash
+loses the last batch at most.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from types import TracebackType
+from typing import Dict, Iterator, List, Optional, Type
+
+import attr
+
+from gpy import config
+from gpy.types import STRUCTURE_ERRORS, Report, structure, unstructure
+
+logger = logging.getLogger(__name__)
+
+# Number of entries written to the journal at once
+FLUSH_EVERY = 500
+
+SCANNED = "scanned"
+WRITTEN = "written"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class JournalEntry:
+    path: Path
+    outcome: str
+    report: Optional[Report] = None
+
+
+def journal_path(command: str, root_path: Path) -> Path:
+    """Return where the journal of a command run on a path is kept."""
+    digest = hashlib.sha1(str(root_path.absolute()).encode()).hexdigest()[:12]
+    return config.JOURNAL_DIR / f"{command}-{digest}.jsonl"
+
+
+def read_journal(path: Path) -> Iterator[JournalEntry]:
+    """Yield the entries of a journal, if any.
+
+    A line cut short by a crash, or which is not a journal entry, is skipped.
+    """
+    try:
+        f = path.open()
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line in f:
+            try:
+                yield structure(json.loads(line), JournalEntry)
+            except STRUCTURE_ERRORS:
+                logger.debug(f"skipping invalid journal entry: {line!r}")
+
+
+class Journal:
+    """Outcome of each file completed by a command, stored as it runs.
+
+    Unless resuming, any previous journal at the same path is discarded. The
+    entries of the resumed journal are kept in `resumed`, keyed by absolute
+    path. Failed files are not considered done, so they are retried.
+    """
+
+    def __init__(
+        self, path: Path, resume: bool = False, flush_every: int = FLUSH_EVERY
+    ) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.resumed: Dict[Path, JournalEntry] = {}
+
+        if resume:
+            self.resumed = {
+                entry.path.absolute(): entry
+                for entry in read_journal(path)
+                if entry.outcome != FAILED
+            }
+            logger.info(f"Resuming from journal: {len(self.resumed)} files done")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if resume:
+            _drop_partial_line(path)
+        self._file = path.open("a" if resume else "w")
+        self._pending: List[JournalEntry] = []
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def is_done(self, path: Path) -> bool:
+        return path.absolute() in self.resumed
+
+    def record(self, entry: JournalEntry) -> None:
+        self._pending.append(entry)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending entries and make sure they reach the disk."""
+        if not self._pending:
+            return
+
+        lines = [json.dumps(unstructure(entry)) + "\n" for entry in self._pending]
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = []
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+
+        self.flush()
+        self._file.close()
+
+    def remove(self) -> None:
+        """Close and delete the journal, once the run completed."""
+        self.close()
+        self.path.unlink()
+
+
+def _drop_partial_line(path: Path, chunk_size: int = 4096) -> None:
+    """Truncate the journal after its last complete line.
+
+    Otherwise the first entry appended after a crash would be glued onto the
+    line the crash cut short, and lost with it.
+    """
+    try:
+        f = path.open("rb+")
+    except FileNotFoundError:
+        return
+
+    with f:
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+
+        if position != end:
+            f.truncate(position)
@@ -20,6 +20,19 @@ class ConditionalFormatter(logging.Formatter):
             return message
 
 
+def format_bytes(size: float) -> str:
+    """Return a human readable size, e.g. 1.5 GiB."""
+    if abs(size) < 1024:
+        return f"{size:.0f} B"
+
+    for unit in ("KiB", "MiB", "GiB"):
+        size /= 1024
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+
+    return f"{size / 1024:.1f} TiB"
+
+
 # TODO:
 # Add more regex patterns to recognize more image file names and ensure the date
 # Create one command that will:
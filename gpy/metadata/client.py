@@ -0,0 +1,123 @@
+import datetime
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from gpy.exiftool.client import (
+    DatesTriple,
+    ExifTool,
+    ExifToolResult,
+    WriteResult,
+    parse_dates,
+)
+from gpy.exiftool.tags import FileTags
+from gpy.filesystem import VIDEO_SUFFIXES
+from gpy.metadata import jpeg, mp4
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.patch import Patch, apply_patches, backup_file
+
+logger = logging.getLogger(__name__)
+
+TagsReader = Callable[[Path], FileTags]
+DatePatcher = Callable[[Path, datetime.datetime], List[Patch]]
+
+# Native readers and writers by file suffix
+NATIVE_READERS: Dict[str, TagsReader] = {
+    ".jpg": jpeg.read_tags,
+    ".jpeg": jpeg.read_tags,
+    **{suffix: mp4.read_tags for suffix in VIDEO_SUFFIXES},
+}
+NATIVE_DATE_PATCHERS: Dict[str, DatePatcher] = {
+    ".jpg": jpeg.plan_date_patches,
+    ".jpeg": jpeg.plan_date_patches,
+    **{suffix: mp4.plan_date_patches for suffix in VIDEO_SUFFIXES},
+}
+
+
+class MetadataClient(ExifTool):
+    """exiftool client which reads and writes the dates of some formats natively.
+
+    Files in formats without a native reader or writer, or which these cannot
+    handle, are passed to the wrapped exiftool client. Everything else is also
+    delegated to the wrapped client.
+    """
+
+    def __init__(self, exiftool: ExifTool) -> None:
+        self.exiftool = exiftool
+
+    def execute(self, args: Sequence[str]) -> ExifToolResult:
+        return self.exiftool.execute(args)
+
+    def read_native_tags(self, path: Path) -> Optional[FileTags]:
+        """Return the tags of a file, if they can be read without exiftool."""
+        read_tags = NATIVE_READERS.get(path.suffix.lower())
+        if read_tags is None:
+            return None
+
+        try:
+            return read_tags(path)
+        except UnsupportedFile as exc:
+            logger.debug(f"falling back to exiftool: {exc}")
+            return None
+
+    def read_datetime(self, file_path: Path) -> datetime.datetime:
+        file_tags = self.read_native_tags(file_path)
+        if file_tags and file_tags.metadata_date:
+            return file_tags.metadata_date
+
+        # exiftool also reports why there is no date
+        return self.exiftool.read_datetime(file_path)
+
+    def read_google_timestamp(self, path: Path) -> Optional[datetime.datetime]:
+        file_tags = self.read_native_tags(path)
+        if file_tags:
+            return file_tags.google_date
+
+        return self.exiftool.read_google_timestamp(path)
+
+    def read_dates_many(self, paths: Sequence[Path]) -> Dict[Path, DatesTriple]:
+        dates: Dict[Path, DatesTriple] = {}
+        unsupported: List[Path] = []
+        for path in paths:
+            file_tags = self.read_native_tags(path)
+            if file_tags:
+                dates[path] = parse_dates(file_tags)
+            else:
+                unsupported.append(path)
+
+        if unsupported:
+            dates.update(self.exiftool.read_dates_many(unsupported))
+
+        return {path: dates[path] for path in paths}
+
+    def plan_native_date_patches(
+        self, path: Path, ts: datetime.datetime
+    ) -> Optional[List[Patch]]:
+        """Return the patches to write a date in place, if the file allows it."""
+        plan_date_patches = NATIVE_DATE_PATCHERS.get(path.suffix.lower())
+        if plan_date_patches is None:
+            return None
+
+        try:
+            return plan_date_patches(path, ts)
+        except UnsupportedFile as exc:
+            logger.debug(f"falling back to exiftool: {exc}")
+            return None
+
+    def write_ts(
+        self, path: Path, *, ts: datetime.datetime, backup: bool = False
+    ) -> WriteResult:
+        """Write Date/Time to file, in place when possible.
+
+        Backups are made as exiftool does, by copying the file to a file with
+        the "_original" suffix.
+        """
+        patches = self.plan_native_date_patches(path, ts) if ts.tzinfo else None
+        if patches is None:
+            return self.exiftool.write_ts(path, ts=ts, backup=backup)
+
+        if backup:
+            backup_file(path)
+
+        bytes_written = apply_patches(path, patches)
+        return WriteResult(path=path, bytes_written=bytes_written)
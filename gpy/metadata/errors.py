@@ -0,0 +1,2 @@
+class UnsupportedFile(Exception):
+    """The file cannot be handled natively, and exiftool should be used instead."""
@@ -0,0 +1,231 @@
+"""This module reads and writes the date tags of JPEG files without exiftool.
+
+The file is memory-mapped and only the segments before the image data are
+walked, so that reading the dates of a large image only touches its first
+pages. Dates are read from the EXIF and XMP APP1 segments.
+
+EXIF dates have a fixed length, so they are written in place, as well as XMP
+dates whose length does not change.
+"""
+
+import datetime
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterator, List, Set, Tuple
+
+from gpy.exiftool.tags import FileTags, GroupAndTag
+from gpy.metadata import xmp
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.patch import Patch
+
+SOI = b"\xff\xd8"
+SOS = 0xDA
+EOI = 0xD9
+APP1 = 0xE1
+# Markers without a length, which are directly followed by the next marker
+STANDALONE_MARKERS = frozenset((0x01, *range(0xD0, 0xD8)))
+
+EXIF_HEADER = b"Exif\x00\x00"
+EXIF_HEADER_SIZE = len(EXIF_HEADER)
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_HEADER_SIZE = len(XMP_HEADER)
+EXTENDED_XMP_HEADER = b"http://ns.adobe.com/xmp/extension/\x00"
+
+# TIFF field types
+ASCII = 2
+LONG = 4
+IFD = 13
+
+EXIF_IFD_POINTER = 0x8769
+IFD0_DATE_TAGS = {0x0132: "ModifyDate"}
+EXIF_IFD_DATE_TAGS = {0x9003: "DateTimeOriginal", 0x9004: "CreateDate"}
+
+# EXIF tags written by `exiftool -AllDates`
+ALL_DATES = {
+    ("IFD0", "ModifyDate"),
+    ("ExifIFD", "DateTimeOriginal"),
+    ("ExifIFD", "CreateDate"),
+}
+
+
+def plan_date_patches(path: Path, ts: datetime.datetime) -> List[Patch]:
+    """Return the patches which write a timestamp to all the date tags.
+
+    The same tags as `exiftool -AllDates -XMP:CreateDate` are written: the
+    EXIF dates get the local time, without subseconds nor timezone, and the
+    XMP dates the whole timestamp. Only existing values are overwritten, so
+    raise UnsupportedFile if any of the tags is missing or would change length.
+    """
+    exif_date = ts.strftime("%Y:%m:%d %H:%M:%S").encode() + b"\x00"
+    xmp_date = xmp.format_date(ts)
+
+    try:
+        with open(path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return list(iter_date_patches(data, exif_date, xmp_date))
+    except (OSError, ValueError, struct.error) as exc:
+        raise UnsupportedFile(f"Cannot read {path}: {exc}") from exc
+
+
+def iter_date_patches(
+    data: mmap.mmap, exif_date: bytes, xmp_date: str
+) -> Iterator[Patch]:
+    exif_tags: Set[GroupAndTag] = set()
+    has_xmp = False
+
+    for offset, segment in iter_app1_segments(data):
+        if segment.startswith(EXIF_HEADER):
+            tiff = segment[EXIF_HEADER_SIZE:]
+            tiff_offset = offset + EXIF_HEADER_SIZE
+            for group_and_tag, start, count in iter_exif_date_values(tiff):
+                if count != len(exif_date):
+                    raise UnsupportedFile(f"Unexpected size of {group_and_tag}")
+                exif_tags.add(group_and_tag)
+                yield Patch(offset=tiff_offset + start, data=exif_date)
+        elif segment.startswith(XMP_HEADER):
+            packet = segment[XMP_HEADER_SIZE:]
+            packet_offset = offset + XMP_HEADER_SIZE
+            yield from xmp.plan_date_patches(packet, packet_offset, xmp_date)
+            has_xmp = True
+        elif segment.startswith(EXTENDED_XMP_HEADER):
+            raise UnsupportedFile("Extended XMP is not supported")
+
+    missing = ALL_DATES - exif_tags
+    if missing:
+        raise UnsupportedFile(f"Missing EXIF tags: {sorted(missing)}")
+
+    if not has_xmp:
+        raise UnsupportedFile("No XMP packet found")
+
+
+def read_tags(path: Path) -> FileTags:
+    """Return the date tags of a JPEG file, keyed as `exiftool -G1` would.
+
+    Raise UnsupportedFile if the file cannot be read natively.
+    """
+    try:
+        with open(path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                tags = dict(read_date_tags(data))
+    except (OSError, ValueError, struct.error) as exc:
+        # ValueError is raised when mapping empty files
+        raise UnsupportedFile(f"Cannot read {path}: {exc}") from exc
+
+    return FileTags(source_file=str(path), tags=tags)
+
+
+def read_date_tags(data: mmap.mmap) -> Iterator[Tuple[GroupAndTag, str]]:
+    """Yield the date tags found in the APP1 segments, in file order."""
+    for _, segment in iter_app1_segments(data):
+        if segment.startswith(EXIF_HEADER):
+            yield from read_exif_date_tags(segment[EXIF_HEADER_SIZE:])
+        elif segment.startswith(XMP_HEADER):
+            yield from xmp.read_date_tags(segment[XMP_HEADER_SIZE:])
+        elif segment.startswith(EXTENDED_XMP_HEADER):
+            # exiftool merges the extended packet into the main one
+            raise UnsupportedFile("Extended XMP is not supported")
+
+
+def iter_app1_segments(data: mmap.mmap) -> Iterator[Tuple[int, bytes]]:
+    """Yield the offset and payload of the APP1 segments before the image data."""
+    if data[:2] != SOI:
+        raise UnsupportedFile("Not a JPEG file")
+
+    size = len(data)
+    offset = 2
+    while offset + 4 <= size:
+        if data[offset] != 0xFF:
+            raise UnsupportedFile(f"Expected a JPEG marker at byte {offset}")
+
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+
+        if marker in (SOS, EOI):
+            return
+
+        if marker in STANDALONE_MARKERS:
+            offset += 2
+            continue
+
+        (length,) = struct.unpack_from(">H", data, offset + 2)
+        end = offset + 2 + length
+        if length < 2 or end > size:
+            raise UnsupportedFile(f"Truncated JPEG segment at byte {offset}")
+
+        if marker == APP1:
+            start = offset + 4
+            yield start, data[start:end]
+
+        offset = end
+
+    raise UnsupportedFile("No image data found")
+
+
+def read_exif_date_tags(tiff: bytes) -> Iterator[Tuple[GroupAndTag, str]]:
+    """Yield the date tags of the IFD0 and ExifIFD directories."""
+    for group_and_tag, start, count in iter_exif_date_values(tiff):
+        end = start + count
+        value = tiff[start:end].split(b"\x00", 1)[0].decode("latin-1")
+        yield group_and_tag, value
+
+
+def iter_exif_date_values(tiff: bytes) -> Iterator[Tuple[GroupAndTag, int, int]]:
+    """Yield the offset in the TIFF structure and the size of each date value."""
+    if tiff[:2] == b"II":
+        byte_order = "<"
+    elif tiff[:2] == b"MM":
+        byte_order = ">"
+    else:
+        raise UnsupportedFile("Invalid TIFF header in EXIF segment")
+
+    magic, ifd0_offset = struct.unpack_from(f"{byte_order}HI", tiff, 2)
+    if magic != 42:
+        raise UnsupportedFile("Invalid TIFF header in EXIF segment")
+
+    for tag, field_type, count, value_offset in iter_ifd(tiff, byte_order, ifd0_offset):
+        if tag == EXIF_IFD_POINTER and field_type in (LONG, IFD):
+            (exif_ifd_offset,) = struct.unpack_from(
+                f"{byte_order}I", tiff, value_offset
+            )
+            for tag, field_type, count, value_offset in iter_ifd(
+                tiff, byte_order, exif_ifd_offset
+            ):
+                if tag in EXIF_IFD_DATE_TAGS and field_type == ASCII:
+                    start = find_ascii_value(tiff, byte_order, count, value_offset)
+                    yield ("ExifIFD", EXIF_IFD_DATE_TAGS[tag]), start, count
+        elif tag in IFD0_DATE_TAGS and field_type == ASCII:
+            start = find_ascii_value(tiff, byte_order, count, value_offset)
+            yield ("IFD0", IFD0_DATE_TAGS[tag]), start, count
+
+
+def iter_ifd(
+    tiff: bytes, byte_order: str, offset: int
+) -> Iterator[Tuple[int, int, int, int]]:
+    """Yield the tag, type, count and value offset of each IFD entry.
+
+    The value offset is the offset of the 4-byte value field of the entry,
+    which holds either the value or the offset of the value.
+    """
+    (entries,) = struct.unpack_from(f"{byte_order}H", tiff, offset)
+    for entry_offset in range(offset + 2, offset + 2 + entries * 12, 12):
+        tag, field_type, count = struct.unpack_from(
+            f"{byte_order}HHI", tiff, entry_offset
+        )
+        yield tag, field_type, count, entry_offset + 8
+
+
+def find_ascii_value(
+    tiff: bytes, byte_order: str, count: int, value_offset: int
+) -> int:
+    """Return the offset of an ASCII value, given its IFD entry."""
+    if count <= 4:
+        return value_offset
+
+    (offset,) = struct.unpack_from(f"{byte_order}I", tiff, value_offset)
+    if offset + count > len(tiff):
+        raise UnsupportedFile("ASCII value out of the EXIF segment")
+
+    return offset
@@ -0,0 +1,282 @@
+"""This module reads and writes the dates of MP4/QuickTime files without exiftool.
+
+Only the headers of the top-level boxes are read while looking for the movie
+box (moov), wherever it is in the file. The movie box is then read whole: it
+holds the movie (mvhd), track (tkhd) and media (mdhd) headers, but not the
+media data, so it stays small even for multi-GB videos.
+
+Dates are stored as fixed-width integers, so they are written in place.
+"""
+
+import datetime
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import attr
+
+from gpy.exiftool.tags import FileTags, GroupAndTag
+from gpy.metadata import xmp
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.patch import Patch
+
+XMP_UUID = bytes.fromhex("be7acfcb97a942e89c71999491e3afac")
+
+# Larger movie boxes are left to exiftool
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+UNIX_EPOCH = datetime.datetime(1970, 1, 1)
+# Seconds between the QuickTime epoch (1904-01-01) and the Unix epoch
+QUICKTIME_TO_UNIX = (66 * 365 + 17) * 24 * 3600
+
+# Tag names of the creation and modification dates of each date header
+DATE_TAGS = {
+    b"mvhd": ("CreateDate", "ModifyDate"),
+    b"tkhd": ("TrackCreateDate", "TrackModifyDate"),
+    b"mdhd": ("MediaCreateDate", "MediaModifyDate"),
+}
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Box:
+    type: bytes
+    offset: int
+    header_size: int
+    size: int
+    # The size is 0 in the header, meaning up to the end of the container
+    open_ended: bool = False
+
+    @property
+    def data_offset(self) -> int:
+        return self.offset + self.header_size
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class DateField:
+    """Date stored in a date header, as seconds since the QuickTime epoch."""
+
+    group: str
+    tag: str
+    offset: int
+    size: int
+    value: int
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Layout:
+    """Where the dates of a file are.
+
+    `appendable` is false when the last top-level box extends to the end of
+    the file, which means that no box can be appended.
+    """
+
+    date_fields: List[DateField]
+    xmp_offset: Optional[int]
+    xmp_packet: Optional[bytes]
+    file_size: int
+    appendable: bool
+
+
+def read_tags(path: Path) -> FileTags:
+    """Return the date tags of a video, keyed as `exiftool -G1` would.
+
+    Raise UnsupportedFile if the file cannot be read natively.
+    """
+    layout = read_layout(path)
+
+    tags: Dict[GroupAndTag, str] = {
+        (field.group, field.tag): format_date(field.value)
+        for field in layout.date_fields
+    }
+    if layout.xmp_packet is not None:
+        tags.update(xmp.read_date_tags(layout.xmp_packet))
+
+    return FileTags(source_file=str(path), tags=tags)
+
+
+def plan_date_patches(path: Path, ts: datetime.datetime) -> List[Patch]:
+    """Return the patches which write a timestamp to all the date tags.
+
+    The same tags as `exiftool -AllDates -XMP:CreateDate` plus the track and
+    media dates are written. The local time is stored in the QuickTime dates,
+    without converting it to UTC, as exiftool is told to do by
+    gpy.exiftool.client.write_ts_args. The XMP packet is appended
+    to the file if there is none.
+
+    Raise UnsupportedFile if the dates cannot be written in place.
+    """
+    layout = read_layout(path)
+    if not any(field.tag == "CreateDate" for field in layout.date_fields):
+        raise UnsupportedFile(f"No movie header found in {path}")
+
+    local_time = ts.replace(tzinfo=None, microsecond=0)
+    value = int((local_time - UNIX_EPOCH).total_seconds()) + QUICKTIME_TO_UNIX
+
+    patches = []
+    for field in layout.date_fields:
+        if not 0 <= value < 1 << (8 * field.size):
+            raise UnsupportedFile(f"{ts} does not fit in {field.tag} of {path}")
+        fmt = ">I" if field.size == 4 else ">Q"
+        patches.append(Patch(offset=field.offset, data=struct.pack(fmt, value)))
+
+    create_date = xmp.format_date(ts)
+    if layout.xmp_packet is not None:
+        assert layout.xmp_offset is not None
+        patches.extend(
+            xmp.plan_date_patches(layout.xmp_packet, layout.xmp_offset, create_date)
+        )
+    elif layout.appendable:
+        packet = xmp.build_packet(create_date)
+        box = struct.pack(">I4s", 8 + len(XMP_UUID) + len(packet), b"uuid")
+        data = box + XMP_UUID + packet
+        patches.append(Patch(offset=layout.file_size, data=data))
+    else:
+        raise UnsupportedFile(f"Cannot append an XMP box to {path}")
+
+    return patches
+
+
+def format_date(value: int) -> str:
+    """Return a QuickTime date as exiftool shows it."""
+    if value == 0:
+        return "0000:00:00 00:00:00"
+
+    # Like exiftool, assume that small values were written with the wrong epoch
+    if value >= QUICKTIME_TO_UNIX:
+        value -= QUICKTIME_TO_UNIX
+
+    ts = UNIX_EPOCH + datetime.timedelta(seconds=value)
+    return ts.strftime("%Y:%m:%d %H:%M:%S")
+
+
+def read_layout(path: Path) -> Layout:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as exc:
+        raise UnsupportedFile(f"Cannot read {path}: {exc}") from exc
+
+    try:
+        file_size = os.fstat(fd).st_size
+        return _read_layout(fd, file_size)
+    except (OSError, struct.error) as exc:
+        raise UnsupportedFile(f"Cannot read {path}: {exc}") from exc
+    finally:
+        os.close(fd)
+
+
+def _read_layout(fd: int, file_size: int) -> Layout:
+    moov: Optional[bytes] = None
+    moov_offset = 0
+    xmp_offset: Optional[int] = None
+    xmp_packet: Optional[bytes] = None
+    appendable = True
+
+    for box in iter_file_boxes(fd, file_size):
+        if box.type == b"moov":
+            if moov is not None:
+                raise UnsupportedFile("Several movie boxes found")
+            if box.size > MAX_MOOV_SIZE:
+                raise UnsupportedFile(f"Movie box too large: {box.size} bytes")
+            moov = os.pread(fd, box.size, box.offset)
+            moov_offset = box.offset
+        elif box.type == b"uuid":
+            uuid = os.pread(fd, len(XMP_UUID), box.data_offset)
+            if uuid == XMP_UUID:
+                xmp_offset = box.data_offset + len(XMP_UUID)
+                xmp_packet = os.pread(fd, box.end - xmp_offset, xmp_offset)
+
+        appendable = not box.open_ended
+
+    if moov is None:
+        raise UnsupportedFile("No movie box found")
+
+    date_fields: List[DateField] = []
+    track = 0
+    for box in iter_boxes(moov, parse_box_header(moov, 0, len(moov))):
+        if box.type == b"cmov":
+            raise UnsupportedFile("Compressed movie box")
+        if box.type == b"trak":
+            track += 1
+        if box.type in DATE_TAGS:
+            group = "QuickTime" if box.type == b"mvhd" else f"Track{track}"
+            date_fields.extend(read_date_fields(moov, box, moov_offset, group))
+        elif box.type == b"XMP_":
+            start, end = box.data_offset, box.end
+            xmp_offset = moov_offset + start
+            xmp_packet = moov[start:end]
+
+    return Layout(
+        date_fields=date_fields,
+        xmp_offset=xmp_offset,
+        xmp_packet=xmp_packet,
+        file_size=file_size,
+        appendable=appendable,
+    )
+
+
+def iter_file_boxes(fd: int, file_size: int) -> Iterator[Box]:
+    """Yield the top-level boxes of a file, only reading their headers."""
+    offset = 0
+    while offset < file_size:
+        header = os.pread(fd, 16, offset)
+        box = parse_box_header(header, 0, file_size - offset)
+        yield attr.evolve(box, offset=offset)
+        offset += box.size
+
+
+def iter_boxes(data: bytes, parent: Box) -> Iterator[Box]:
+    """Yield the boxes in a box read in memory, depth first.
+
+    Only the boxes which may contain date headers are walked into.
+    """
+    offset = parent.data_offset
+    while offset < parent.end:
+        box = parse_box_header(data, offset, parent.end - offset)
+        yield box
+        if box.type in (b"trak", b"mdia", b"udta"):
+            yield from iter_boxes(data, box)
+        offset = box.end
+
+
+def parse_box_header(data: bytes, offset: int, available: int) -> Box:
+    """Return the box whose header is at `offset` in `data`.
+
+    `available` is the number of bytes left in the container of the box.
+    """
+    size, box_type = struct.unpack_from(">I4s", data, offset)
+    header_size = 8
+    if size == 1:
+        (size,) = struct.unpack_from(">Q", data, offset + 8)
+        header_size = 16
+
+    open_ended = size == 0
+    if open_ended:
+        size = available
+
+    if size < header_size or size > available:
+        raise UnsupportedFile(f"Invalid {box_type!r} box at byte {offset}")
+
+    return Box(box_type, offset, header_size, size, open_ended=open_ended)
+
+
+def read_date_fields(
+    moov: bytes, box: Box, base: int, group: str
+) -> Iterator[DateField]:
+    """Yield the creation and modification dates of a date header."""
+    (version,) = struct.unpack_from(">B", moov, box.data_offset)
+    size = 8 if version == 1 else 4
+    fmt = ">Q" if version == 1 else ">I"
+
+    # The dates follow the 1-byte version and the 3-byte flags
+    offset = box.data_offset + 4
+    for tag in DATE_TAGS[box.type]:
+        if offset + size > box.end:
+            raise UnsupportedFile(f"Truncated {box.type!r} box")
+        (value,) = struct.unpack_from(fmt, moov, offset)
+        yield DateField(group, tag, offset=base + offset, size=size, value=value)
+        offset += size
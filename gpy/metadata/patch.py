@@ -0,0 +1,43 @@
+"""This module writes metadata in place, without rewriting the whole file."""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Sequence
+
+import attr
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Patch:
+    """Bytes to write at a given file offset.
+
+    Patches at the end of the file append data to it.
+    """
+
+    offset: int
+    data: bytes
+
+
+def apply_patches(path: Path, patches: Sequence[Patch]) -> int:
+    """Write the patches to the file and return the number of bytes written."""
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        for patch in patches:
+            os.pwrite(fd, patch.data, patch.offset)
+    finally:
+        os.close(fd)
+
+    return sum(len(patch.data) for patch in patches)
+
+
+def backup_path(path: Path) -> Path:
+    """Return the path of the backup copy exiftool would make of a file."""
+    return path.with_name(f"{path.name}_original")
+
+
+def backup_file(path: Path) -> None:
+    """Copy the file as exiftool does, unless there is a backup already."""
+    backup = backup_path(path)
+    if not backup.exists():
+        shutil.copy2(path, backup)
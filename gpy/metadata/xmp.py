@@ -0,0 +1,121 @@
+"""This module reads and writes the date properties of XMP packets."""
+
+import datetime
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, Iterator, List, Tuple
+
+from gpy.exiftool.tags import GroupAndTag
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.patch import Patch
+
+RDF_DESCRIPTION = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description"
+
+# Date properties, and the exiftool family 1 group and tag name of each
+DATE_PROPERTIES: Dict[str, GroupAndTag] = {
+    "{http://ns.adobe.com/xap/1.0/}CreateDate": ("XMP-xmp", "CreateDate"),
+    "{http://ns.adobe.com/xap/1.0/}ModifyDate": ("XMP-xmp", "ModifyDate"),
+    "{http://ns.adobe.com/exif/1.0/}DateTimeOriginal": (
+        "XMP-exif",
+        "DateTimeOriginal",
+    ),
+}
+
+
+def read_date_tags(packet: bytes) -> Iterator[Tuple[GroupAndTag, str]]:
+    """Yield the date properties of an XMP packet, as exiftool -n shows them.
+
+    Properties can be written both as attributes and as child elements of the
+    rdf:Description elements. Raise UnsupportedFile if the packet is not valid
+    XML.
+    """
+    try:
+        root = ElementTree.fromstring(packet)
+    except ElementTree.ParseError as exc:
+        raise UnsupportedFile(f"Invalid XMP packet: {exc}") from exc
+
+    for description in root.iter(RDF_DESCRIPTION):
+        for name, value in description.attrib.items():
+            if name in DATE_PROPERTIES:
+                yield DATE_PROPERTIES[name], to_exiftool_date(value)
+
+        for child in description:
+            if child.tag in DATE_PROPERTIES and child.text:
+                yield DATE_PROPERTIES[child.tag], to_exiftool_date(child.text.strip())
+
+
+def to_exiftool_date(value: str) -> str:
+    """Return an XMP date in exiftool format.
+
+    2019-02-02T18:44:43.001+01:00 --> 2019:02:02 18:44:43.001+01:00
+    """
+    if len(value) < 10 or value[4] != "-" or value[7] != "-":
+        return value
+
+    date = f"{value[0:4]}:{value[5:7]}:{value[8:10]}"
+    if value[10:11] == "T":
+        return f"{date} {value[11:]}"
+
+    return f"{date}{value[10:]}"
+
+
+def format_date(ts: datetime.datetime) -> str:
+    """Return a timestamp as exiftool writes it in XMP.
+
+    2019-02-02T18:44:43.001+01:00
+    """
+    if not ts.tzinfo:
+        raise ValueError("timezone required, but none found")
+
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + ts.isoformat()[-6:]
+
+
+# Values of the date properties, written either as attributes or as elements
+DATE_VALUE_REGEX = re.compile(
+    rb"(?<=[<\s])(?P<name>xmp:CreateDate|xmp:ModifyDate|exif:DateTimeOriginal)"
+    rb"(?:=[\"']|>)(?P<value>[^\"'<]*)"
+)
+
+# Whitespace left at the end of new packets, so that they can grow in place
+PADDING_SIZE = 2048
+
+PACKET_TEMPLATE = """\
+<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+    xmp:CreateDate="{create_date}"/>
+ </rdf:RDF>
+</x:xmpmeta>
+{padding}
+<?xpacket end="w"?>"""
+
+
+def build_packet(create_date: str) -> bytes:
+    """Return a new XMP packet with the given xmp:CreateDate."""
+    padding = "\n".join(" " * 99 for _ in range(PADDING_SIZE // 100))
+    return PACKET_TEMPLATE.format(create_date=create_date, padding=padding).encode()
+
+
+def plan_date_patches(packet: bytes, offset: int, value: str) -> List[Patch]:
+    """Return the patches which write a date to all the date properties.
+
+    `offset` is the offset of the packet in the file. The properties are the
+    ones `exiftool -AllDates -XMP:CreateDate` writes. Raise UnsupportedFile if
+    there is no xmp:CreateDate, or if any of the values would change length.
+    """
+    data = value.encode()
+    patches = []
+    names = set()
+    for matches in DATE_VALUE_REGEX.finditer(packet):
+        start, end = matches.span("value")
+        if end - start != len(data):
+            raise UnsupportedFile("Cannot write XMP dates in place")
+        names.add(matches.group("name"))
+        patches.append(Patch(offset=offset + start, data=data))
+
+    if b"xmp:CreateDate" not in names:
+        raise UnsupportedFile("No xmp:CreateDate found in XMP packet")
+
+    return patches
@@ -0,0 +1,352 @@
+"""This module runs items through stages of worker threads, connected by queues.
+
+The source is iterated in its own thread, and each stage has a pool of worker
+threads which take items from the queue of the stage, process them, and put
+the results in the queue of the next stage. Stages therefore overlap: while a
+stage processes an item, the previous one is already working on the next ones.
+
+Queues are bounded, and so is the number of items in flight, so a slow stage
+makes the stages before it wait (backpressure) instead of buffering items
+without limit. Results are yielded in the same order as the source items.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+)
+
+import attr
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait on a full or empty queue before checking whether to stop
+POLL_INTERVAL = 0.1
+
+
+class _Done:
+    """Marker put in a queue after the last item."""
+
+
+DONE = _Done()
+
+
+@attr.s(auto_attribs=True)
+class _Failure:
+    exc: BaseException
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class StageStats:
+    """Counters of a stage, for tuning its concurrency and queue size.
+
+    `busy_seconds` adds up the time spent by all the workers processing items.
+    `queue_depth` is the number of items waiting in the queue of the stage,
+    and `max_queue_depth` the most it ever had.
+    """
+
+    name: str
+    workers: int
+    items: int
+    busy_seconds: float
+    elapsed_seconds: float
+    queue_depth: int
+    max_queue_depth: int
+    queue_size: int
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second, since the pipeline started."""
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.items / self.elapsed_seconds
+
+    @property
+    def utilization(self) -> float:
+        """Share of the time the workers of the stage were busy."""
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.busy_seconds / (self.elapsed_seconds * self.workers)
+
+    def format(self) -> str:
+        return (
+            f"{self.name}: {self.items} items, {self.throughput:.1f} items/s, "
+            f"{self.workers} workers {self.utilization:.0%} busy, "
+            f"queue {self.queue_depth}/{self.queue_size} "
+            f"(max {self.max_queue_depth})"
+        )
+
+
+class _Stage:
+    def __init__(
+        self, name: str, fn: Callable[[Any], Any], workers: int, queue_size: int
+    ) -> None:
+        if workers < 1:
+            raise ValueError(f"Workers must be positive, got {workers}")
+        if queue_size < 1:
+            raise ValueError(f"Queue size must be positive, got {queue_size}")
+
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.running_workers = workers
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    """Process the items of a source through stages of worker threads.
+
+    Add the stages in order with add_stage() and iterate the pipeline to get
+    the results of the last stage, in source order:
+
+        pipeline = Pipeline(paths)
+        pipeline.add_stage("read", read_file, workers=4)
+        for result in pipeline:
+            ...
+
+    Use it as a context manager, or close it, to stop the threads if the
+    results are not consumed until the end.
+    """
+
+    def __init__(self, source: Iterable[Any], queue_size: int = 4) -> None:
+        self.source = source
+        self.queue_size = queue_size
+        self._stages: List[_Stage] = []
+        self._results: "queue.Queue[Any]" = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started_at: Optional[float] = None
+        self._in_flight: Optional[threading.BoundedSemaphore] = None
+
+    def __enter__(self) -> "Pipeline":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def add_stage(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+    ) -> "Pipeline":
+        """Add a stage which calls `fn` on the results of the previous stage.
+
+        `queue_size` is the number of items that can wait for a worker of
+        the stage, and defaults to the queue size of the pipeline.
+        """
+        if self._started_at is not None:
+            raise RuntimeError("Cannot add stages to a running pipeline")
+
+        size = self.queue_size if queue_size is None else queue_size
+        self._stages.append(_Stage(name, fn, workers, size))
+        return self
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self._stages:
+            raise RuntimeError("A pipeline needs at least one stage")
+        if self._started_at is not None:
+            raise RuntimeError("A pipeline can only be iterated once")
+
+        self._start()
+        try:
+            yield from self._ordered_results()
+        finally:
+            self.close()
+
+    def stats(self) -> List[StageStats]:
+        elapsed = 0.0
+        if self._started_at is not None:
+            elapsed = time.perf_counter() - self._started_at
+
+        return [
+            StageStats(
+                name=stage.name,
+                workers=stage.workers,
+                items=stage.items,
+                busy_seconds=stage.busy_seconds,
+                elapsed_seconds=elapsed,
+                queue_depth=stage.queue.qsize(),
+                max_queue_depth=stage.max_queue_depth,
+                queue_size=stage.queue_size,
+            )
+            for stage in self._stages
+        ]
+
+    def close(self) -> None:
+        """Stop the threads, dropping the items still in the pipeline."""
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+
+    def _start(self) -> None:
+        self._started_at = time.perf_counter()
+
+        # Items queued or being processed, plus a few waiting to be reordered
+        max_in_flight = sum(s.queue_size + s.workers for s in self._stages) + 1
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        self._threads.append(
+            threading.Thread(target=self._feed, name="gpy-pipeline-source")
+        )
+        for i, stage in enumerate(self._stages):
+            output = (
+                self._stages[i + 1].queue
+                if i + 1 < len(self._stages)
+                else self._results
+            )
+            for n in range(stage.workers):
+                self._threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(stage, output),
+                        name=f"gpy-pipeline-{stage.name}-{n}",
+                    )
+                )
+
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def _feed(self) -> None:
+        assert self._in_flight
+        first = self._stages[0]
+        iterator = iter(self.source)
+
+        try:
+            for seq in itertools.count():
+                if not self._acquire(self._in_flight):
+                    return
+
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._in_flight.release()
+                    break
+                except BaseException as exc:
+                    self._put(self._results, (seq, _Failure(exc)))
+                    return
+
+                self._put_in_stage(first, (seq, item))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+        self._put(first.queue, DONE)
+
+    def _work(self, stage: _Stage, output: "queue.Queue[Any]") -> None:
+        next_stage = self._next_stage(stage)
+
+        while True:
+            entry = self._get(stage.queue)
+            if entry is None:
+                return
+
+            if entry is DONE:
+                with stage.lock:
+                    stage.running_workers -= 1
+                    last = stage.running_workers == 0
+                # Let the other workers of the stage know, or the next stage
+                self._put(output if last else stage.queue, DONE)
+                return
+
+            seq, item = entry
+            started_at = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except BaseException as exc:
+                # Failures skip the remaining stages
+                self._put(self._results, (seq, _Failure(exc)))
+                continue
+            busy = time.perf_counter() - started_at
+
+            with stage.lock:
+                stage.items += 1
+                stage.busy_seconds += busy
+
+            if next_stage is None:
+                self._put(output, (seq, result))
+            else:
+                self._put_in_stage(next_stage, (seq, result))
+
+    def _ordered_results(self) -> Iterator[Any]:
+        assert self._in_flight
+        # Results which completed before those of earlier items
+        pending: Dict[int, Any] = {}
+        expected = 0
+
+        while True:
+            entry = self._results.get()
+            if entry is DONE:
+                assert not pending, f"{len(pending)} results were never yielded"
+                return
+
+            seq, result = entry
+            if isinstance(result, _Failure):
+                # Raise it right away, rather than after the items before it
+                self._stop.set()
+                raise result.exc
+
+            pending[seq] = result
+            while expected in pending:
+                self._in_flight.release()
+                yield pending.pop(expected)
+                expected += 1
+
+    def _next_stage(self, stage: _Stage) -> Optional[_Stage]:
+        i = self._stages.index(stage)
+        return self._stages[i + 1] if i + 1 < len(self._stages) else None
+
+    def _put_in_stage(self, stage: _Stage, entry: Any) -> None:
+        self._put(stage.queue, entry)
+        depth = stage.queue.qsize()
+        if depth > stage.max_queue_depth:
+            with stage.lock:
+                stage.max_queue_depth = max(stage.max_queue_depth, depth)
+
+    def _put(self, q: "queue.Queue[Any]", entry: Any) -> None:
+        while not self._stop.is_set():
+            try:
+                q.put(entry, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: "queue.Queue[Any]") -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _acquire(self, semaphore: threading.BoundedSemaphore) -> bool:
+        while not self._stop.is_set():
+            if semaphore.acquire(timeout=POLL_INTERVAL):
+                return True
+        return False
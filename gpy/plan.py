@@ -0,0 +1,73 @@
+"""This module stores the dates to write to many files, to write them later.
+
+A plan is a JSON lines file with the path and the timestamp to write to each
+file. Plans are applied in batches, and the number of entries applied so far
+is kept in a progress file next to the plan, so that an interrupted apply can
+be resumed after the last completed batch.
+"""
+
+import datetime
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import attr
+
+from gpy.types import structure, unstructure
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class PlanEntry:
+    path: Path
+    ts: datetime.datetime
+
+
+def progress_path(plan_path: Path) -> Path:
+    return plan_path.with_name(f"{plan_path.name}.progress")
+
+
+def write_plan(plan_path: Path, entries: Iterable[PlanEntry]) -> int:
+    """Write the entries to a plan and return how many there are.
+
+    Any progress of a previous plan at the same path is discarded.
+    """
+    count = 0
+    with plan_path.open("w") as f:
+        for entry in entries:
+            f.write(json.dumps(unstructure(entry)) + "\n")
+            count += 1
+
+    try:
+        progress_path(plan_path).unlink()
+    except FileNotFoundError:
+        pass
+
+    return count
+
+
+def read_plan(plan_path: Path, start: int = 0) -> Iterator[PlanEntry]:
+    """Yield the entries of a plan, skipping the first `start` ones."""
+    with plan_path.open() as f:
+        for line in itertools.islice(f, start, None):
+            yield structure(json.loads(line), PlanEntry)
+
+
+def read_progress(plan_path: Path) -> int:
+    """Return the number of entries of a plan already applied."""
+    try:
+        return int(progress_path(plan_path).read_text())
+    except FileNotFoundError:
+        return 0
+
+
+def write_progress(plan_path: Path, applied: int) -> None:
+    """Record the number of entries of a plan already applied.
+
+    The progress file is replaced atomically, so it is never left half written.
+    """
+    path = progress_path(plan_path)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(str(applied))
+    os.replace(tmp_path, path)
@@ -0,0 +1,142 @@
+"""This module contains an on-disk index of the metadata dates read by scans.
+
+Reading metadata is by far the slowest part of a scan, so the dates exiftool
+returns are stored in SQLite together with a fingerprint of the file (inode,
+size and modification time). Later scans reuse the stored dates of the files
+whose fingerprint did not change.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+import attr
+
+from gpy.exiftool.client import DatesTriple
+from gpy.types import structure, unstructure
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dates (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    metadata_date TEXT,
+    google_date TEXT
+)
+"""
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Fingerprint:
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> "Fingerprint":
+        return cls(inode=stat.st_ino, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+
+def _serialize_date(d: Optional[datetime]) -> Optional[str]:
+    return None if d is None else unstructure(d)
+
+
+def _deserialize_date(d: Optional[str]) -> Optional[datetime]:
+    return None if d is None else structure(d, datetime)
+
+
+class ScanIndex:
+    """Metadata dates of scanned files, keyed by absolute path.
+
+    The index can be shared across threads. It counts the lookups that found
+    up-to-date dates (hits) and the ones that did not (misses).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ScanIndex":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def clear(self) -> None:
+        logger.debug(f"Clearing scan index {self.path}")
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM dates")
+
+    def lookup_many(
+        self, fingerprints: Dict[Path, Fingerprint]
+    ) -> Dict[Path, DatesTriple]:
+        """Return the stored dates of the files whose fingerprint matches."""
+        found: Dict[Path, DatesTriple] = {}
+
+        with self._lock:
+            for path, fingerprint in fingerprints.items():
+                row = self._connection.execute(
+                    "SELECT inode, size, mtime_ns, metadata_date, google_date "
+                    "FROM dates WHERE path = ?",
+                    (_key(path),),
+                ).fetchone()
+
+                if row is None or Fingerprint(*row[:3]) != fingerprint:
+                    self.misses += 1
+                    continue
+
+                self.hits += 1
+                found[path] = DatesTriple(
+                    metadata_date=_deserialize_date(row[3]),
+                    google_date=_deserialize_date(row[4]),
+                )
+
+        return found
+
+    def store_many(
+        self, entries: Iterable[Tuple[Path, Fingerprint, DatesTriple]]
+    ) -> None:
+        """Store the dates of the files. Files that failed to be read are skipped."""
+        rows = [
+            (
+                _key(path),
+                fingerprint.inode,
+                fingerprint.size,
+                fingerprint.mtime_ns,
+                _serialize_date(dates.metadata_date),
+                _serialize_date(dates.google_date),
+            )
+            for path, fingerprint, dates in entries
+            if dates.error is None
+        ]
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO dates VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+
+def _key(path: Path) -> str:
+    return str(path.absolute())
@@ -0,0 +1,173 @@
+"""This module keeps a local copy of the index of a tracker spreadsheet.
+
+Fetching every row of a large spreadsheet takes minutes, while finding out
+whether it changed only takes a Drive API request: the version of a file
+increases with every change made to it. The sheet index (the ID and hash of
+each row) is stored in a JSON lines file, after a first line with the
+spreadsheet version it belongs to, and is reused as long as the spreadsheet
+stays at that version.
+
+The index of each shard of a sharded spreadsheet is stored in a file of its
+own, in a directory named after the spreadsheet, so that only the shards a
+report touches need to be fetched.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import attr
+from gspread.models import Spreadsheet, Worksheet
+from gspread.urls import DRIVE_FILES_API_V3_URL
+
+from gpy import config
+from gpy.google_sheet import SheetIndex, fetch_sheet_index
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class CachedSheet:
+    version: str
+    index: SheetIndex
+
+
+def sheet_cache_path(spreadsheet_id: str) -> Path:
+    return config.SHEET_CACHE_DIR / f"{spreadsheet_id}.jsonl"
+
+
+def shard_cache_dir(spreadsheet_id: str) -> Path:
+    return config.SHEET_CACHE_DIR / spreadsheet_id
+
+
+def shard_cache_path(spreadsheet_id: str, title: str) -> Path:
+    return shard_cache_dir(spreadsheet_id) / f"{title}.jsonl"
+
+
+def fetch_version(sh: Spreadsheet) -> str:
+    """Return the current version of the spreadsheet file."""
+    response = sh.client.request(
+        "get",
+        f"{DRIVE_FILES_API_V3_URL}/{sh.id}",
+        params={"fields": "version", "supportsAllDrives": True},
+    )
+    return str(response.json()["version"])
+
+
+def read_cache(path: Path) -> Optional[CachedSheet]:
+    """Return the cached index, or None if there is none or it is unreadable."""
+    try:
+        f = path.open()
+    except FileNotFoundError:
+        return None
+
+    with f:
+        try:
+            header = json.loads(next(f))
+            index = SheetIndex()
+            for line in f:
+                id, row_hash = json.loads(line)
+                index.append(id, row_hash)
+            return CachedSheet(version=header["version"], index=index)
+        except (StopIteration, KeyError, TypeError, ValueError) as exc:
+            logger.debug(f"ignoring unreadable sheet cache {path}: {exc!r}")
+            return None
+
+
+def write_cache(path: Path, cached: CachedSheet) -> None:
+    """Store the index, replacing the previous copy atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+
+    ids = [""] * len(cached.index)
+    for id, position in cached.index.positions.items():
+        ids[position] = id
+
+    with tmp_path.open("w") as f:
+        f.write(json.dumps({"version": cached.version}) + "\n")
+        for id, row_hash in zip(ids, cached.index.hashes):
+            f.write(json.dumps([id, row_hash]) + "\n")
+
+    os.replace(tmp_path, path)
+
+
+def fetch_cached_index(
+    sh: Spreadsheet, path: Path, refresh: bool = False
+) -> SheetIndex:
+    """Return the index of the spreadsheet, from the cache if it is up to date.
+
+    Otherwise, or if `refresh` is set, fetch the index and cache it.
+    """
+    version = fetch_version(sh)
+
+    if not refresh:
+        cached = read_cache(path)
+        if cached and cached.version == version:
+            logger.info(f"Using the local copy of the spreadsheet (version {version})")
+            return cached.index
+
+    logger.info("Fetching the IDs of every row of the spreadsheet...")
+    index = fetch_sheet_index(sh)
+    write_cache(path, CachedSheet(version=version, index=index))
+
+    return index
+
+
+def update_cache(sh: Spreadsheet, path: Path, index: SheetIndex) -> None:
+    """Cache the index just uploaded, with the version the upload created."""
+    write_cache(path, CachedSheet(version=fetch_version(sh), index=index))
+
+
+def fetch_cached_shard_indexes(
+    sh: Spreadsheet, worksheets: Sequence[Worksheet], refresh: bool = False
+) -> Tuple[str, Dict[str, SheetIndex]]:
+    """Return the version of the spreadsheet and the index of each worksheet.
+
+    The cached index of a worksheet is used if it is up to date, like in
+    fetch_cached_index().
+    """
+    version = fetch_version(sh)
+
+    indexes: Dict[str, SheetIndex] = {}
+    for worksheet in worksheets:
+        path = shard_cache_path(sh.id, worksheet.title)
+        cached = None if refresh else read_cache(path)
+        if cached and cached.version == version:
+            indexes[worksheet.title] = cached.index
+            continue
+
+        logger.info(f"Fetching the IDs of every row of {worksheet.title!r}...")
+        index = fetch_sheet_index(sh, worksheet=worksheet)
+        write_cache(path, CachedSheet(version=version, index=index))
+        indexes[worksheet.title] = index
+
+    return version, indexes
+
+
+def update_shard_caches(
+    sh: Spreadsheet, indexes: Dict[str, SheetIndex], version: Optional[str]
+) -> None:
+    """Cache the indexes of the shards just uploaded, like update_cache().
+
+    The upload creates a new version of the spreadsheet, which the indexes of
+    the other shards cached at `version`, from before the upload, are moved
+    to, as they did not change. The other cached indexes are removed.
+    """
+    new_version = fetch_version(sh)
+
+    for path in shard_cache_dir(sh.id).glob("*.jsonl"):
+        if path.stem in indexes:
+            continue
+        cached = read_cache(path) if version is not None else None
+        if cached and cached.version == version:
+            write_cache(path, CachedSheet(version=new_version, index=cached.index))
+        else:
+            path.unlink()
+
+    for title, index in indexes.items():
+        write_cache(
+            shard_cache_path(sh.id, title),
+            CachedSheet(version=new_version, index=index),
+        )
@@ -0,0 +1,305 @@
+"""This module splits the rows of a tracker spreadsheet across worksheets.
+
+Every cell of a worksheet counts towards the 10 million cell limit of a
+spreadsheet, whether it has a value or not, and large worksheets are slow to
+fetch. In the sharded layout, the rows are partitioned by directory: each
+shard worksheet holds the rows of a range of directories, sorted by name, and
+only has the columns of the tracker. The "Shards" worksheet is the index of
+the layout, with the first directory of each shard:
+
+    First directory      Worksheet
+    /photos/2019         Shard 1
+    /photos/2021/summer  Shard 2
+
+A row goes to the shard of the last first directory which sorts before its
+own directory, so new directories do not change the index, and reports of a
+directory tree only touch a few shards. Shards grow as rows are added to
+them: reshard() rebalances them, and turns a spreadsheet with all its rows in
+the first worksheet into a sharded one.
+"""
+
+import bisect
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import attr
+from gspread.exceptions import WorksheetNotFound
+from gspread.models import Spreadsheet, Worksheet
+
+from gpy.google_sheet import (
+    FIRST_ROW,
+    HEADER,
+    FileReport,
+    GSheet,
+    GSheetRow,
+    SheetChanges,
+    fetch_worksheet,
+    upload_changes,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TITLE = "Shards"
+INDEX_HEADER = ("First directory", "Worksheet")
+
+# Rows of each shard written by reshard(): 1.6 million cells
+SHARD_ROWS = 200_000
+
+# Shards which grew past this many rows are worth rebalancing
+RESHARD_ROWS = 2 * SHARD_ROWS
+
+
+class ShardLayoutError(Exception):
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class ShardLayout:
+    """First directory of each shard, sorted, and the title of its worksheet."""
+
+    first_directories: Tuple[str, ...]
+    titles: Tuple[str, ...]
+
+    def __attrs_post_init__(self) -> None:
+        if not self.titles:
+            raise ValueError("A shard layout needs at least one shard")
+        if len(self.first_directories) != len(self.titles):
+            raise ValueError("Every shard needs a first directory and a title")
+        if list(self.first_directories) != sorted(self.first_directories):
+            raise ValueError("The first directories of the shards must be sorted")
+
+    def shard_of(self, directory: str) -> str:
+        """Return the title of the worksheet which holds the rows of `directory`."""
+        position = bisect.bisect_right(self.first_directories, directory) - 1
+        return self.titles[max(position, 0)]
+
+    def split(self, report: Iterable[FileReport]) -> Dict[str, List[FileReport]]:
+        """Group the files of the report by shard, keeping their order."""
+        reports: Dict[str, List[FileReport]] = {}
+        for file in report:
+            shard = self.shard_of(str(file.path.parent))
+            reports.setdefault(shard, []).append(file)
+        return reports
+
+
+def fetch_layout(sh: Spreadsheet) -> Optional[ShardLayout]:
+    """Return the layout of the spreadsheet, or None if it is not sharded.
+
+    Raise ShardLayoutError if the index is empty or invalid, e.g. edited by hand.
+    """
+    shards = _fetch_index(sh)
+    if shards is None:
+        return None
+
+    if not shards:
+        raise _empty_index_error()
+
+    try:
+        return ShardLayout(
+            first_directories=tuple(directory for directory, _ in shards),
+            titles=tuple(title for _, title in shards),
+        )
+    except ValueError as exc:
+        raise ShardLayoutError(
+            f"The {INDEX_TITLE!r} worksheet is not a valid shard index: {exc}. "
+            "Fix it, or run `gpy reshard_sheet` to rebuild it"
+        ) from exc
+
+
+def _empty_index_error() -> ShardLayoutError:
+    return ShardLayoutError(
+        f"The {INDEX_TITLE!r} worksheet lists no shards. Restore its rows, "
+        "e.g. from the version history of the spreadsheet"
+    )
+
+
+def _fetch_index(sh: Spreadsheet) -> Optional[List[Tuple[str, str]]]:
+    """Return the (first directory, title) rows of the index, if there is one."""
+    try:
+        index = sh.worksheet(INDEX_TITLE)
+    except WorksheetNotFound:
+        return None
+
+    return [
+        (row[0], row[1])
+        for row in index.get_all_values()[1:]
+        if len(row) > 1 and row[1]
+    ]
+
+
+def fetch_shard_worksheets(
+    sh: Spreadsheet, layout: ShardLayout
+) -> Dict[str, Worksheet]:
+    """Return the worksheet of each shard, by title.
+
+    Raise ShardLayoutError if a shard of the index has no worksheet, e.g.
+    because it was renamed or deleted.
+    """
+    worksheets = {worksheet.title: worksheet for worksheet in sh.worksheets()}
+    missing = [title for title in layout.titles if title not in worksheets]
+    if missing:
+        titles = ", ".join(repr(title) for title in missing)
+        raise ShardLayoutError(
+            f"The {INDEX_TITLE!r} worksheet lists shards which do not exist: "
+            f"{titles}. Restore them, or run `gpy reshard_sheet` to rebuild "
+            "the shards from the rows left"
+        )
+    return {title: worksheets[title] for title in layout.titles}
+
+
+def plan_shards(
+    directory_rows: Dict[str, int], shard_rows: int = SHARD_ROWS
+) -> List[List[str]]:
+    """Pack the directories, in order, into shards of up to `shard_rows` rows.
+
+    The rows of a directory are never split, so a directory with more rows
+    than that has a shard of its own.
+    """
+    if shard_rows < 1:
+        raise ValueError(f"Shard rows must be positive, got {shard_rows}")
+
+    shards: List[List[str]] = [[]]
+    rows = 0
+    for directory in sorted(directory_rows):
+        count = directory_rows[directory]
+        if shards[-1] and rows + count > shard_rows:
+            shards.append([])
+            rows = 0
+        shards[-1].append(directory)
+        rows += count
+
+    return shards
+
+
+def fetch_all_rows(sh: Spreadsheet, layout: Optional[ShardLayout]) -> GSheet:
+    """Fetch the rows of every shard, or of the first worksheet if not sharded.
+
+    Raise ShardLayoutError if a shard has no worksheet.
+    """
+    if layout is None:
+        return fetch_worksheet(sh)
+
+    gsheet: GSheet = {}
+    for worksheet in fetch_shard_worksheets(sh, layout).values():
+        gsheet.update(fetch_worksheet(sh, worksheet=worksheet))
+    return gsheet
+
+
+def _fetch_existing_shards(sh: Spreadsheet, titles: Iterable[str]) -> GSheet:
+    """Fetch the rows of the shards, skipping the ones which do not exist."""
+    worksheets = {worksheet.title: worksheet for worksheet in sh.worksheets()}
+
+    gsheet: GSheet = {}
+    for title in titles:
+        worksheet = worksheets.get(title)
+        if worksheet is None:
+            logger.warning(f"Skipping the {title!r} shard, which does not exist")
+            continue
+        gsheet.update(fetch_worksheet(sh, worksheet=worksheet))
+    return gsheet
+
+
+def reshard(
+    sh: Spreadsheet, shard_rows: int = SHARD_ROWS
+) -> Tuple[ShardLayout, Dict[str, GSheet]]:
+    """Rewrite the rows of the spreadsheet into shards of about `shard_rows` rows.
+
+    New worksheets are filled in first, then the index is switched over to
+    them in a single request, and only then are the previous worksheets
+    deleted, so that an interrupted reshard leaves the spreadsheet as it was.
+    Return the new layout and the rows of each shard.
+
+    The index only needs to list the shards: it is rebuilt even if it is out
+    of order, e.g. edited by hand.
+    """
+    index = _fetch_index(sh)
+    if index == []:
+        # There is no way to tell which worksheets hold the rows
+        raise _empty_index_error()
+
+    worksheets = sh.worksheets()
+    taken_titles = {worksheet.title for worksheet in worksheets}
+
+    logger.info("Fetching every row of the spreadsheet...")
+    if index is None:
+        previous_titles = {sh.sheet1.title}
+        gsheet = fetch_worksheet(sh)
+    else:
+        previous_titles = {title for _, title in index}
+        # Shards which were deleted by hand are left out of the new layout
+        gsheet = _fetch_existing_shards(sh, [title for _, title in index])
+
+    directory_rows: Dict[str, int] = {}
+    for row in gsheet.values():
+        directory_rows[row.last_dir] = directory_rows.get(row.last_dir, 0) + 1
+    planned = plan_shards(directory_rows, shard_rows)
+
+    titles = _new_titles(taken_titles, len(planned))
+    shard_of_directory = {
+        directory: title
+        for title, directories in zip(titles, planned)
+        for directory in directories
+    }
+    shards: Dict[str, GSheet] = {title: {} for title in titles}
+    for row in sorted(gsheet.values(), key=lambda r: r.id):
+        shards[shard_of_directory[row.last_dir]][row.id] = row
+
+    for title, rows in shards.items():
+        logger.info(f"Writing {len(rows)} rows to the {title!r} worksheet...")
+        _write_shard(sh, title, rows.values())
+
+    new_layout = ShardLayout(
+        first_directories=tuple(d[0] if d else "" for d in planned),
+        titles=tuple(titles),
+    )
+    _write_index(sh, new_layout, worksheets)
+
+    for worksheet in worksheets:
+        if worksheet.title in previous_titles:
+            logger.info(f"Deleting the {worksheet.title!r} worksheet...")
+            sh.del_worksheet(worksheet)
+
+    return new_layout, shards
+
+
+def _new_titles(taken_titles: Iterable[str], count: int) -> List[str]:
+    taken = set(taken_titles)
+    titles: List[str] = []
+    number = 1
+    while len(titles) < count:
+        title = f"Shard {number}"
+        if title not in taken:
+            titles.append(title)
+        number += 1
+    return titles
+
+
+def _write_shard(sh: Spreadsheet, title: str, rows: Iterable[GSheetRow]) -> None:
+    inserted = {row_number: row for row_number, row in enumerate(rows, FIRST_ROW)}
+    worksheet = sh.add_worksheet(
+        title, rows=max(inserted, default=FIRST_ROW), cols=len(HEADER)
+    )
+    worksheet.update("A1", [list(HEADER)])
+    upload_changes(sh, SheetChanges(inserted=inserted), worksheet=worksheet)
+
+
+def _write_index(
+    sh: Spreadsheet, layout: ShardLayout, worksheets: List[Worksheet]
+) -> None:
+    values = [list(INDEX_HEADER)]
+    values.extend(
+        [directory, title]
+        for directory, title in zip(layout.first_directories, layout.titles)
+    )
+
+    index = next((w for w in worksheets if w.title == INDEX_TITLE), None)
+    if index is None:
+        index = sh.add_worksheet(INDEX_TITLE, rows=len(values), cols=2)
+    elif index.row_count < len(values):
+        index.add_rows(len(values) - index.row_count)
+    elif index.row_count > len(values):
+        # Blank the shards left over from the previous layout in the same
+        # request, so that the index never mixes both layouts
+        values.extend([["", ""]] * (index.row_count - len(values)))
+
+    index.update(f"A1:B{len(values)}", values)
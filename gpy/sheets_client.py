@@ -0,0 +1,195 @@
+"""This module contains a gspread client which keeps within the Sheets API quotas.
+
+The Sheets API allows 60 requests per minute and user, and answers with 429
+(Too Many Requests) past that, or with 5xx errors when it is overloaded. Every
+request of RateLimitedClient waits for a token of a token bucket, which is
+refilled at the allowed rate, and failed requests are retried with exponential
+backoff and jitter:
+
+    gc = RateLimitedClient.from_client(gspread.oauth())
+    sh = gc.open("Photo backup tracker")
+
+Spreadsheets opened with the client send all their requests through it.
+
+Requests which the API rejected for going over the quota (429) are always
+retried, as they were not run, while server and connection errors are only
+retried for idempotent requests: a request which did run before its response
+got lost must not append rows or add worksheets twice.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+import attr
+import requests
+from gspread.client import Client
+from gspread.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_MINUTE = 60
+BURST = 5
+
+TOO_MANY_REQUESTS = 429
+
+# Server errors which are worth retrying, if the request is idempotent
+RETRY_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+# POST requests of the Sheets API which read, write or clear fixed ranges,
+# so that running them twice has the same effect as running them once
+IDEMPOTENT_POST_SUFFIXES = (
+    "/values:batchGet",
+    "/values:batchUpdate",
+    "/values:batchClear",
+    ":clear",
+)
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second, and bursts of up to `capacity`.
+
+    The bucket can be shared across threads.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, got {capacity}")
+
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for one if needed, and return the time waited."""
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated_at
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+            # Tokens can go negative: later callers wait for the earlier ones
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class RetryPolicy:
+    """Retry failed requests up to `retries` times, with exponential backoff.
+
+    The delay before retry number `n` (from 0) is picked at random between 0
+    and `min(max_delay, base_delay * 2**n)` (full jitter), unless the response
+    tells how long to wait with a Retry-After header.
+    """
+
+    retries: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 64.0
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        return rng.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class RateLimitedClient(Client):
+    """gspread client which rate limits and retries its requests."""
+
+    def __init__(
+        self,
+        auth: Any,
+        session: Optional[requests.Session] = None,
+        *,
+        bucket: Optional[TokenBucket] = None,
+        retry: RetryPolicy = RetryPolicy(),
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        super().__init__(auth, session=session)
+        self.bucket = bucket or TokenBucket(
+            rate=REQUESTS_PER_MINUTE / 60, capacity=BURST, sleep=sleep
+        )
+        self.retry = retry
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def from_client(cls, client: Client, **kwargs: Any) -> "RateLimitedClient":
+        """Wrap an authenticated client, e.g. the one gspread.oauth() returns."""
+        rate_limited = cls(None, session=client.session, **kwargs)
+        rate_limited.auth = getattr(client, "auth", None)
+        return rate_limited
+
+    def request(self, method: str, endpoint: str, *args: Any, **kwargs: Any) -> Any:
+        idempotent = is_idempotent(method, endpoint)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as exc:
+                status_code = exc.response.status_code
+                if status_code != TOO_MANY_REQUESTS and not (
+                    idempotent and status_code in RETRY_STATUS_CODES
+                ):
+                    raise
+                failure: Exception = exc
+                error = f"{status_code} {exc}"
+                retry_after = _retry_after(exc.response)
+            except requests.ConnectionError as exc:
+                if not idempotent:
+                    raise
+                failure = exc
+                error = str(exc)
+                retry_after = None
+
+            if attempt >= self.retry.retries:
+                logger.error(f"Giving up {method.upper()} {endpoint}: {error}")
+                raise failure
+
+            delay = retry_after
+            if delay is None:
+                delay = self.retry.delay(attempt, self._rng)
+            logger.warning(
+                f"Sheets API request failed ({error}), retrying in {delay:.1f}s"
+            )
+            self._sleep(delay)
+            attempt += 1
+
+
+def is_idempotent(method: str, endpoint: str) -> bool:
+    """Tell whether a request can be repeated without changing its effect.
+
+    Like appending rows, most spreadsheet batchUpdate requests are not.
+    """
+    method = method.lower()
+    if method in ("get", "put"):
+        return True
+
+    path = urlparse(endpoint).path
+    return method == "post" and path.endswith(IDEMPOTENT_POST_SUFFIXES)
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Return the seconds to wait given by a Retry-After header, if any."""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
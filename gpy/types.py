@@ -2,15 +2,27 @@ import logging
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Tuple, Type
 
 import attr
 import cattr
 
+from gpy import config
+
 converter = cattr.Converter()
 structure = converter.structure
 unstructure = converter.unstructure
 
+# Errors raised by structure() on data of the wrong shape: older cattrs let
+# the errors of the hooks through, newer ones wrap them in validation errors
+STRUCTURE_ERRORS: Tuple[Type[Exception], ...] = (KeyError, TypeError, ValueError)
+try:
+    from cattrs.errors import BaseValidationError
+except ImportError:
+    pass
+else:
+    STRUCTURE_ERRORS += (BaseValidationError,)
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,7 +69,8 @@ converter.register_structure_hook(datetime, structure_datetime)
 converter.register_unstructure_hook(datetime, unstructure_datetime)
 
 
-@attr.s(auto_attribs=True, frozen=True)
+# Slotted, as scans of large libraries create one per file
+@attr.s(auto_attribs=True, frozen=True, slots=True)
 class Report:  # TODO: rename Report --> MediaMetadata
     path: Path
     filename_date: Optional[datetime] = None
@@ -67,7 +80,7 @@ class Report:  # TODO: rename Report --> MediaMetadata
 
     @property
     def dates_match(self) -> bool:
-        return _compare_dates(self.filename_date, self.metadata_date)
+        return compare_dates(self.filename_date, self.metadata_date)
 
     @property
     def fmt_filename_date(self) -> str:
@@ -84,13 +97,25 @@ class Report:  # TODO: rename Report --> MediaMetadata
         return self.google_date is not None
 
 
-def _compare_dates(a: Optional[datetime], b: Optional[datetime]) -> bool:
+def compare_dates(a: Optional[datetime], b: Optional[datetime]) -> bool:
     if not (a and b):
         return False
 
+    # Metadata dates are usually naive local times, whereas some file names
+    # have an aware date, e.g. Pixel ones in UTC
+    if (a.tzinfo is None) != (b.tzinfo is None):
+        a, b = _to_local_naive(a), _to_local_naive(b)
+
     return a == b
 
 
+def _to_local_naive(d: datetime) -> datetime:
+    if d.tzinfo is None:
+        return d
+
+    return d.astimezone(config.DEFAULT_ZONEINFO).replace(tzinfo=None)
+
+
 def print_report(report: Report) -> None:
     """Print on screen a report dictionary."""
 
@@ -106,7 +131,5 @@ def print_report(report: Report) -> None:
             f"    > metadata: {report.fmt_metadata_date}\n"
             f"    > filename: {report.fmt_filename_date}"
         )
-    elif report.filename_date == report.metadata_date:
-        logger.debug("    OK: matching timestamp found in filename and in metadata")
     else:
-        raise NotImplementedError("An unexpected case was reached!")
+        logger.debug("    OK: matching timestamp found in filename and in metadata")
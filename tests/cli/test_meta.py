@@ -1,8 +1,22 @@
 import datetime
+import logging
+from pathlib import Path
 
 import pytest
 
-from gpy.cli.meta import input_to_datetime
+from gpy.cli.meta import (
+    _dates_match,
+    apply_plan,
+    edit_metadata_datetime,
+    input_to_datetime,
+)
+from gpy.exiftool.client import DatesTriple, ExifToolError, WriteResult
+from gpy.journal import FAILED, SKIPPED, WRITTEN, Journal, JournalEntry, read_journal
+from gpy.metadata.jpeg import EXIF_HEADER, XMP_HEADER
+from gpy.plan import PlanEntry, read_plan, read_progress, write_plan, write_progress
+from tests.metadata.test_jpeg import XMP_PACKET, build_exif_with_all_dates, build_jpeg
+
+CET = datetime.timezone(datetime.timedelta(hours=1))
 
 
 @pytest.mark.parametrize(
@@ -43,3 +57,246 @@ def test_input_to_datetime_with_valid_datetime(input, expected_result):
     actual_result = input_to_datetime(input)
 
     assert actual_result == expected_result
+
+
+@pytest.mark.parametrize(
+    ("dates", "expected_result"),
+    [
+        pytest.param(
+            DatesTriple(
+                metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24),
+                google_date=datetime.datetime(2019, 1, 1, 8, 50, 24, 10000, tzinfo=CET),
+            ),
+            True,
+            id="naive metadata date",
+        ),
+        pytest.param(
+            DatesTriple(
+                metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24, tzinfo=CET),
+                google_date=datetime.datetime(2019, 1, 1, 8, 50, 24, 10000, tzinfo=CET),
+            ),
+            True,
+            id="aware metadata date",
+        ),
+        pytest.param(
+            DatesTriple(
+                metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24),
+                google_date=None,
+            ),
+            False,
+            id="missing google date",
+        ),
+        pytest.param(
+            DatesTriple(
+                metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 25),
+                google_date=datetime.datetime(2019, 1, 1, 8, 50, 24, 10000, tzinfo=CET),
+            ),
+            False,
+            id="different metadata date",
+        ),
+        pytest.param(
+            DatesTriple(
+                metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24),
+                google_date=datetime.datetime(2019, 1, 1, 8, 50, 24, 10000),
+            ),
+            False,
+            id="google date without timezone",
+        ),
+        pytest.param(DatesTriple(error="File not found"), False, id="error"),
+    ],
+)
+def test_dates_match(dates, expected_result):
+    # Milliseconds are what exiftool keeps of the microseconds
+    ts = datetime.datetime(2019, 1, 1, 8, 50, 24, 10123, tzinfo=CET)
+
+    assert _dates_match(dates, ts) is expected_result
+
+
+def test_edit_metadata_datetime_skips_correct_files(mocker, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    correct, wrong, failing = (
+        tmp_path / "IMG_20190101_085024_211.jpg",
+        tmp_path / "IMG_20190101_085025_211.jpg",
+        tmp_path / "IMG_20190101_085026_211.jpg",
+    )
+    for path in (correct, wrong, failing):
+        path.write_bytes(b"\x00" * 2048)
+
+    exiftool = mocker.patch("gpy.cli.meta.ExifToolSession").return_value
+    exiftool.read_dates_many.return_value = {
+        correct: DatesTriple(
+            metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24),
+            google_date=datetime.datetime(2019, 1, 1, 8, 50, 24, tzinfo=CET),
+        ),
+        wrong: DatesTriple(metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 24)),
+        failing: DatesTriple(error="Error: File format error"),
+    }
+
+    def write_ts(path, *, ts, backup):
+        if path == failing:
+            raise ExifToolError("Error: File format error")
+        return WriteResult(path=path, bytes_written=40)
+
+    exiftool.write_ts.side_effect = write_ts
+
+    edit_metadata_datetime(
+        path=tmp_path,
+        read_datetime_from_filename=True,
+        input=None,
+        backup=False,
+        exiftool_only=True,
+    )
+
+    exiftool.read_dates_many.assert_called_once_with([correct, wrong, failing])
+    assert [call.args[0] for call in exiftool.write_ts.call_args_list] == [
+        wrong,
+        failing,
+    ]
+    assert caplog.messages == [
+        f"writing date 2019-01-01 08:50:25.000 as metadata to {wrong}",
+        f"writing date 2019-01-01 08:50:26.000 as metadata to {failing}",
+        "Error: File format error",
+        "1 written, 1 skipped (2.0 KiB saved), 1 failed",
+    ]
+
+
+def test_edit_metadata_datetime_resumes_from_journal(mocker, tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    written, failed, pending = (
+        photos / "IMG_20190101_085024_211.jpg",
+        photos / "IMG_20190101_085025_211.jpg",
+        photos / "IMG_20190101_085026_211.jpg",
+    )
+    for path in (written, failed, pending):
+        path.touch()
+    journal_path = tmp_path / "journal.jsonl"
+    with Journal(journal_path) as journal:
+        journal.record(JournalEntry(path=written, outcome=WRITTEN))
+        journal.record(JournalEntry(path=failed, outcome=FAILED))
+
+    exiftool = mocker.patch("gpy.cli.meta.ExifToolSession").return_value
+    exiftool.read_dates_many.side_effect = lambda paths: {
+        path: DatesTriple(
+            metadata_date=datetime.datetime(2019, 1, 1, 8, 50, 26),
+            google_date=datetime.datetime(2019, 1, 1, 8, 50, 26, tzinfo=CET),
+        )
+        for path in paths
+    }
+    exiftool.write_ts.return_value = WriteResult(path=failed, bytes_written=40)
+
+    with Journal(journal_path, resume=True) as journal:
+        edit_metadata_datetime(
+            path=photos,
+            read_datetime_from_filename=True,
+            input=None,
+            backup=False,
+            exiftool_only=True,
+            journal=journal,
+        )
+
+    exiftool.read_dates_many.assert_called_once_with([failed, pending])
+    assert [call.args[0] for call in exiftool.write_ts.call_args_list] == [failed]
+    assert [(entry.path, entry.outcome) for entry in read_journal(journal_path)] == [
+        (written, WRITTEN),
+        (failed, FAILED),
+        (failed, WRITTEN),
+        (pending, SKIPPED),
+    ]
+
+
+def test_edit_metadata_datetime_writes_plan(mocker, tmp_path):
+    session = mocker.patch("gpy.cli.meta.ExifToolSession")
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    for name in ("IMG_20190101_085024_211.jpg", "no_date.jpg"):
+        (photos / name).touch()
+    plan_path = tmp_path / "plan.jsonl"
+
+    edit_metadata_datetime(
+        path=photos,
+        read_datetime_from_filename=True,
+        input=None,
+        backup=False,
+        plan=plan_path,
+    )
+
+    session.assert_not_called()
+    assert [entry.path.name for entry in read_plan(plan_path)] == [
+        "IMG_20190101_085024_211.jpg"
+    ]
+
+
+def test_apply_plan_from_another_directory(mocker, tmp_path, monkeypatch):
+    mocker.patch("gpy.cli.meta.ExifToolSession")
+    exiftool = mocker.patch("gpy.cli.meta.ExifTool").return_value
+    exiftool.write_ts_many.side_effect = lambda timestamps, backup: {
+        path: None for path, _ in timestamps
+    }
+    photo = tmp_path / "photos" / "IMG_20190101_085024_211.jpg"
+    photo.parent.mkdir()
+    photo.touch()
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    plan_path = tmp_path / "plan.jsonl"
+
+    monkeypatch.chdir(tmp_path)
+    edit_metadata_datetime(
+        path=Path("photos"),
+        read_datetime_from_filename=True,
+        input=None,
+        backup=False,
+        plan=plan_path,
+    )
+    monkeypatch.chdir(elsewhere)
+    apply_plan(plan_path, backup=False)
+
+    (call,) = exiftool.write_ts_many.call_args_list
+    assert [path for path, _ in call.args[0]] == [photo]
+
+
+def test_apply_plan_resumes_after_last_batch(mocker, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    exiftool = mocker.patch("gpy.cli.meta.ExifTool").return_value
+    exiftool.write_ts_many.side_effect = lambda timestamps, backup: {
+        path: None for path, _ in timestamps
+    }
+    ts = datetime.datetime(2019, 1, 1, tzinfo=CET)
+    entries = [PlanEntry(path=tmp_path / f"{i}.jpg", ts=ts) for i in range(5)]
+    plan_path = tmp_path / "plan.jsonl"
+    write_plan(plan_path, entries)
+    write_progress(plan_path, 2)
+
+    apply_plan(plan_path, backup=False, batch_size=2)
+
+    assert [
+        [path.name for path, _ in call.args[0]]
+        for call in exiftool.write_ts_many.call_args_list
+    ] == [["2.jpg", "3.jpg"], ["4.jpg"]]
+    assert read_progress(plan_path) == 5
+    assert caplog.messages == [
+        f"resuming {plan_path} after 2 files",
+        "writing dates to files 3-4",
+        "writing dates to files 5-5",
+        "3 written, 0 failed",
+    ]
+
+
+def test_edit_metadata_datetime_patches_natively_without_exiftool(
+    mocker, tmp_path, caplog
+):
+    caplog.set_level(logging.INFO)
+    popen = mocker.patch("subprocess.Popen", side_effect=FileNotFoundError)
+    path = tmp_path / "IMG_20190202_184442_353.jpg"
+    exif = build_exif_with_all_dates(b"2019:02:02 18:44:43")
+    path.write_bytes(build_jpeg(EXIF_HEADER + exif, XMP_HEADER + XMP_PACKET))
+
+    edit_metadata_datetime(
+        path=path,
+        read_datetime_from_filename=True,
+        input=None,
+        backup=False,
+    )
+
+    popen.assert_not_called()
+    assert caplog.messages[-1].startswith("1 written, 0 skipped")
@@ -1,11 +1,17 @@
 import datetime
+import time
 from pathlib import Path
+from typing import Optional
 from unittest.mock import MagicMock
 from zoneinfo import ZoneInfo
 
 import pytest
 
-from gpy.cli.scan import _scan_date, scan_gps
+from gpy.cli.scan import _report_dates, scan_date, scan_gps
+from gpy.exiftool.client import DatesTriple
+from gpy.filenames import parse_datetime
+from gpy.journal import Journal, read_journal
+from gpy.scan_index import ScanIndex
 from gpy.types import Report
 
 TZ = ZoneInfo("Europe/Madrid")
@@ -88,20 +94,204 @@ def test_scan_single_file_date(
     metadata_datetime: datetime.datetime,
     expected_result: Report,
 ) -> None:
-    parser_mock = MagicMock()
-    parser_mock.return_value = filename_datetime
+    actual_result = _report_dates(
+        path, filename_datetime, DatesTriple(metadata_date=metadata_datetime)
+    )
+
+    assert actual_result == expected_result
+
+
+def test_scan_pixel_file_with_correct_metadata(tmp_path: Path) -> None:
+    path = tmp_path / "PXL_20190101_085024211.jpg"
+    path.touch()
+
+    # Pixel file names are in UTC, whereas metadata dates are local times
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.return_value = {
+        path: DatesTriple(metadata_date=datetime.datetime(2019, 1, 1, 9, 50, 24))
+    }
+
+    (report,) = scan_date(exiftool_client_mock, parse_datetime, path)
+
+    assert report.dates_match
+
+
+def test_scan_date_reads_metadata_in_batches(tmp_path: Path) -> None:
+    names = [f"IMG_20100101_16010{i}_000.jpg" for i in range(5)]
+    for name in names:
+        (tmp_path / name).touch()
+
+    def read_dates_many(paths):
+        return {
+            path: DatesTriple(metadata_date=datetime.datetime(2010, 1, 1, 16, 1, 0))
+            for path in paths
+        }
+
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.side_effect = read_dates_many
+
+    reports = scan_date(exiftool_client_mock, parse_datetime, tmp_path, batch_size=2)
+
+    batches = [c.args[0] for c in exiftool_client_mock.read_dates_many.call_args_list]
+    assert batches == [
+        [tmp_path / names[0], tmp_path / names[1]],
+        [tmp_path / names[2], tmp_path / names[3]],
+        [tmp_path / names[4]],
+    ]
+    assert reports == [
+        Report(
+            path=tmp_path / name,
+            filename_date=datetime.datetime(2010, 1, 1, 16, 1, i),
+            metadata_date=datetime.datetime(2010, 1, 1, 16, 1, 0),
+        )
+        for i, name in enumerate(names)
+    ]
+
+
+def test_scan_date_in_parallel_keeps_path_order(tmp_path: Path) -> None:
+    names = [f"IMG_20100101_1601{i:02}_000.jpg" for i in range(20)]
+    for name in names:
+        (tmp_path / name).touch()
+
+    def read_dates_many(paths):
+        # Make the first batches the slowest ones to complete
+        time.sleep(0.001 * (20 - int(paths[0].name[17:19])))
+        return {path: DatesTriple() for path in paths}
 
     exiftool_client_mock = MagicMock()
-    exiftool_client_mock.read_datetime.return_value = metadata_datetime
-    exiftool_client_mock.read_google_timestamp.return_value = None
+    exiftool_client_mock.read_dates_many.side_effect = read_dates_many
 
-    actual_result = _scan_date(
-        exiftool=exiftool_client_mock,
-        parse_datetime=parser_mock,
-        path=path,
+    reports = scan_date(
+        exiftool_client_mock, parse_datetime, tmp_path, batch_size=3, jobs=4
     )
 
-    assert actual_result == expected_result
+    assert [report.path for report in reports] == [tmp_path / n for n in names]
+
+
+def test_scan_date_with_small_queues_scans_every_file(tmp_path: Path) -> None:
+    names = [f"IMG_20100101_1601{i:02}_000.jpg" for i in range(20)]
+    for name in names:
+        (tmp_path / name).touch()
+
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.side_effect = lambda paths: {
+        path: DatesTriple() for path in paths
+    }
+
+    reports = scan_date(
+        exiftool_client_mock,
+        parse_datetime,
+        tmp_path,
+        batch_size=2,
+        jobs=3,
+        parsers=2,
+        queue_size=1,
+    )
+
+    assert [report.path for report in reports] == [tmp_path / n for n in names]
+    assert [report.filename_date for report in reports] == [
+        datetime.datetime(2010, 1, 1, 16, 1, i) for i in range(20)
+    ]
+
+
+def test_scan_date_only_reads_new_or_changed_files(tmp_path: Path) -> None:
+    root = tmp_path / "photos"
+    root.mkdir()
+    unchanged = root / "IMG_20100101_160101_000.jpg"
+    changed = root / "IMG_20100101_160102_000.jpg"
+    unchanged.write_text("foo")
+    changed.write_text("bar")
+
+    metadata_date = datetime.datetime(2010, 1, 1, 16, 1, 0)
+
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.side_effect = lambda paths: {
+        path: DatesTriple(metadata_date=metadata_date) for path in paths
+    }
+
+    with ScanIndex(tmp_path / "index.sqlite3") as index:
+        scan_date(exiftool_client_mock, parse_datetime, root, index=index)
+        changed.write_text("baz!")
+        reports = scan_date(exiftool_client_mock, parse_datetime, root, index=index)
+
+        assert (index.hits, index.misses) == (1, 3)
+
+    batches = [c.args[0] for c in exiftool_client_mock.read_dates_many.call_args_list]
+    assert batches == [[unchanged, changed], [changed]]
+    assert [report.metadata_date for report in reports] == [metadata_date] * 2
+
+
+def test_scan_date_reports_files_removed_after_the_walk(tmp_path: Path) -> None:
+    root = tmp_path / "photos"
+    root.mkdir()
+    kept = root / "IMG_20100101_160101_000.jpg"
+    removed = root / "IMG_20100101_160102_000.jpg"
+    kept.write_text("foo")
+    removed.write_text("bar")
+
+    def parse_and_remove(name: str) -> Optional[datetime.datetime]:
+        # The walk listed the file, which is removed before it is fingerprinted
+        if name == removed.name:
+            removed.unlink()
+        return parse_datetime(name)
+
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.side_effect = lambda paths: {
+        path: (
+            DatesTriple(metadata_date=datetime.datetime(2010, 1, 1, 16, 1, 1))
+            if path.exists()
+            else DatesTriple(error=f"Error: File not found - {path}")
+        )
+        for path in paths
+    }
+
+    with ScanIndex(tmp_path / "index.sqlite3") as index:
+        reports = scan_date(exiftool_client_mock, parse_and_remove, root, index=index)
+
+        assert (index.hits, index.misses) == (0, 1)
+
+    assert [report.path for report in reports] == [kept, removed]
+    assert reports[0].metadata_date == datetime.datetime(2010, 1, 1, 16, 1, 1)
+    assert reports[1].metadata_date is None
+
+
+def test_scan_date_resumes_from_journal(tmp_path: Path) -> None:
+    root = tmp_path / "photos"
+    root.mkdir()
+    names = [f"IMG_20100101_16010{i}_000.jpg" for i in range(4)]
+    for name in names:
+        (root / name).touch()
+
+    metadata_date = datetime.datetime(2010, 1, 1, 16, 1, 0)
+
+    exiftool_client_mock = MagicMock()
+    exiftool_client_mock.read_dates_many.side_effect = lambda paths: {
+        path: DatesTriple(metadata_date=metadata_date) for path in paths
+    }
+
+    journal_path = tmp_path / "journal.jsonl"
+    with Journal(journal_path) as journal:
+        first_reports = scan_date(
+            exiftool_client_mock, parse_datetime, root, journal=journal
+        )
+    # The first run died after scanning the 1st and 3rd files
+    lines = journal_path.read_text().splitlines()
+    journal_path.write_text(f"{lines[0]}\n{lines[2]}\n")
+    exiftool_client_mock.reset_mock()
+
+    with Journal(journal_path, resume=True) as journal:
+        reports = scan_date(exiftool_client_mock, parse_datetime, root, journal=journal)
+
+    exiftool_client_mock.read_dates_many.assert_called_once_with(
+        [root / names[1], root / names[3]]
+    )
+    assert reports == first_reports
+    assert [entry.path.name for entry in read_journal(journal_path)] == [
+        names[0],
+        names[2],
+        names[1],
+        names[3],
+    ]
 
 
 @pytest.mark.skip(reason="not implemented")
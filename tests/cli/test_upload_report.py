@@ -0,0 +1,100 @@
+import attr
+import pytest
+
+from gpy import config
+from gpy.cli.upload_report import read_file_reports, upload_shards
+from gpy.filesystem import write_reports
+from gpy.google_sheet import FileReport, fetch_worksheet, merge
+from gpy.sheet_shards import ShardLayoutError, fetch_all_rows, fetch_layout, reshard
+from tests.test_columnar import REPORTS as COLUMNAR_REPORTS
+from tests.test_google_sheet import file_report, sheet_of
+
+REPORTS = [
+    file_report(i, directory=directory)
+    for directory in ("/photos/a", "/photos/b", "/photos/c")
+    for i in range(4)
+]
+
+
+@pytest.fixture
+def sh(tmp_path, mocker):
+    mocker.patch.object(config, "SHEET_CACHE_DIR", tmp_path)
+
+    # The version of the spreadsheet changes with every write
+    for target in ("gpy.sheet_cache", "gpy.cli.upload_report"):
+        mocker.patch(f"{target}.fetch_version", lambda sh: str(sh.requests))
+
+    sh = sheet_of(REPORTS)
+    reshard(sh, shard_rows=4)
+    return sh
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_upload_shards_only_touches_shards_of_report(sh, full):
+    gsheet = fetch_all_rows(sh, fetch_layout(sh))
+    report = [file_report(1, dates_match=False, directory="/photos/b")]
+    report.append(file_report(0, directory="/photos/b/2020"))
+    for worksheet in sh.worksheets():
+        worksheet.cells_read = 0
+
+    layout = fetch_layout(sh)
+    assert layout is not None
+
+    upload_shards(sh, layout, report, full=full)
+
+    assert sh.worksheet("Shard 1").cells_read == 0
+    assert sh.worksheet("Shard 3").cells_read == 0
+    assert fetch_all_rows(sh, fetch_layout(sh)) == merge(gsheet, report)
+    shard = fetch_worksheet(sh, worksheet=sh.worksheet("Shard 2"))
+    assert shard[report[1].id] == report[1].to_gsheet_row()
+
+
+def test_upload_shards_reuses_cached_indexes(sh):
+    layout = fetch_layout(sh)
+    assert layout is not None
+    upload_shards(
+        sh, layout, [file_report(0, dates_match=False, directory="/photos/a")]
+    )
+    upload_shards(
+        sh, layout, [file_report(0, dates_match=False, directory="/photos/c")]
+    )
+    for worksheet in sh.worksheets():
+        worksheet.cells_read = 0
+
+    upload_shards(
+        sh,
+        layout,
+        [file_report(1, False, directory=d) for d in ("/photos/a", "/photos/c")],
+    )
+
+    assert sh.worksheet("Shard 1").cells_read == 0
+    assert sh.worksheet("Shard 3").cells_read == 0
+
+
+def test_upload_shards_with_missing_shard(sh):
+    layout = fetch_layout(sh)
+    assert layout is not None
+    sh.del_worksheet(sh.worksheet("Shard 2"))
+
+    with pytest.raises(ShardLayoutError, match="'Shard 2'.*gpy reshard_sheet"):
+        upload_shards(
+            sh, layout, [file_report(0, dates_match=False, directory="/photos/a")]
+        )
+
+
+@pytest.mark.parametrize("name", ("report.jsonl", "report.gpyr"))
+def test_read_file_reports(tmp_path, name):
+    path = tmp_path / name
+    # GPS coordinates are left out, as they are not part of the sheet
+    reports = [attr.evolve(report, gps=None) for report in COLUMNAR_REPORTS]
+    write_reports(path, reports)
+
+    assert list(read_file_reports(path)) == [
+        FileReport(
+            path=report.path,
+            dates_match=report.dates_match,
+            has_ghotos_timestamp=report.has_google_date,
+            uploaded=False,
+        )
+        for report in reports
+    ]
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from gpy.exiftool.client import DatesTriple, ExifTool
+from gpy.metadata.client import MetadataClient
+
+CET = timezone(timedelta(hours=1))
+
+
+@pytest.fixture
+def exiftool():
+    return MagicMock(spec=ExifTool)
+
+
+def test_read_dates_many_natively(exiftool, fixtures_dir):
+    path = fixtures_dir / "IMG_20190202_184442_353.jpg"
+
+    dates = MetadataClient(exiftool).read_dates_many([path])
+
+    assert dates == {path: DatesTriple(metadata_date=datetime(2019, 2, 2, 18, 44, 43))}
+    exiftool.read_dates_many.assert_not_called()
+
+
+def test_read_dates_many_falls_back_to_exiftool(exiftool, fixtures_dir, tmp_path):
+    img = fixtures_dir / "IMG_20190202_184442_353.jpg"
+    png = tmp_path / "IMG_20190202_184442_353.png"
+    png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    not_a_jpeg = tmp_path / "not_a_jpeg.jpg"
+    not_a_jpeg.write_bytes(b"\x00" * 16)
+    exiftool.read_dates_many.return_value = {
+        png: DatesTriple(metadata_date=datetime(2019, 2, 2, 18, 45, 14)),
+        not_a_jpeg: DatesTriple(error="File format error"),
+    }
+
+    dates = MetadataClient(exiftool).read_dates_many([png, img, not_a_jpeg])
+
+    exiftool.read_dates_many.assert_called_once_with([png, not_a_jpeg])
+    assert list(dates) == [png, img, not_a_jpeg]
+    assert dates[img] == DatesTriple(metadata_date=datetime(2019, 2, 2, 18, 44, 43))
+    assert dates[not_a_jpeg] == DatesTriple(error="File format error")
+
+
+def test_read_datetime_natively(exiftool, fixtures_dir):
+    path = fixtures_dir / "IMG_20190202_184442_353.jpg"
+
+    client = MetadataClient(exiftool)
+
+    assert client.read_datetime(path) == datetime(2019, 2, 2, 18, 44, 43)
+    assert client.read_google_timestamp(path) is None
+    exiftool.read_datetime.assert_not_called()
+    exiftool.read_google_timestamp.assert_not_called()
+
+
+def test_read_datetime_without_dates_falls_back_to_exiftool(exiftool, tmp_path):
+    path = tmp_path / "no_metadata.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xda\x00\x02\xff\xd9")
+    exiftool.read_datetime.return_value = datetime(2019, 2, 2, 18, 44, 43)
+
+    assert MetadataClient(exiftool).read_datetime(path) == datetime(
+        2019, 2, 2, 18, 44, 43
+    )
+    exiftool.read_datetime.assert_called_once_with(path)
+
+
+def test_write_ts_in_place(exiftool, tmp_real_vid):
+    ts = datetime(2019, 2, 2, 18, 45, 13, tzinfo=CET)
+
+    result = MetadataClient(exiftool).write_ts(tmp_real_vid, ts=ts, backup=True)
+
+    exiftool.write_ts.assert_not_called()
+    assert result.path == tmp_real_vid
+    assert 0 < result.bytes_written < tmp_real_vid.stat().st_size
+    assert tmp_real_vid.with_name(f"{tmp_real_vid.name}_original").exists()
+    assert MetadataClient(exiftool).read_google_timestamp(tmp_real_vid) == ts
+
+
+def test_write_ts_falls_back_to_exiftool(exiftool, tmp_real_img):
+    ts = datetime(2019, 2, 2, 18, 45, 13, tzinfo=CET)
+
+    result = MetadataClient(exiftool).write_ts(tmp_real_img, ts=ts, backup=True)
+
+    exiftool.write_ts.assert_called_once_with(tmp_real_img, ts=ts, backup=True)
+    assert result == exiftool.write_ts.return_value
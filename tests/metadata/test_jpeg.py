@@ -0,0 +1,199 @@
+import struct
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.jpeg import EXIF_HEADER, XMP_HEADER, plan_date_patches, read_tags
+from gpy.metadata.patch import apply_patches
+
+CET = timezone(timedelta(hours=1))
+
+XMP_PACKET = b"""<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+    xmp:CreateDate="2019-02-02T18:44:43.001+01:00"/>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>"""
+
+
+def build_exif(
+    byte_order: str, tags: List[Tuple[int, bytes]], exif_tags: List[Tuple[int, bytes]]
+) -> bytes:
+    """Return a TIFF structure with IFD0 and ExifIFD date tags."""
+    header = (b"II" if byte_order == "<" else b"MM") + struct.pack(
+        f"{byte_order}HI", 42, 8
+    )
+
+    ifd0_size = 2 + 12 * (len(tags) + 1) + 4
+    exif_ifd_offset = 8 + ifd0_size
+    exif_ifd_size = 2 + 12 * len(exif_tags) + 4
+    values_offset = exif_ifd_offset + exif_ifd_size
+
+    values = b""
+
+    def build_ifd(entries: List[Tuple[int, int, int, bytes]]) -> bytes:
+        ifd = struct.pack(f"{byte_order}H", len(entries))
+        for tag, field_type, count, value in entries:
+            ifd += struct.pack(f"{byte_order}HHI", tag, field_type, count) + value
+        return ifd + b"\x00" * 4
+
+    def ascii_entry(tag: int, value: bytes) -> Tuple[int, int, int, bytes]:
+        nonlocal values
+        offset = values_offset + len(values)
+        values += value + b"\x00"
+        return tag, 2, len(value) + 1, struct.pack(f"{byte_order}I", offset)
+
+    ifd0 = [ascii_entry(tag, value) for tag, value in tags]
+    ifd0.append((0x8769, 4, 1, struct.pack(f"{byte_order}I", exif_ifd_offset)))
+    exif_ifd = [ascii_entry(tag, value) for tag, value in exif_tags]
+
+    return header + build_ifd(ifd0) + build_ifd(exif_ifd) + values
+
+
+def build_jpeg(*app1_payloads: bytes) -> bytes:
+    segments = b"".join(
+        b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+        for payload in app1_payloads
+    )
+    # Start of image, APP1 segments, start of scan with fake image data
+    return b"\xff\xd8" + segments + b"\xff\xda\x00\x02" + b"\x00" * 64 + b"\xff\xd9"
+
+
+@pytest.fixture
+def write_jpeg(tmp_path):
+    def writer(data: bytes) -> Path:
+        path = tmp_path / "IMG_20190202_184442_353.jpg"
+        path.write_bytes(data)
+        return path
+
+    return writer
+
+
+def test_read_real_jpeg(fixtures_dir):
+    file_tags = read_tags(fixtures_dir / "IMG_20190202_184442_353.jpg")
+
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 44, 43)
+    assert file_tags.google_date is None
+
+
+@pytest.mark.parametrize("byte_order", ("<", ">"), ids=("little_endian", "big_endian"))
+def test_read_exif(write_jpeg, byte_order):
+    exif = build_exif(
+        byte_order,
+        tags=[(0x0132, b"2019:02:02 18:44:45")],
+        exif_tags=[(0x9003, b"2019:02:02 18:44:43"), (0x9004, b"2019:02:02 18:44:44")],
+    )
+    path = write_jpeg(build_jpeg(EXIF_HEADER + exif))
+
+    file_tags = read_tags(path)
+
+    assert file_tags.source_file == str(path)
+    assert file_tags.tags == {
+        ("IFD0", "ModifyDate"): "2019:02:02 18:44:45",
+        ("ExifIFD", "DateTimeOriginal"): "2019:02:02 18:44:43",
+        ("ExifIFD", "CreateDate"): "2019:02:02 18:44:44",
+    }
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 44, 43)
+
+
+def test_read_exif_and_xmp(write_jpeg):
+    exif = build_exif(">", tags=[], exif_tags=[(0x9004, b"2019:02:02 18:44:44")])
+    path = write_jpeg(build_jpeg(EXIF_HEADER + exif, XMP_HEADER + XMP_PACKET))
+
+    file_tags = read_tags(path)
+
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 44, 44)
+    assert file_tags.google_date == datetime(2019, 2, 2, 18, 44, 43, 1000, tzinfo=CET)
+
+
+def test_read_jpeg_without_metadata(write_jpeg):
+    file_tags = read_tags(write_jpeg(build_jpeg()))
+
+    assert file_tags.tags == {}
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        pytest.param(b"", id="empty"),
+        pytest.param(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64, id="not_a_jpeg"),
+        pytest.param(build_jpeg(EXIF_HEADER + b"MM\x00*")[:-80], id="truncated"),
+        pytest.param(
+            build_jpeg(EXIF_HEADER + b"XX\x00*\x00\x00\x00\x08"), id="invalid_tiff"
+        ),
+        pytest.param(build_jpeg(XMP_HEADER + b"<x:xmpmeta"), id="invalid_xmp"),
+    ),
+)
+def test_read_unsupported_file(write_jpeg, data):
+    with pytest.raises(UnsupportedFile):
+        read_tags(write_jpeg(data))
+
+
+def build_exif_with_all_dates(value: bytes) -> bytes:
+    return build_exif(
+        ">",
+        tags=[(0x0132, value)],
+        exif_tags=[(0x9003, value), (0x9004, value)],
+    )
+
+
+def test_write_dates_in_place(write_jpeg):
+    exif = build_exif_with_all_dates(b"2019:02:02 18:44:43")
+    path = write_jpeg(build_jpeg(EXIF_HEADER + exif, XMP_HEADER + XMP_PACKET))
+    size_before = path.stat().st_size
+    ts = datetime(2020, 1, 1, 0, 0, 0, tzinfo=CET)
+
+    bytes_written = apply_patches(path, plan_date_patches(path, ts))
+
+    # One patch per tag: 3 EXIF dates with their null terminator and the XMP date
+    assert bytes_written == 3 * 20 + len("2020-01-01T00:00:00.000+01:00")
+    assert path.stat().st_size == size_before
+    assert read_tags(path).tags == {
+        ("IFD0", "ModifyDate"): "2020:01:01 00:00:00",
+        ("ExifIFD", "DateTimeOriginal"): "2020:01:01 00:00:00",
+        ("ExifIFD", "CreateDate"): "2020:01:01 00:00:00",
+        ("XMP-xmp", "CreateDate"): "2020:01:01 00:00:00.000+01:00",
+    }
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        pytest.param(
+            build_jpeg(EXIF_HEADER + build_exif_with_all_dates(b"2019:02:02 18:44:43")),
+            id="without_xmp",
+        ),
+        pytest.param(
+            build_jpeg(
+                EXIF_HEADER + build_exif(">", tags=[], exif_tags=[]),
+                XMP_HEADER + XMP_PACKET,
+            ),
+            id="missing_exif_tags",
+        ),
+        pytest.param(
+            build_jpeg(
+                EXIF_HEADER + build_exif_with_all_dates(b"2019:02:02 18:44"),
+                XMP_HEADER + XMP_PACKET,
+            ),
+            id="exif_date_of_different_size",
+        ),
+        pytest.param(
+            build_jpeg(
+                EXIF_HEADER + build_exif_with_all_dates(b"2019:02:02 18:44:43"),
+                XMP_HEADER + XMP_PACKET.replace(b".001+01:00", b""),
+            ),
+            id="xmp_date_of_different_size",
+        ),
+    ),
+)
+def test_write_dates_unsupported(write_jpeg, data):
+    path = write_jpeg(data)
+
+    with pytest.raises(UnsupportedFile):
+        plan_date_patches(path, datetime(2020, 1, 1, tzinfo=CET))
@@ -0,0 +1,124 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.mp4 import QUICKTIME_TO_UNIX, plan_date_patches, read_tags
+from gpy.metadata.patch import apply_patches
+
+CET = timezone(timedelta(hours=1))
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mvhd_v1(ts: datetime) -> bytes:
+    value = int((ts - datetime(1970, 1, 1)).total_seconds()) + QUICKTIME_TO_UNIX
+    # version, flags, creation and modification dates, and the rest of the header
+    return box(
+        b"mvhd", b"\x01\x00\x00\x00" + struct.pack(">QQ", value, value) + b"\x00" * 88
+    )
+
+
+def test_read_real_video(fixtures_dir):
+    file_tags = read_tags(fixtures_dir / "VID_20190202_184425_556.mp4")
+
+    assert file_tags.tags[("QuickTime", "CreateDate")] == "2019:02:02 18:44:25"
+    assert file_tags.tags[("Track2", "MediaModifyDate")] == "2019:02:02 18:44:25"
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 44, 25)
+    assert file_tags.google_date is None
+
+
+def test_write_dates_in_place(tmp_real_vid):
+    size_before = tmp_real_vid.stat().st_size
+    ts = datetime(2019, 2, 2, 18, 45, 13, 123000, tzinfo=CET)
+
+    bytes_written = apply_patches(tmp_real_vid, plan_date_patches(tmp_real_vid, ts))
+
+    # The XMP box is appended, as the video did not have one
+    size_after = tmp_real_vid.stat().st_size
+    assert size_after > size_before
+
+    file_tags = read_tags(tmp_real_vid)
+    assert set(file_tags.tags.values()) == {
+        "2019:02:02 18:45:13",
+        "2019:02:02 18:45:13.123+01:00",
+    }
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 45, 13)
+    assert file_tags.google_date == ts
+
+    # Once the XMP box exists, it is also patched in place
+    ts = datetime(2020, 1, 1, 0, 0, 0, tzinfo=CET)
+    bytes_written = apply_patches(tmp_real_vid, plan_date_patches(tmp_real_vid, ts))
+
+    assert tmp_real_vid.stat().st_size == size_after
+    assert bytes_written == 10 * 4 + len("2020-01-01T00:00:00.000+01:00")
+    assert read_tags(tmp_real_vid).google_date == ts
+
+
+def test_write_dates_with_moov_after_large_mdat(tmp_path):
+    """The movie box is found after the media data of a >4GB video."""
+    path = tmp_path / "large.mp4"
+    mdat_size = 5 * 1024**3
+    with path.open("wb") as f:
+        f.write(box(b"ftyp", b"isom\x00\x00\x02\x00"))
+        f.write(struct.pack(">I4sQ", 1, b"mdat", mdat_size))
+        f.seek(mdat_size - 16, 1)  # sparse file
+        f.write(box(b"moov", mvhd_v1(datetime(2019, 2, 2, 18, 44, 25))))
+
+    assert read_tags(path).metadata_date == datetime(2019, 2, 2, 18, 44, 25)
+
+    ts = datetime(2019, 2, 2, 18, 45, 13, tzinfo=CET)
+    apply_patches(path, plan_date_patches(path, ts))
+
+    file_tags = read_tags(path)
+    assert file_tags.metadata_date == datetime(2019, 2, 2, 18, 45, 13)
+    assert file_tags.google_date == ts
+
+
+def test_read_wrong_epoch(tmp_path):
+    path = tmp_path / "unix_epoch.mp4"
+    # Some software writes seconds since 1970 instead of since 1904
+    value = int(
+        (datetime(2019, 2, 2, 18, 44, 25) - datetime(1970, 1, 1)).total_seconds()
+    )
+    mvhd = box(
+        b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">II", value, 0) + b"\x00" * 80
+    )
+    path.write_bytes(box(b"moov", mvhd))
+
+    file_tags = read_tags(path)
+
+    assert file_tags.tags == {
+        ("QuickTime", "CreateDate"): "2019:02:02 18:44:25",
+        ("QuickTime", "ModifyDate"): "0000:00:00 00:00:00",
+    }
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        pytest.param(b"", id="empty"),
+        pytest.param(box(b"ftyp", b"isom") + box(b"mdat", b"\x00" * 16), id="no_moov"),
+        pytest.param(box(b"moov", mvhd_v1(datetime(2019, 1, 1)))[:-8], id="truncated"),
+        pytest.param(box(b"moov", box(b"cmov", b"")), id="compressed_moov"),
+    ),
+)
+def test_read_unsupported_file(tmp_path, data):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+
+    with pytest.raises(UnsupportedFile):
+        read_tags(path)
+
+
+def test_write_without_room_for_xmp(tmp_path):
+    path = tmp_path / "video.mp4"
+    moov = box(b"moov", mvhd_v1(datetime(2019, 1, 1)))
+    # The size of the last box is 0: it extends to the end of the file
+    path.write_bytes(moov + struct.pack(">I4s", 0, b"mdat") + b"\x00" * 16)
+
+    with pytest.raises(UnsupportedFile):
+        plan_date_patches(path, datetime(2019, 2, 2, tzinfo=CET))
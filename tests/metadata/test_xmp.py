@@ -0,0 +1,60 @@
+import pytest
+
+from gpy.metadata.errors import UnsupportedFile
+from gpy.metadata.patch import Patch
+from gpy.metadata.xmp import plan_date_patches, read_date_tags, to_exiftool_date
+
+
+def test_read_date_tags():
+    packet = b"""<x:xmpmeta xmlns:x="adobe:ns:meta/">
+     <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+      <rdf:Description rdf:about=""
+        xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+        xmlns:exif="http://ns.adobe.com/exif/1.0/"
+        xmp:ModifyDate="2019-02-02T18:44:45">
+       <exif:DateTimeOriginal>2019-02-02T18:44:43</exif:DateTimeOriginal>
+       <xmp:CreateDate>2019-02-02T18:44:44+01:00</xmp:CreateDate>
+       <xmp:CreatorTool>gpy</xmp:CreatorTool>
+      </rdf:Description>
+     </rdf:RDF>
+    </x:xmpmeta>"""
+
+    assert list(read_date_tags(packet)) == [
+        (("XMP-xmp", "ModifyDate"), "2019:02:02 18:44:45"),
+        (("XMP-exif", "DateTimeOriginal"), "2019:02:02 18:44:43"),
+        (("XMP-xmp", "CreateDate"), "2019:02:02 18:44:44+01:00"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected_result"),
+    (
+        ("2019-02-02T18:44:43.001+01:00", "2019:02:02 18:44:43.001+01:00"),
+        ("2019-02-02T18:44:43Z", "2019:02:02 18:44:43Z"),
+        ("2019-02-02", "2019:02:02"),
+        ("2019", "2019"),
+    ),
+)
+def test_to_exiftool_date(value, expected_result):
+    assert to_exiftool_date(value) == expected_result
+
+
+def test_plan_date_patches():
+    packet = (
+        b'<rdf:Description xmp:ModifyDate="2019-02-02T18:44:45.000+01:00">'
+        b"<xmp:CreateDate>2019-02-02T18:44:44.000+01:00</xmp:CreateDate>"
+        b"</rdf:Description>"
+    )
+    value = "2020-01-01T00:00:00.000+01:00"
+
+    assert plan_date_patches(packet, 100, value) == [
+        Patch(offset=100 + packet.index(b"2019-02-02T18:44:45"), data=value.encode()),
+        Patch(offset=100 + packet.index(b"2019-02-02T18:44:44"), data=value.encode()),
+    ]
+
+
+def test_plan_date_patches_without_create_date():
+    packet = b'<rdf:Description xmp:ModifyDate="2019-02-02T18:44:45.000+01:00"/>'
+
+    with pytest.raises(UnsupportedFile):
+        plan_date_patches(packet, 0, "2020-01-01T00:00:00.000+01:00")
@@ -0,0 +1,238 @@
+import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from gpy.columnar import (
+    ColumnarReportError,
+    ColumnarReportWriter,
+    ReportTable,
+    iter_tables,
+    read_reports,
+    read_table,
+)
+from gpy.google_sheet import FileReport
+from gpy.types import GpsCoordinates, Report
+
+CET = datetime.timezone(datetime.timedelta(hours=1))
+
+REPORTS = [
+    Report(
+        path=Path("/photos/2019/IMG_20190202_184442_353.jpg"),
+        filename_date=datetime.datetime(2019, 2, 2, 18, 44, 42),
+        metadata_date=datetime.datetime(2019, 2, 2, 18, 44, 43, tzinfo=CET),
+        google_date=datetime.datetime(2019, 2, 2, 18, 44, 42, 1000, tzinfo=CET),
+    ),
+    Report(
+        path=Path("/photos/1969/scan.jpg"),
+        metadata_date=datetime.datetime(1969, 7, 20, 20, 17, 40),
+        gps=GpsCoordinates(longitude=Decimal("-79.3832"), latitude=Decimal("43.6")),
+    ),
+    Report(path=Path("/photos/2019/VID_20190202_184425_556.mp4")),
+    Report(path=Path("relative.png")),
+]
+
+
+def write(path: Path, reports: List[Report] = REPORTS) -> None:
+    with ColumnarReportWriter(path) as writer:
+        for report in reports:
+            writer.write(report)
+
+
+def test_write_and_read_reports(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    write(path)
+
+    assert list(read_reports(path)) == REPORTS
+
+
+def test_paths_are_dictionary_encoded(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    write(path)
+    table = read_table(path)
+
+    assert table.directories == ["/photos/2019", "/photos/1969", "."]
+    assert list(table.directory_index) == [0, 1, 0, 2]
+    assert list(table.iter_paths()) == [report.path for report in REPORTS]
+
+
+def test_dates_are_typed_columns(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    write(path)
+    google_date = read_table(path).google_date
+
+    assert google_date.values[0] == 1549133082001000
+    assert google_date.offsets[0] == 3600
+    assert list(google_date) == [report.google_date for report in REPORTS]
+
+
+def test_table_holds_reports():
+    table = ReportTable()
+
+    table.extend(REPORTS)
+
+    assert len(table) == len(REPORTS)
+    assert list(table) == REPORTS
+
+
+def test_append_to_table_read_from_file(tmp_path):
+    path = tmp_path / "report.gpyr"
+    write(path, reports=REPORTS[:2])
+    table = read_table(path)
+
+    table.extend(REPORTS[2:])
+
+    assert table.directories == ["/photos/2019", "/photos/1969", "."]
+    assert list(table) == REPORTS
+
+
+def test_empty_report(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    write(path, reports=[])
+
+    assert list(read_reports(path)) == []
+
+
+@pytest.mark.parametrize(
+    "mangle",
+    (
+        pytest.param(lambda data: b"NOPE" + data[4:], id="not_columnar"),
+        pytest.param(lambda data: data[:-3], id="truncated"),
+        pytest.param(lambda data: data[:4] + b"\x03" + data[5:], id="new_version"),
+    ),
+)
+def test_read_invalid_report(tmp_path, mangle):
+    path = tmp_path / "report.gpyr"
+    write(path)
+    path.write_bytes(mangle(path.read_bytes()))
+
+    with pytest.raises(ColumnarReportError):
+        read_table(path)
+
+
+def test_file_reports_are_built_from_columns(tmp_path):
+    path = tmp_path / "report.gpyr"
+    write(path)
+
+    file_reports = list(read_table(path).iter_file_reports())
+
+    assert file_reports == [
+        FileReport(
+            path=report.path,
+            dates_match=report.dates_match,
+            has_ghotos_timestamp=report.has_google_date,
+            uploaded=False,
+        )
+        for report in REPORTS
+    ]
+
+
+UTC = datetime.timezone.utc
+
+
+@pytest.mark.parametrize(
+    "filename_date, metadata_date",
+    (
+        pytest.param(None, None, id="missing"),
+        pytest.param(datetime.datetime(2019, 2, 2), None, id="missing_metadata"),
+        pytest.param(
+            datetime.datetime(2019, 2, 2), datetime.datetime(2019, 2, 2), id="naive"
+        ),
+        pytest.param(
+            datetime.datetime(2019, 2, 2),
+            datetime.datetime(2019, 2, 2, 0, 0, 1),
+            id="naive_differ",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 2, 2),
+            datetime.datetime(2019, 2, 2, tzinfo=UTC),
+            id="naive_and_aware",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 2, 2, tzinfo=UTC),
+            datetime.datetime(2019, 2, 2, 1),
+            id="aware_and_local_time",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 2, 2, 1, tzinfo=CET),
+            datetime.datetime(2019, 2, 2, tzinfo=UTC),
+            id="same_instant",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 2, 2, tzinfo=CET),
+            datetime.datetime(2019, 2, 2, tzinfo=UTC),
+            id="same_wall_clock",
+        ),
+    ),
+)
+def test_dates_match_like_reports(filename_date, metadata_date):
+    report = Report(
+        path=Path("a.jpg"), filename_date=filename_date, metadata_date=metadata_date
+    )
+    table = ReportTable()
+    table.append(report)
+
+    (file_report,) = table.iter_file_reports()
+
+    assert file_report.dates_match is report.dates_match
+
+
+def test_writer_flushes_blocks(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    with ColumnarReportWriter(path, block_rows=2) as writer:
+        for report in REPORTS:
+            writer.write(report)
+            assert len(writer.table) < 2
+        assert writer.count == len(REPORTS)
+
+    assert [len(table) for table in iter_tables(path)] == [2, 2]
+    assert list(read_reports(path)) == REPORTS
+
+    table = read_table(path)
+    assert table.directories == ["/photos/2019", "/photos/1969", "."]
+    assert list(table.directory_index) == [0, 1, 0, 2]
+    assert list(table) == REPORTS
+
+
+def test_writer_leaves_valid_report_if_interrupted(tmp_path):
+    path = tmp_path / "report.gpyr"
+
+    with pytest.raises(KeyboardInterrupt):
+        with ColumnarReportWriter(path, block_rows=2) as writer:
+            for report in REPORTS[:3]:
+                writer.write(report)
+            raise KeyboardInterrupt()
+
+    assert list(read_reports(path)) == REPORTS[:3]
+
+
+def test_read_report_missing_blocks(tmp_path):
+    path = tmp_path / "report.gpyr"
+    first_block = tmp_path / "first_block.gpyr"
+    for reports, report_path in ((REPORTS, path), (REPORTS[:2], first_block)):
+        with ColumnarReportWriter(report_path, block_rows=2) as writer:
+            for report in reports:
+                writer.write(report)
+
+    # The file ends right after the first block, as if the last one was lost
+    path.write_bytes(path.read_bytes()[: first_block.stat().st_size])
+
+    with pytest.raises(ColumnarReportError, match="has 2 rows, but its header says 4"):
+        read_table(path)
+
+
+def test_paths_which_are_not_utf8(tmp_path):
+    path = tmp_path / "report.gpyr"
+    # As os.scandir() decodes the name b"caf\xe9.jpg", written in Latin-1
+    report = Report(path=Path("/photos/f\udce9te") / "caf\udce9.jpg")
+
+    write(path, reports=[report])
+
+    assert list(read_reports(path)) == [report]
@@ -12,18 +12,23 @@ Requirements:
 
 import datetime
 import logging
+import shutil
 import subprocess
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, Set, Tuple
 
 from _pytest.logging import LogCaptureFixture as LogCapture
 
 from gpy.cli.meta import edit_metadata_datetime
-from gpy.cli.scan import _scan_date, scan_date
+from gpy.cli.scan import scan_date
 from gpy.exiftool import client as exiftool_client
 from gpy.filenames import parse_datetime as datetime_parser
+from gpy.metadata import mp4
+from gpy.metadata.patch import apply_patches
 from gpy.types import Report
 
+CET = datetime.timezone(datetime.timedelta(hours=1))
+
 
 def test_exiftool_is_installed():
     process = subprocess.run("exiftool -ver", capture_output=True, shell=True)
@@ -39,7 +44,7 @@ def test_gpy_scan_date_single(tmp_real_img: Path, caplog: LogCapture) -> None:
     """Scan date and time for a single file."""
     caplog.set_level(logging.INFO)
 
-    report = _scan_date(exiftool_client, datetime_parser, tmp_real_img)
+    (report,) = scan_date(exiftool_client, datetime_parser, tmp_real_img)
 
     assert report == Report(
         path=tmp_real_img,
@@ -146,7 +151,7 @@ def test_gpy_meta_date_fromfile_single_image(
             path=tmp_real_img,
             metadata_date=datetime.datetime(2019, 2, 2, 18, 44, 42),
             filename_date=datetime.datetime(2019, 2, 2, 18, 44, 42),
-            google_date=datetime.datetime(2019, 2, 2, 18, 44, 42),
+            google_date=datetime.datetime(2019, 2, 2, 18, 44, 42, tzinfo=CET),
         ),
     ]
 
@@ -157,6 +162,7 @@ def test_gpy_meta_date_fromfile_single_image(
         "    > metadata: 2019-02-02 18:44:43.000\n"
         "    > filename: 2019-02-02 18:44:42.000\n"
         f"writing date 2019-02-02 18:44:42.000 as metadata to {tmp_real_img}\n"
+        "1 written, 0 skipped (0 B saved), 0 failed\n"
         f"scanning {tmp_real_img}"
     )
 
@@ -202,6 +208,7 @@ def test_gpy_meta_date_fromfile_multiple(
         f"writing date 2019-02-02 18:45:20.000 as metadata to {img_3}\n"
         f"writing date 2019-02-02 18:44:25.000 as metadata to {vid_1}\n"
         f"writing date 2019-02-02 18:45:13.000 as metadata to {vid_2}\n"
+        "5 written, 0 skipped (0 B saved), 0 failed\n"
         f"scanning {img_1}\n"
         f"scanning {img_2}\n"
         f"scanning {img_3}\n"
@@ -231,6 +238,7 @@ def test_gpy_meta_date_input_single(tmp_real_img: Path, caplog: LogCapture) -> N
         "    > metadata: 2019-02-02 18:44:43.000\n"
         "    > filename: 2019-02-02 18:44:42.000\n"
         f"writing date 2010-01-01 00:00:00.010 as metadata to {tmp_real_img}\n"
+        "1 written, 0 skipped (0 B saved), 0 failed\n"
         f"scanning {tmp_real_img}\n"
         "  metadata date and file timestamp don't match\n"
         "    > metadata: 2010-01-01 00:00:00.000\n"
@@ -238,6 +246,25 @@ def test_gpy_meta_date_input_single(tmp_real_img: Path, caplog: LogCapture) -> N
     )
 
 
+def test_gpy_meta_date_fromfile_skips_correct_files(
+    tmp_real_files: List[Path], caplog: LogCapture
+) -> None:
+    """Running the same edit twice only writes the files the first time."""
+    caplog.set_level(logging.INFO)
+
+    dir_path = tmp_real_files[0].parent
+
+    for _ in range(2):
+        edit_metadata_datetime(
+            path=dir_path,
+            read_datetime_from_filename=True,
+            input=None,
+            backup=False,
+        )
+
+    assert caplog.messages[-1].startswith("0 written, 5 skipped")
+
+
 def get_files_in_dir(path: Path) -> Set[Path]:
     return {path for path in path.rglob("*") if path.is_file()}
 
@@ -281,3 +308,24 @@ def test_gpy_meta_date_backup_single(tmp_real_img: Path, caplog: LogCapture) ->
 
     assert len(files_before) == 1
     assert len(files_after) == 2
+
+
+def test_native_and_exiftool_video_dates_match(tmp_real_vid: Path) -> None:
+    """The native writer and exiftool store the same QuickTime dates."""
+    native = tmp_real_vid
+    fallback = native.with_name("fallback.mp4")
+    shutil.copy(native, fallback)
+    ts = datetime.datetime(2010, 1, 1, 13, 1, 1, 1000, tzinfo=CET)
+
+    apply_patches(native, mp4.plan_date_patches(native, ts))
+    exiftool_client.write_ts(fallback, ts=ts)
+
+    def quicktime_tags(path: Path) -> Dict[Tuple[str, str], str]:
+        tags = mp4.read_tags(path).tags
+        return {key: value for key, value in tags.items() if key[0] != "XMP-xmp"}
+
+    assert quicktime_tags(native)[("QuickTime", "CreateDate")] == "2010:01:01 13:01:01"
+    assert quicktime_tags(native) == quicktime_tags(fallback)
+
+    dates = exiftool_client.read_dates_many([native, fallback])
+    assert dates[native] == dates[fallback]
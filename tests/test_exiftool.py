@@ -1,9 +1,28 @@
-from datetime import datetime
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Optional
 
 import pytest
 
-from gpy.exiftool.client import ExifToolError, parse_datetime, read_datetime
+from gpy.exiftool.client import (
+    DatesTriple,
+    ExifTool,
+    ExifToolError,
+    ExifToolPool,
+    ExifToolResult,
+    ExifToolSession,
+    WriteResult,
+    parse_datetime,
+    read_dates_many,
+    read_datetime,
+    write_ts,
+)
+from gpy.exiftool.tags import parse_timestamp
+
+CET = timezone(timedelta(hours=1))
 
 
 @pytest.fixture
@@ -15,6 +34,30 @@ class MockSubprocess:
 
     returncode = 0
     stdout = b"REPLACE_WITH_DESIRED_STDOUT"
+    stderr = b""
+
+
+class MockPopen:
+    """Fake exiftool process running with `-stay_open True`."""
+
+    def __init__(self, stdout: bytes, stderr: bytes) -> None:
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None  # type: ignore
+        self.stdout = io.BytesIO(stdout)
+        self.stderr = io.BytesIO(stderr)
+        self.returncode: Optional[int] = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.returncode = 0
+        return self.returncode
+
+
+@pytest.fixture
+def popen_mocked(mocker):
+    return mocker.patch("subprocess.Popen")
 
 
 # -----------------------------------------------------------------------------
@@ -56,6 +99,45 @@ def test_parse_datetime(stdout, expected_result):
     assert result == expected_result
 
 
+@pytest.mark.parametrize(
+    ("value", "expected_result"),
+    (
+        pytest.param(
+            "2019:02:02 18:44:43",
+            datetime(2019, 2, 2, 18, 44, 43),
+            id="without second fraction",
+        ),
+        pytest.param(
+            "2019:02:02 18:44:43.1",
+            datetime(2019, 2, 2, 18, 44, 43, 100000),
+            id="with second fraction",
+        ),
+        pytest.param(
+            "2019:02:02 18:44:43.001+01:00",
+            datetime(2019, 2, 2, 18, 44, 43, 1000, tzinfo=CET),
+            id="with second fraction and timezone",
+        ),
+        pytest.param(
+            "2019:02:02 18:44:43-05:30",
+            datetime(2019, 2, 2, 18, 44, 43, tzinfo=timezone(-timedelta(hours=5.5))),
+            id="with negative timezone",
+        ),
+        pytest.param(
+            "2019-02-02T18:44:43Z",
+            datetime(2019, 2, 2, 18, 44, 43, tzinfo=timezone.utc),
+            id="ISO 8601 in UTC",
+        ),
+        pytest.param("0000:00:00 00:00:00", None, id="unset clock"),
+        pytest.param("2019:02:31 18:44:43", None, id="invalid date"),
+        pytest.param("2019:02:02", None, id="date only"),
+        pytest.param(1549129483, None, id="not a string"),
+    ),
+)
+def test_parse_timestamp(value, expected_result):
+    result = parse_timestamp(value)
+    assert result == expected_result
+
+
 @pytest.mark.parametrize(
     ("stdout", "error_msg"),
     (
@@ -65,22 +147,33 @@ def test_parse_datetime(stdout, expected_result):
             id="empty_output_or_file_without_metadata",
         ),
         pytest.param(
-            b"this is a very cool\nbut multiline output",
+            b'[{\n  "SourceFile": "blah.jpg"\n}]\n',
             (
                 "No supported timestamps found in the following output:\n"
-                "  > this is a very cool\n"
-                "  > but multiline output"
+                "  > [{\n"
+                '  >   "SourceFile": "blah.jpg"\n'
+                "  > }]\n"
             ),
             id="no_matching_output",
         ),
         pytest.param(
-            b"unsupported output: 2019:01:01 08:50:26 \n",
+            b'[{"SourceFile": "blah.jpg", "ExifIFD:DateTimeOriginal": "2019:01:01"}]',
             (
                 "No supported timestamps found in the following output:\n"
-                "  > unsupported output: 2019:01:01 08:50:26 \n"
+                '  > [{"SourceFile": "blah.jpg", '
+                '"ExifIFD:DateTimeOriginal": "2019:01:01"}]'
             ),
             id="unsupported_output",
         ),
+        pytest.param(
+            b"this is a very cool\nbut multiline output",
+            (
+                "Unexpected exiftool output:\n"
+                "  > this is a very cool\n"
+                "  > but multiline output"
+            ),
+            id="not_json_output",
+        ),
     ),
 )
 def test_read_datetime_raises_if(exiftool_mocked, stdout, error_msg):
@@ -96,6 +189,226 @@ def test_read_datetime_raises_if(exiftool_mocked, stdout, error_msg):
     assert exc.args == (error_msg,)
 
 
-@pytest.mark.skip(reason="not implemented yet")
-def test_write_date(exiftool_mocked, tmp_real_img):
-    pass
+def test_read_dates_many(exiftool_mocked):
+    exiftool_mocked.return_value = MockSubprocess()
+    exiftool_mocked.return_value.returncode = 1
+    exiftool_mocked.return_value.stdout = b"""[{
+      "SourceFile": "a.jpg",
+      "ExifIFD:DateTimeOriginal": "2019:02:02 18:44:43",
+      "ExifIFD:CreateDate": "2019:02:02 18:44:44",
+      "XMP-xmp:CreateDate": "2019:02:02 18:44:42.001+01:00"
+    },
+    {
+      "SourceFile": "b.mp4",
+      "QuickTime:CreateDate": "2019:02:02 18:44:25",
+      "Track1:CreateDate": "2019:02:02 18:44:26"
+    },
+    {
+      "SourceFile": "c.jpg",
+      "ExifTool:Error": "File format error"
+    },
+    {
+      "SourceFile": "d.jpg"
+    }]"""
+    exiftool_mocked.return_value.stderr = b"Error: File not found - e.jpg\n"
+    paths = [Path(name) for name in ("a.jpg", "b.mp4", "c.jpg", "d.jpg", "e.jpg")]
+
+    dates = read_dates_many(paths)
+
+    assert exiftool_mocked.call_count == 1
+    assert dates == {
+        Path("a.jpg"): DatesTriple(
+            metadata_date=datetime(2019, 2, 2, 18, 44, 43),
+            google_date=datetime(2019, 2, 2, 18, 44, 42, 1000, tzinfo=CET),
+        ),
+        Path("b.mp4"): DatesTriple(metadata_date=datetime(2019, 2, 2, 18, 44, 25)),
+        Path("c.jpg"): DatesTriple(error="File format error"),
+        Path("d.jpg"): DatesTriple(),
+        Path("e.jpg"): DatesTriple(error="Error: File not found - e.jpg"),
+    }
+
+
+def test_session_reuses_process_for_several_commands(popen_mocked):
+    process = MockPopen(
+        stdout=(
+            b'[{"SourceFile": "blah.jpg",\n'
+            b' "ExifIFD:DateTimeOriginal": "2019:02:02 18:44:43"}]\n'
+            b"{ready0}\n"
+            b'[{"SourceFile": "blah.jpg",\n'
+            b' "XMP-xmp:CreateDate": "2019:02:02 18:44:44.001"}]\n'
+            b"{ready1}\n"
+        ),
+        stderr=b"=0=post0\n=0=post1\n",
+    )
+    popen_mocked.return_value = process
+
+    with ExifToolSession() as exiftool:
+        metadata_date = exiftool.read_datetime(Path("blah.jpg"))
+        google_date = exiftool.read_google_timestamp(Path("blah.jpg"))
+
+    assert metadata_date == datetime(2019, 2, 2, 18, 44, 43)
+    assert google_date == datetime(2019, 2, 2, 18, 44, 44, 1000)
+    assert popen_mocked.call_count == 1
+    assert process.stdin.getvalue().decode() == (
+        "-j\n-n\n-G1\n-a\n-AllDates\nblah.jpg\n"
+        "-echo4\n=${status}=post0\n-execute0\n"
+        "-j\n-n\n-G1\n-a\n-XMP:CreateDate\nblah.jpg\n"
+        "-echo4\n=${status}=post1\n-execute1\n"
+        "-stay_open\nFalse\n"
+    )
+
+
+def test_session_raises_if_command_fails(popen_mocked):
+    popen_mocked.return_value = MockPopen(
+        stdout=b"{ready0}\n",
+        stderr=b"Error: File not found - blah.jpg\n=1=post0\n",
+    )
+
+    with ExifToolSession() as exiftool:
+        with pytest.raises(ExifToolError) as e:
+            exiftool.read_datetime(Path("blah.jpg"))
+
+    exc = e.value
+
+    assert exc.args == (
+        "Reading date and time from PosixPath('blah.jpg') >>> "
+        "Error: File not found - blah.jpg",
+    )
+
+
+def test_session_close_waits_for_running_command(popen_mocked):
+    process = MockPopen(stdout=b"{ready0}\n", stderr=b"=0=post0\n")
+    reading = threading.Event()
+    release = threading.Event()
+    readline = process.stdout.readline
+
+    def blocking_readline():
+        reading.set()
+        release.wait(timeout=5)
+        return readline()
+
+    process.stdout.readline = blocking_readline  # type: ignore
+    popen_mocked.return_value = process
+    exiftool = ExifToolSession()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = executor.submit(exiftool.execute, ["-ver"])
+        assert reading.wait(timeout=5)
+        closed = executor.submit(exiftool.close)
+
+        assert not closed.done()
+        release.set()
+        assert result.result(timeout=5).exit_code == 0
+        closed.result(timeout=5)
+
+    assert process.stdin.getvalue().decode().endswith("-execute0\n-stay_open\nFalse\n")
+
+
+def test_pool_runs_commands_in_parallel_sessions(mocker):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def execute(args):
+        barrier.wait()  # only returns once both commands run at the same time
+        return ExifToolResult(exit_code=0, stdout="", stderr="")
+
+    mocker.patch.object(ExifToolSession, "execute", side_effect=execute)
+
+    with ExifToolPool(size=2) as exiftool:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(exiftool.execute, [["-ver"], ["-ver"]]))
+
+    assert results == [ExifToolResult(exit_code=0, stdout="", stderr="")] * 2
+
+
+@pytest.mark.parametrize(
+    ("file_name", "date_args"),
+    (
+        pytest.param(
+            "IMG_20190202_184442_353.jpg",
+            ["-AllDates=2019:02:02 18:44:42.000+01:00"],
+            id="image",
+        ),
+        pytest.param(
+            "VID_20190202_184513_634.mp4",
+            [
+                # QuickTime dates are stored in local time, as the native writer does
+                "-AllDates=2019:02:02 18:44:42",
+                "-QuickTime:TrackCreateDate=2019:02:02 18:44:42",
+                "-QuickTime:TrackModifyDate=2019:02:02 18:44:42",
+                "-QuickTime:MediaCreateDate=2019:02:02 18:44:42",
+                "-QuickTime:MediaModifyDate=2019:02:02 18:44:42",
+                "-api",
+                "QuickTimeUTC=0",
+            ],
+            id="video",
+        ),
+    ),
+)
+def test_write_date(exiftool_mocked, create_tmp_file, file_name, date_args):
+    exiftool_mocked.return_value = MockSubprocess()
+    path = create_tmp_file(file_name)
+    ts = datetime(2019, 2, 2, 18, 44, 42, tzinfo=CET)
+
+    result = write_ts(path, ts=ts)
+
+    exiftool_mocked.assert_called_once_with(
+        [
+            "exiftool",
+            "-XMP:CreateDate=2019:02:02 18:44:42.000+01:00",
+            *date_args,
+            str(path),
+            "-overwrite_original",
+        ],
+        capture_output=True,
+    )
+    assert result == WriteResult(path=path, bytes_written=path.stat().st_size)
+
+
+def test_write_ts_many_runs_one_process_with_an_argfile(exiftool_mocked):
+    paths = [Path("a.jpg"), Path("b.mp4"), Path("c.jpg"), Path("d.jpg")]
+    ts = datetime(2019, 2, 2, 18, 44, 42, tzinfo=CET)
+    argfiles = []
+
+    def run(args, capture_output):
+        argfiles.append(Path(args[2]).read_text())
+        result = MockSubprocess()
+        result.returncode = 1
+        result.stdout = b"    1 image files updated\n" * 2
+        # exiftool crashed before writing d.jpg
+        result.stderr = (
+            b"=0=post0\n=0=post1\n"
+            b"Error: File not found - c.jpg\n=1=post2\n"
+            b"Error: Out of memory\n"
+        )
+        return result
+
+    exiftool_mocked.side_effect = run
+
+    errors = ExifTool().write_ts_many([(path, ts) for path in paths], backup=False)
+
+    assert exiftool_mocked.call_count == 1
+    assert exiftool_mocked.call_args.args[0][:2] == ["exiftool", "-@"]
+    assert not Path(exiftool_mocked.call_args.args[0][2]).exists()
+    date = "2019:02:02 18:44:42.000+01:00"
+    assert argfiles[0].splitlines()[:12] == [
+        f"-XMP:CreateDate={date}",
+        f"-AllDates={date}",
+        "a.jpg",
+        "-overwrite_original",
+        "-echo4",
+        "=${status}=post0",
+        "-execute",
+        f"-XMP:CreateDate={date}",
+        "-AllDates=2019:02:02 18:44:42",
+        "-QuickTime:TrackCreateDate=2019:02:02 18:44:42",
+        "-QuickTime:TrackModifyDate=2019:02:02 18:44:42",
+        "-QuickTime:MediaCreateDate=2019:02:02 18:44:42",
+    ]
+    assert errors == {
+        Path("a.jpg"): None,
+        Path("b.mp4"): None,
+        Path("c.jpg"): (
+            "Writing date and time to 'c.jpg' >>> Error: File not found - c.jpg"
+        ),
+        Path("d.jpg"): "Error: Out of memory",
+    }
@@ -0,0 +1,214 @@
+import asyncio
+import io
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from gpy.cli.scan import scan_date
+from gpy.exiftool.aio import (
+    AsyncExifToolPool,
+    AsyncExifToolSession,
+    BlockingExifTool,
+)
+from gpy.exiftool.client import DatesTriple, ExifToolError, ExifToolResult
+from gpy.filenames import parse_datetime
+
+
+class MockProcess:
+    """Fake exiftool process running with `-stay_open True`."""
+
+    def __init__(self, stdout: bytes = b"", stderr: bytes = b"") -> None:
+        self.stdin = MockStreamWriter()
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode: Optional[int] = None
+        self.feed(stdout, stderr)
+
+    def feed(self, stdout: bytes, stderr: bytes) -> None:
+        self.stdout.feed_data(stdout)
+        self.stderr.feed_data(stderr)
+
+    async def wait(self):
+        self.returncode = 0
+        return self.returncode
+
+
+class MockStreamWriter:
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def subprocess_mocked(mocker):
+    return mocker.patch("asyncio.create_subprocess_exec")
+
+
+def test_session_reuses_process_for_several_commands(subprocess_mocked):
+    async def read_dates():
+        process = MockProcess(
+            stdout=(
+                b'[{"SourceFile": "blah.jpg",\n'
+                b' "ExifIFD:DateTimeOriginal": "2019:02:02 18:44:43"}]\n'
+                b"{ready0}\n"
+                b'[{"SourceFile": "blah.jpg",\n'
+                b' "XMP-xmp:CreateDate": "2019:02:02 18:44:44.001"}]\n'
+                b"{ready1}\n"
+            ),
+            stderr=b"=0=post0\n=0=post1\n",
+        )
+        subprocess_mocked.return_value = process
+
+        async with AsyncExifToolSession() as exiftool:
+            metadata_date = await exiftool.read_datetime(Path("blah.jpg"))
+            google_date = await exiftool.read_google_timestamp(Path("blah.jpg"))
+
+        return process, metadata_date, google_date
+
+    process, metadata_date, google_date = asyncio.run(read_dates())
+
+    assert metadata_date == datetime(2019, 2, 2, 18, 44, 43)
+    assert google_date == datetime(2019, 2, 2, 18, 44, 44, 1000)
+    assert subprocess_mocked.call_count == 1
+    assert process.stdin.buffer.getvalue().decode() == (
+        "-j\n-n\n-G1\n-a\n-AllDates\nblah.jpg\n"
+        "-echo4\n=${status}=post0\n-execute0\n"
+        "-j\n-n\n-G1\n-a\n-XMP:CreateDate\nblah.jpg\n"
+        "-echo4\n=${status}=post1\n-execute1\n"
+        "-stay_open\nFalse\n"
+    )
+
+
+def test_session_raises_if_command_fails(subprocess_mocked):
+    async def read_datetime():
+        subprocess_mocked.return_value = MockProcess(
+            stdout=b"{ready0}\n",
+            stderr=b"Error: File not found - blah.jpg\n=1=post0\n",
+        )
+        async with AsyncExifToolSession() as exiftool:
+            await exiftool.read_datetime(Path("blah.jpg"))
+
+    with pytest.raises(ExifToolError) as e:
+        asyncio.run(read_datetime())
+
+    assert e.value.args == (
+        "Reading date and time from PosixPath('blah.jpg') >>> "
+        "Error: File not found - blah.jpg",
+    )
+
+
+def test_session_raises_if_process_dies(subprocess_mocked):
+    async def read_datetime():
+        process = MockProcess(stdout=b"")
+        process.stdout.feed_eof()
+        process.stderr.feed_eof()
+        subprocess_mocked.return_value = process
+
+        async with AsyncExifToolSession() as exiftool:
+            await exiftool.read_datetime(Path("blah.jpg"))
+
+    with pytest.raises(ExifToolError, match="died unexpectedly"):
+        asyncio.run(read_datetime())
+
+
+def test_session_skips_the_output_of_cancelled_commands(subprocess_mocked):
+    async def read_after_cancel():
+        # The first command does not complete before being cancelled
+        process = MockProcess(stdout=b'[{"SourceFile": "a.jpg"', stderr=b"")
+        subprocess_mocked.return_value = process
+
+        async with AsyncExifToolSession() as exiftool:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    exiftool.read_datetime(Path("a.jpg")), timeout=0.01
+                )
+
+            process.feed(
+                stdout=(
+                    b"}]\n{ready0}\n"
+                    b'[{"SourceFile": "b.jpg",\n'
+                    b' "ExifIFD:DateTimeOriginal": "2019:02:02 18:44:43"}]\n'
+                    b"{ready1}\n"
+                ),
+                stderr=b"Warning: stale - a.jpg\n=0=post0\n=0=post1\n",
+            )
+            return await exiftool.execute(["-AllDates", "b.jpg"])
+
+    result = asyncio.run(read_after_cancel())
+
+    assert result == ExifToolResult(
+        exit_code=0,
+        stdout=(
+            '[{"SourceFile": "b.jpg",\n'
+            ' "ExifIFD:DateTimeOriginal": "2019:02:02 18:44:43"}]\n'
+        ),
+        stderr="",
+    )
+
+
+def test_pool_runs_commands_in_parallel_sessions(mocker):
+    running = 0
+    max_running = 0
+
+    async def execute(args):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return ExifToolResult(exit_code=0, stdout="", stderr="")
+
+    mocker.patch.object(AsyncExifToolSession, "execute", side_effect=execute)
+
+    async def run_commands():
+        async with AsyncExifToolPool(size=2) as exiftool:
+            return await asyncio.gather(*(exiftool.execute(["-ver"]) for _ in range(5)))
+
+    results = asyncio.run(run_commands())
+
+    assert results == [ExifToolResult(exit_code=0, stdout="", stderr="")] * 5
+    assert max_running == 2
+
+
+def test_scan_date_runs_on_top_of_an_async_client(tmp_path, mocker):
+    names = [f"IMG_20100101_16010{i}_000.jpg" for i in range(5)]
+    for name in names:
+        (tmp_path / name).touch()
+
+    loop_threads = set()
+
+    async def read_dates_many(paths):
+        loop_threads.add(threading.get_ident())
+        return {path: DatesTriple() for path in paths}
+
+    mocker.patch.object(
+        AsyncExifToolPool, "read_dates_many", side_effect=read_dates_many
+    )
+
+    async def scan():
+        loop = asyncio.get_running_loop()
+        async with AsyncExifToolPool(size=2) as exiftool:
+            blocking = BlockingExifTool(exiftool, loop)
+            return await loop.run_in_executor(
+                None,
+                lambda: scan_date(
+                    blocking, parse_datetime, tmp_path, batch_size=2, jobs=2
+                ),
+            )
+
+    reports = asyncio.run(scan())
+
+    assert [report.path for report in reports] == [tmp_path / n for n in names]
+    assert len(loop_threads) == 1
+    assert threading.get_ident() in loop_threads
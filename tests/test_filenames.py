@@ -2,7 +2,7 @@ import datetime
 
 import pytest
 
-from gpy.filenames import parse_datetime
+from gpy.filenames import SCHEMES, identify_scheme, parse_datetime, parse_many
 
 
 @pytest.mark.parametrize(
@@ -28,6 +28,44 @@ from gpy.filenames import parse_datetime
             datetime.datetime(2019, 1, 1),
             id="VID-YYYYMMDD-WAXXXX.mp4",
         ),
+        pytest.param(
+            "IMG-20190101-WA0001.jpg",
+            datetime.datetime(2019, 1, 1),
+            id="IMG-YYYYMMDD-WAXXXX.jpg",
+        ),
+        pytest.param(
+            "WhatsApp Image 2019-01-01 at 08.50.24.jpeg",
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            id="WhatsApp Image YYYY-MM-DD at hh.mm.ss.jpeg",
+        ),
+        pytest.param(
+            "PXL_20190101_085024211.jpg",
+            datetime.datetime(2019, 1, 1, 8, 50, 24, tzinfo=datetime.timezone.utc),
+            id="PXL_YYYYMMDD_hhmmssXXX.jpg",
+        ),
+        pytest.param(
+            "20190101_085024.jpg",
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            id="YYYYMMDD_hhmmss.jpg",
+        ),
+        pytest.param(
+            "20190101_085024(1).mp4",
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            id="YYYYMMDD_hhmmss(X).mp4",
+        ),
+        pytest.param(
+            "Screenshot_20190101-085024.png",
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            id="Screenshot_YYYYMMDD-hhmmss.png",
+        ),
+        pytest.param(
+            "Screenshot_2019-01-01-08-50-24-211_com.android.chrome.jpg",
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            id="Screenshot_YYYY-MM-DD-hh-mm-ss-XXX_app.jpg",
+        ),
+        pytest.param("DSC_0001.JPG", None, id="dsc_without_date"),
+        pytest.param("GOPR0001.MP4", None, id="gopro_without_date"),
+        pytest.param("IMG_20191301_085024_211.jpg", None, id="invalid_date"),
         pytest.param("blah", None, id="invalid_filename"),
     ],
 )
@@ -35,3 +73,22 @@ def test_parse_datetime(file_name, expected_result):
     actual_result = parse_datetime(file_name)
 
     assert actual_result == expected_result
+
+
+@pytest.mark.parametrize("scheme", SCHEMES, ids=lambda scheme: scheme.name)
+def test_identify_scheme(scheme):
+    assert identify_scheme(scheme.example) == scheme.name
+
+
+def test_identify_scheme_with_unknown_file_name():
+    assert identify_scheme("blah.jpg") is None
+
+
+def test_parse_many():
+    file_names = ["blah", "IMG_20190101_085024_211.jpg", "VID-20190101-WA0001.mp4"]
+
+    assert parse_many(file_names) == [
+        None,
+        datetime.datetime(2019, 1, 1, 8, 50, 24),
+        datetime.datetime(2019, 1, 1),
+    ]
@@ -1,8 +1,22 @@
+import datetime
+import json
+import os
+import random
+import time
 from pathlib import Path, PosixPath
 
 import pytest
 
-from gpy.filesystem import get_paths_recursive, is_supported
+from gpy import filesystem
+from gpy.filesystem import (
+    ReportWriter,
+    get_paths_recursive,
+    is_supported,
+    read_reports,
+    walk_files,
+    write_reports,
+)
+from gpy.types import Report, unstructure
 
 
 def mkdir(path: Path, dir_name: str) -> Path:
@@ -75,3 +89,191 @@ def test_get_paths_recursive_file(tmp_path):
     paths = {p for p in get_paths_recursive(root_path=file_path)}
 
     assert paths == {file_path}
+
+
+def test_get_paths_recursive_yields_paths_sorted(tmp_path):
+    for relative_path in (
+        "b.jpg",
+        "a.jpg",
+        "a/z.jpg",
+        "a/b/c.mp4",
+        "B/y.png",
+        "a-b/x.3gp",
+    ):
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    paths = list(get_paths_recursive(root_path=tmp_path))
+
+    assert paths == sorted(tmp_path.rglob("*.*"))
+
+
+def test_walk_files_is_lazy(mock_dir, mocker):
+    scandir = mocker.MagicMock(wraps=os.scandir)
+    walker = walk_files(root_path=mock_dir, scandir=scandir)
+
+    first = next(walker)
+
+    assert first.path == mock_dir / "directory_1" / "file_6.mp4"
+    assert scandir.call_count == 2  # root directory and directory_1
+
+    second = next(walker)
+
+    assert second.path == mock_dir / "file_1.jpg"
+    assert scandir.call_count == 2
+
+
+def test_walk_files_caches_stat(mock_dir):
+    file_entry = next(walk_files(root_path=mock_dir))
+
+    assert file_entry.stat() is file_entry.stat()
+    assert file_entry.stat().st_size == len("file content 6\n")
+
+
+@pytest.mark.parametrize(("workers"), [1, 2, 8])
+def test_walk_files_concurrently_keeps_order(tmp_path, workers):
+    for i in range(5):
+        for j in range(5):
+            subdir = tmp_path / f"dir_{i}" / f"subdir_{j}"
+            subdir.mkdir(parents=True)
+            (subdir / f"file_{j}.jpg").touch()
+            (tmp_path / f"dir_{i}" / f"file_{j}.jpg").touch()
+
+    def slow_scandir(path):
+        time.sleep(random.random() / 1000)
+        return os.scandir(path)
+
+    paths = [
+        file_entry.path
+        for file_entry in walk_files(
+            root_path=tmp_path, workers=workers, scandir=slow_scandir
+        )
+    ]
+
+    assert paths == sorted(tmp_path.rglob("*.jpg"))
+
+
+REPORTS = [
+    Report(
+        path=Path("foo/IMG_20190202_184442_353.jpg"),
+        filename_date=datetime.datetime(2019, 2, 2, 18, 44, 42),
+        metadata_date=datetime.datetime(2019, 2, 2, 18, 44, 43),
+    ),
+    Report(path=Path("foo/bar.mp4")),
+]
+
+
+@pytest.mark.parametrize(
+    "name",
+    (
+        "report.json",
+        "report.jsonl",
+        "report.json.gz",
+        "report.jsonl.gz",
+        "report.gpyr",
+    ),
+)
+def test_write_and_read_reports(tmp_path, name):
+    path = tmp_path / name
+
+    write_reports(path, iter(REPORTS))
+
+    assert list(read_reports(path)) == REPORTS
+
+
+def test_write_reports_with_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    path = tmp_path / "report.jsonl.zst"
+
+    write_reports(path, REPORTS)
+
+    assert list(read_reports(path)) == REPORTS
+
+
+def test_write_reports_as_json_lines(tmp_path):
+    path = tmp_path / "report.jsonl"
+
+    write_reports(path, REPORTS)
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == unstructure(REPORTS)
+
+
+def test_read_reports_written_as_a_json_document(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(unstructure(REPORTS), indent=2))
+
+    assert list(read_reports(path)) == REPORTS
+
+
+def test_read_reports_is_lazy(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write_reports(path, REPORTS)
+    with path.open("a") as f:
+        f.write("not json\n")
+
+    reports = read_reports(path)
+
+    assert next(reports) == REPORTS[0]
+    assert next(reports) == REPORTS[1]
+    with pytest.raises(ValueError):
+        next(reports)
+
+
+def test_report_writer_leaves_valid_report_if_interrupted(tmp_path):
+    path = tmp_path / "report.json"
+
+    with pytest.raises(KeyboardInterrupt):
+        with ReportWriter(path) as writer:
+            writer.write(REPORTS[0])
+            raise KeyboardInterrupt()
+
+    assert list(read_reports(path)) == REPORTS[:1]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+@pytest.mark.parametrize(
+    "text",
+    [
+        pytest.param(json.dumps(unstructure(REPORTS), indent=2), id="indented"),
+        pytest.param(json.dumps(unstructure(REPORTS)), id="single_line"),
+    ],
+)
+def test_read_json_reports_in_chunks(tmp_path, mocker, chunk_size, text):
+    mocker.patch.object(filesystem, "READ_CHUNK_SIZE", chunk_size)
+    path = tmp_path / "report.json"
+    path.write_text(text)
+
+    assert list(read_reports(path)) == REPORTS
+
+
+@pytest.mark.parametrize("text", ["[]", "[\n]", " [ ] "])
+def test_read_empty_json_reports(tmp_path, text):
+    path = tmp_path / "report.json"
+    path.write_text(text)
+
+    assert list(read_reports(path)) == []
+
+
+@pytest.mark.parametrize(
+    "template", ["[", "[{0}", "[{0} {0}]", "[{0},]", "[{0}, nope]"]
+)
+def test_read_invalid_json_reports(tmp_path, template):
+    path = tmp_path / "report.json"
+    path.write_text(template.format(json.dumps(unstructure(REPORTS[0]))))
+
+    with pytest.raises(ValueError):
+        list(read_reports(path))
+
+
+def test_read_json_reports_is_lazy(tmp_path, mocker):
+    mocker.patch.object(filesystem, "READ_CHUNK_SIZE", 16)
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(unstructure(REPORTS[:1]))[:-1] + ", nope]")
+
+    reports = read_reports(path)
+
+    assert next(reports) == REPORTS[0]
+    with pytest.raises(ValueError):
+        next(reports)
@@ -1,9 +1,25 @@
+import json
 from pathlib import Path
-from unittest.mock import create_autospec
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, create_autospec
 
+import pytest
+from gspread.exceptions import WorksheetNotFound
 from gspread.models import Spreadsheet, Worksheet
+from gspread.utils import a1_to_rowcol
 
-from gpy.google_sheet import FileReport, GSheetRow, fetch_worksheet
+from gpy.google_sheet import (
+    FileReport,
+    GSheetRow,
+    SheetChanges,
+    SheetIndex,
+    apply_changes,
+    fetch_sheet_index,
+    fetch_worksheet,
+    merge,
+    merge_changes,
+    upload_changes,
+)
 
 
 def test_gsheetrow_to_gsheet():
@@ -79,3 +95,300 @@ def test_fetch_worksheet():
             album=None,
         )
     }
+
+
+class FakeWorksheet:
+    """Local worksheet, holding its cells in a grid."""
+
+    title = "Sheet1"
+
+    def __init__(self, rows: List[List[Any]]) -> None:
+        self.grid = [list(HEADER)] + [list(row) for row in rows]
+        self.cells_read = 0
+
+    @property
+    def row_count(self) -> int:
+        return len(self.grid)
+
+    def add_rows(self, rows: int) -> None:
+        self.grid.extend([""] * len(self.grid[0]) for _ in range(rows))
+
+    def update(self, range_name: str, values: List[List[Any]]) -> None:
+        first_row, first_col = a1_to_rowcol(range_name.split(":")[0])
+        # Like the Sheets API, refuse to write past the grid
+        assert first_row - 1 + len(values) <= len(self.grid)
+        for row_number, row_values in enumerate(values, start=first_row):
+            row = self.grid[row_number - 1]
+            assert first_col - 1 + len(row_values) <= len(row)
+            row[slice(first_col - 1, first_col - 1 + len(row_values))] = row_values
+
+    def get_all_values(self) -> List[List[str]]:
+        rows = [_rstrip([_to_text(v) for v in row]) for row in self.grid]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        self.cells_read += len(HEADER) * len(self.grid)
+        return [
+            dict(zip(HEADER, (_to_text(value) for value in row)))
+            for row in self.grid[1:]
+            if any(row)
+        ]
+
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        value_ranges = []
+        for cells in ranges:
+            start, end = cells.split(":")
+            first_row, first_col = a1_to_rowcol(start)
+            last_row, last_col = a1_to_rowcol(end)
+
+            # Like the Sheets API, leave out the empty cells at the end
+            grid_rows = slice(first_row - 1, last_row)
+            columns = slice(first_col - 1, last_col)
+            rows = [[_to_text(v) for v in row[columns]] for row in self.grid[grid_rows]]
+            rows = [_rstrip(row) for row in rows]
+            while rows and not rows[-1]:
+                rows.pop()
+
+            self.cells_read += sum(len(row) for row in rows)
+            value_ranges.append(rows)
+
+        return value_ranges
+
+
+class FakeSpreadsheet:
+    """Local spreadsheet which counts the requests and the cells written."""
+
+    id = "sheet-id"
+
+    def __init__(self, rows: List[List[Any]]) -> None:
+        self._worksheets = [FakeWorksheet(rows)]
+        self.requests = 0
+        self.cells_written = 0
+
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        return self._worksheets[0]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        assert all(worksheet.title != title for worksheet in self._worksheets)
+        worksheet = FakeWorksheet([])
+        worksheet.title = title
+        worksheet.grid = [[""] * cols for _ in range(rows)]
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def del_worksheet(self, worksheet: FakeWorksheet) -> None:
+        self._worksheets.remove(worksheet)
+
+    def values_batch_update(self, params=None, body=None):
+        self.requests += 1
+        for data in body["data"]:
+            title, cells = data["range"].split("!")
+            worksheet = self.worksheet(title.strip("'"))
+            start, end = cells.split(":")
+            first_row, first_col = a1_to_rowcol(start)
+            last_row, last_col = a1_to_rowcol(end)
+            assert len(data["values"]) == last_row - first_row + 1
+
+            for row_number, values in enumerate(data["values"], start=first_row):
+                assert len(values) == last_col - first_col + 1
+                row = worksheet.grid[row_number - 1]
+                row[slice(first_col - 1, last_col)] = values
+                self.cells_written += len(values)
+
+
+HEADER = (
+    "ID",
+    "Last filename",
+    "Last dir",
+    "Filename and metadata dates do match",
+    "has GPhotos timestamp",
+    "uploaded",
+    "albumId",
+    "albumName",
+)
+
+
+def _to_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return value
+
+
+def _rstrip(row: List[str]) -> List[str]:
+    while row and row[-1] == "":
+        row = row[:-1]
+    return row
+
+
+def file_report(
+    i: int, dates_match: bool = True, directory: str = "photos"
+) -> FileReport:
+    return FileReport(
+        path=Path(f"{directory}/IMG_{i:06}.jpg"),
+        dates_match=dates_match,
+        has_ghotos_timestamp=False,
+        uploaded=False,
+    )
+
+
+def sheet_of(reports: List[FileReport]) -> FakeSpreadsheet:
+    return FakeSpreadsheet([r.to_gsheet_row().to_gsheet() for r in reports])
+
+
+def test_merge_changes_only_keeps_new_and_modified_rows():
+    sh = sheet_of([file_report(i) for i in range(5)])
+
+    report = [
+        file_report(1),  # unchanged
+        file_report(3, dates_match=False),
+        file_report(7),
+        file_report(6),
+        file_report(7, dates_match=False),
+    ]
+
+    changes = merge_changes(fetch_sheet_index(sh), report)
+
+    assert changes.modified == {5: file_report(3, dates_match=False).to_gsheet_row()}
+    assert changes.inserted == {
+        7: file_report(7, dates_match=False).to_gsheet_row(),
+        8: file_report(6).to_gsheet_row(),
+    }
+
+
+def test_merge_changes_of_row_changed_back():
+    sh = sheet_of([file_report(0)])
+
+    report = [file_report(0, dates_match=False), file_report(0)]
+
+    assert merge_changes(fetch_sheet_index(sh), report) == SheetChanges()
+
+
+def test_upload_changes_only_writes_changed_rows():
+    sh = sheet_of([file_report(i) for i in range(1000)])
+    gsheet = fetch_worksheet(sh)
+
+    report = [file_report(i) for i in range(1000)]
+    report[500] = file_report(500, dates_match=False)
+    report.append(file_report(1000))
+
+    requests = upload_changes(sh, merge_changes(fetch_sheet_index(sh), report))
+
+    assert requests == 1
+    assert sh.cells_written == 2 * len(HEADER)
+    assert fetch_worksheet(sh) == merge(gsheet, report)
+
+
+def test_upload_changes_coalesces_consecutive_rows():
+    sh = sheet_of([file_report(i) for i in range(10)])
+    changes = SheetChanges(
+        modified={n: file_report(n).to_gsheet_row() for n in (2, 3, 4, 8)}
+    )
+    sh.values_batch_update = MagicMock()  # type: ignore
+
+    upload_changes(sh, changes)
+
+    (body,) = [c.kwargs["body"] for c in sh.values_batch_update.call_args_list]
+    assert [data["range"] for data in body["data"]] == [
+        "'Sheet1'!A2:H4",
+        "'Sheet1'!A8:H8",
+    ]
+
+
+def test_upload_changes_in_batches():
+    sh = sheet_of([file_report(i) for i in range(10)])
+    report = [file_report(i, dates_match=False) for i in range(10)]
+
+    requests = upload_changes(sh, merge_changes(fetch_sheet_index(sh), report), 4)
+
+    assert requests == 3
+    assert sh.cells_written == 10 * len(HEADER)
+    assert fetch_worksheet(sh) == merge({}, report)
+
+
+def test_upload_without_changes():
+    sh = sheet_of([file_report(i) for i in range(3)])
+
+    assert upload_changes(sh, SheetChanges()) == 0
+    assert sh.requests == 0
+
+
+def test_apply_changes_keeps_sheet_order():
+    sh = sheet_of([file_report(i) for i in range(3)])
+    index = fetch_sheet_index(sh)
+    report = [file_report(4), file_report(1, dates_match=False), file_report(3)]
+
+    changes = merge_changes(index, report)
+    upload_changes(sh, changes)
+
+    assert apply_changes(index, changes) == fetch_sheet_index(sh)
+
+
+@pytest.mark.parametrize("page_rows", [1, 2, 3, 10])
+def test_fetch_sheet_index_in_pages(page_rows):
+    reports = [file_report(i) for i in range(5)]
+    reports[2] = file_report(2, dates_match=False)
+    sh = sheet_of(reports)
+
+    index = fetch_sheet_index(sh, page_rows=page_rows)
+
+    assert index == SheetIndex.from_gsheet(fetch_worksheet(sh))
+    assert index.positions == {r.id: i for i, r in enumerate(reports)}
+
+
+def test_fetch_sheet_index_only_reads_id_and_hashed_columns():
+    sh = sheet_of([file_report(i) for i in range(5)])
+    sh.sheet1.grid[3][6:] = ["album-id", "Holidays"]
+
+    index = fetch_sheet_index(sh)
+
+    # IDs, three flags per row, and the album of a single row
+    assert sh.sheet1.cells_read == 5 + 5 * 3 + 2
+    assert index == SheetIndex.from_gsheet(fetch_worksheet(sh))
+
+
+def test_fetch_sheet_index_keeps_position_of_rows_without_id():
+    sh = sheet_of([file_report(i) for i in range(3)])
+    sh.sheet1.grid[2][0] = ""
+
+    index = fetch_sheet_index(sh)
+
+    assert len(index) == 3
+    assert index.positions == {file_report(0).id: 0, file_report(2).id: 2}
+
+
+def test_upload_changes_in_batches_of_bounded_size():
+    sh = sheet_of([file_report(i) for i in range(10)])
+    report = [file_report(i, dates_match=False) for i in range(10)]
+    changes = merge_changes(fetch_sheet_index(sh), report)
+    row_size = len(json.dumps(changes.modified[2].to_gsheet()))
+
+    requests = upload_changes(sh, changes, batch_bytes=3 * row_size)
+
+    assert requests == 4
+    assert fetch_worksheet(sh) == merge({}, report)
+
+
+@pytest.mark.parametrize("page_rows", [1, 2, 3])
+def test_fetch_sheet_index_past_pages_ending_in_empty_rows(page_rows):
+    reports = [file_report(i) for i in range(6)]
+    sh = sheet_of(reports)
+    for row in sh.sheet1.grid[3:5]:
+        row[:] = [""] * len(HEADER)
+    sh.sheet1.add_rows(3)
+
+    index = fetch_sheet_index(sh, page_rows=page_rows)
+
+    assert len(index) == 6
+    assert index.positions == {reports[i].id: i for i in (0, 1, 4, 5)}
@@ -0,0 +1,15 @@
+import pytest
+
+from gpy.iterables import chunked
+
+
+@pytest.mark.parametrize(
+    ("items", "size", "expected_result"),
+    [
+        pytest.param([], 2, [], id="empty"),
+        pytest.param([1, 2, 3, 4], 2, [[1, 2], [3, 4]], id="exact_chunks"),
+        pytest.param([1, 2, 3], 2, [[1, 2], [3]], id="last_chunk_is_shorter"),
+    ],
+)
+def test_chunked(items, size, expected_result):
+    assert list(chunked(iter(items), size)) == expected_result
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+from gpy.journal import (
+    FAILED,
+    SCANNED,
+    WRITTEN,
+    Journal,
+    JournalEntry,
+    journal_path,
+    read_journal,
+)
+from gpy.types import Report
+
+
+def test_entries_are_flushed_in_batches(tmp_path):
+    path = tmp_path / "journals" / "scan-date.jsonl"
+    entries = [
+        JournalEntry(path=Path(f"{i}.jpg"), outcome=SCANNED, report=Report(Path("a")))
+        for i in range(3)
+    ]
+
+    with Journal(path, flush_every=2) as journal:
+        for entry in entries:
+            journal.record(entry)
+            if entry is entries[1]:
+                assert list(read_journal(path)) == entries[:2]
+
+        assert list(read_journal(path)) == entries[:2]
+
+    assert list(read_journal(path)) == entries
+
+
+def test_resume_skips_done_files_but_failed_ones(tmp_path):
+    path = tmp_path / "meta-date.jsonl"
+    with Journal(path) as journal:
+        journal.record(JournalEntry(path=Path("a.jpg"), outcome=WRITTEN))
+        journal.record(JournalEntry(path=Path("b.jpg"), outcome=FAILED))
+    # Line cut short by a crash
+    with path.open("a") as f:
+        f.write('{"path": "c.jpg", "outc')
+
+    with Journal(path, resume=True) as journal:
+        assert journal.is_done(Path("a.jpg"))
+        assert journal.is_done(Path("a.jpg").absolute())
+        assert not journal.is_done(Path("b.jpg"))
+        assert not journal.is_done(Path("c.jpg"))
+
+
+def test_journal_is_discarded_unless_resuming(tmp_path):
+    path = tmp_path / "meta-date.jsonl"
+    with Journal(path) as journal:
+        journal.record(JournalEntry(path=Path("a.jpg"), outcome=WRITTEN))
+
+    with Journal(path) as journal:
+        assert not journal.is_done(Path("a.jpg"))
+
+    assert list(read_journal(path)) == []
+
+    journal.remove()
+
+    assert not path.exists()
+
+
+def test_journal_path_depends_on_absolute_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert journal_path("scan-date", Path("photos")) == journal_path(
+        "scan-date", tmp_path / "photos"
+    )
+    assert journal_path("scan-date", Path("photos")) != journal_path(
+        "meta-date", Path("photos")
+    )
+
+
+def test_resume_after_line_cut_short_keeps_new_entries(tmp_path):
+    path = tmp_path / "meta-date.jsonl"
+    with Journal(path) as journal:
+        journal.record(JournalEntry(path=Path("a.jpg"), outcome=WRITTEN))
+    with path.open("a") as f:
+        f.write('{"path": "b.jpg", "outc')
+
+    with Journal(path, resume=True) as journal:
+        journal.record(JournalEntry(path=Path("c.jpg"), outcome=WRITTEN))
+
+    assert [entry.path for entry in read_journal(path)] == [
+        Path("a.jpg"),
+        Path("c.jpg"),
+    ]
+
+
+def test_read_journal_skips_entries_of_wrong_shape(tmp_path):
+    path = tmp_path / "meta-date.jsonl"
+    path.write_text('{"path": 5}\n[1]\n5\n{"path": "a.jpg", "outcome": "written"}\n')
+
+    assert list(read_journal(path)) == [
+        JournalEntry(path=Path("a.jpg"), outcome=WRITTEN)
+    ]
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from gpy.pipeline import Pipeline
+
+
+def test_pipeline_runs_items_through_stages_in_order():
+    def slow_double(i: int) -> int:
+        time.sleep(0.002 * (10 - i))  # first items finish last
+        return 2 * i
+
+    pipeline = Pipeline(range(10))
+    pipeline.add_stage("double", slow_double, workers=4)
+    pipeline.add_stage("increment", lambda i: i + 1, workers=2)
+
+    assert list(pipeline) == [2 * i + 1 for i in range(10)]
+
+
+def test_pipeline_of_empty_source():
+    pipeline = Pipeline([])
+    pipeline.add_stage("identity", lambda i: i)
+
+    assert list(pipeline) == []
+
+
+def test_pipeline_bounds_items_in_flight():
+    consumed = []
+
+    def items():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    pipeline = Pipeline(items(), queue_size=2)
+    pipeline.add_stage("identity", lambda i: i, workers=1)
+
+    with pipeline:
+        results = iter(pipeline)
+        assert next(results) == 0
+        time.sleep(0.1)
+
+        # Queued, being processed, waiting to be yielded, and the first one
+        assert len(consumed) <= 2 + 1 + 1 + 1
+        assert max(s.max_queue_depth for s in pipeline.stats()) <= 2
+
+
+def test_pipeline_applies_backpressure_to_the_source():
+    release = threading.Event()
+    consumed = []
+
+    def items():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    def blocked(i: int) -> int:
+        release.wait()
+        return i
+
+    pipeline = Pipeline(items(), queue_size=3)
+    pipeline.add_stage("blocked", blocked, workers=2)
+
+    with pipeline:
+        results = iter(pipeline)
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        assert next(results) == 0
+        timer.join()
+
+        stats = pipeline.stats()[0]
+        assert len(consumed) < 100
+        assert stats.max_queue_depth == 3
+
+
+def test_pipeline_raises_stage_errors():
+    def fail_on_three(i: int) -> int:
+        if i == 3:
+            raise ValueError("three")
+        return i
+
+    pipeline = Pipeline(range(100))
+    pipeline.add_stage("fail", fail_on_three, workers=2)
+
+    results = []
+    with pytest.raises(ValueError, match="three"):
+        for result in pipeline:
+            results.append(result)
+
+    assert results == list(range(len(results)))
+    assert len(results) <= 3
+
+
+def test_pipeline_raises_source_errors():
+    def items():
+        yield 1
+        raise ValueError("source")
+
+    pipeline = Pipeline(items())
+    pipeline.add_stage("identity", lambda i: i)
+
+    with pytest.raises(ValueError, match="source"):
+        list(pipeline)
+
+
+def test_pipeline_closes_the_source_when_stopped_early():
+    closed = threading.Event()
+
+    def items():
+        try:
+            yield from range(100)
+        finally:
+            closed.set()
+
+    pipeline = Pipeline(items())
+    pipeline.add_stage("identity", lambda i: i)
+
+    with pipeline:
+        assert next(iter(pipeline)) == 0
+
+    assert closed.is_set()
+
+
+def test_pipeline_stats():
+    pipeline = Pipeline(range(5))
+    pipeline.add_stage("first", lambda i: i, workers=2)
+    pipeline.add_stage("second", lambda i: i, queue_size=3)
+
+    list(pipeline)
+
+    first, second = pipeline.stats()
+    assert (first.name, first.workers, first.items, first.queue_size) == (
+        "first",
+        2,
+        5,
+        4,
+    )
+    assert (second.name, second.workers, second.items, second.queue_size) == (
+        "second",
+        1,
+        5,
+        3,
+    )
+    assert first.queue_depth == second.queue_depth == 0
+    assert first.throughput > 0
+    assert "first: 5 items" in first.format()
+
+
+def test_pipeline_needs_a_stage():
+    with pytest.raises(RuntimeError):
+        list(Pipeline(range(5)))
+
+
+def test_pipeline_stage_needs_a_worker():
+    with pytest.raises(ValueError):
+        Pipeline(range(5)).add_stage("identity", lambda i: i, workers=0)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from gpy.plan import (
+    PlanEntry,
+    progress_path,
+    read_plan,
+    read_progress,
+    write_plan,
+    write_progress,
+)
+
+CET = timezone(timedelta(hours=1))
+
+
+def test_write_and_read_plan(tmp_path):
+    plan_path = tmp_path / "plan.jsonl"
+    entries = [
+        PlanEntry(path=Path(f"IMG_{i}.jpg"), ts=datetime(2019, 2, 2, i, tzinfo=CET))
+        for i in range(3)
+    ]
+
+    assert write_plan(plan_path, entries) == 3
+    assert plan_path.read_text().splitlines()[0] == (
+        '{"path": "IMG_0.jpg", "ts": "2019-02-02T00:00:00+01:00"}'
+    )
+    assert list(read_plan(plan_path)) == entries
+    assert list(read_plan(plan_path, start=2)) == entries[2:]
+
+
+def test_progress(tmp_path):
+    plan_path = tmp_path / "plan.jsonl"
+    write_plan(plan_path, [])
+
+    assert read_progress(plan_path) == 0
+
+    write_progress(plan_path, 500)
+    write_progress(plan_path, 1000)
+
+    assert read_progress(plan_path) == 1000
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "plan.jsonl",
+        "plan.jsonl.progress",
+    ]
+
+
+def test_write_plan_discards_previous_progress(tmp_path):
+    plan_path = tmp_path / "plan.jsonl"
+    write_progress(plan_path, 500)
+
+    write_plan(plan_path, [])
+
+    assert not progress_path(plan_path).exists()
+    assert read_progress(plan_path) == 0
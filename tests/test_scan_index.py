@@ -0,0 +1,63 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from gpy.exiftool.client import DatesTriple
+from gpy.scan_index import Fingerprint, ScanIndex
+
+CET = datetime.timezone(datetime.timedelta(hours=1))
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> ScanIndex:
+    return ScanIndex(tmp_path / "cache" / "index.sqlite3")
+
+
+def test_lookup_returns_stored_dates_if_file_did_not_change(index):
+    path = Path("foo/bar.jpg")
+    fingerprint = Fingerprint(inode=1, size=2, mtime_ns=3)
+    dates = DatesTriple(
+        metadata_date=datetime.datetime(2019, 2, 2, 18, 44, 43),
+        google_date=datetime.datetime(2019, 2, 2, 18, 44, 42, 1000, tzinfo=CET),
+    )
+
+    index.store_many([(path, fingerprint, dates)])
+
+    assert index.lookup_many({path: fingerprint}) == {path: dates}
+    assert (index.hits, index.misses) == (1, 0)
+
+
+@pytest.mark.parametrize(
+    ("fingerprint"),
+    [
+        pytest.param(Fingerprint(inode=9, size=2, mtime_ns=3), id="new_inode"),
+        pytest.param(Fingerprint(inode=1, size=9, mtime_ns=3), id="new_size"),
+        pytest.param(Fingerprint(inode=1, size=2, mtime_ns=9), id="new_mtime"),
+    ],
+)
+def test_lookup_misses_if_file_changed(index, fingerprint):
+    path = Path("foo/bar.jpg")
+    index.store_many([(path, Fingerprint(inode=1, size=2, mtime_ns=3), DatesTriple())])
+
+    assert index.lookup_many({path: fingerprint}) == {}
+    assert (index.hits, index.misses) == (0, 1)
+
+
+def test_store_skips_files_that_failed_to_be_read(index):
+    path = Path("foo/bar.jpg")
+    fingerprint = Fingerprint(inode=1, size=2, mtime_ns=3)
+
+    index.store_many([(path, fingerprint, DatesTriple(error="File format error"))])
+
+    assert index.lookup_many({path: fingerprint}) == {}
+
+
+def test_clear(index):
+    path = Path("foo/bar.jpg")
+    fingerprint = Fingerprint(inode=1, size=2, mtime_ns=3)
+    index.store_many([(path, fingerprint, DatesTriple())])
+
+    index.clear()
+
+    assert index.lookup_many({path: fingerprint}) == {}
@@ -0,0 +1,154 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from gpy import config
+from gpy.google_sheet import Album, GSheetRow, SheetIndex
+from gpy.sheet_cache import (
+    CachedSheet,
+    fetch_cached_index,
+    fetch_version,
+    read_cache,
+    shard_cache_path,
+    update_cache,
+    update_shard_caches,
+    write_cache,
+)
+
+INDEX = SheetIndex.from_gsheet(
+    {
+        row.id: row
+        for row in (
+            GSheetRow(
+                id="foo/b.jpg",
+                last_filename="b.jpg",
+                last_dir="foo",
+                dates_match=True,
+                has_ghotos_timestamp=False,
+                uploaded=False,
+            ),
+            GSheetRow(
+                id="foo/a.jpg",
+                last_filename="a.jpg",
+                last_dir="foo",
+                dates_match=False,
+                has_ghotos_timestamp=True,
+                uploaded=True,
+                album=Album(id="1", name="Holidays"),
+            ),
+        )
+    }
+)
+
+
+@pytest.fixture
+def spreadsheet():
+    sh = MagicMock()
+    sh.id = "sheet-id"
+    sh.client.request.return_value.json.return_value = {"version": "7"}
+    return sh
+
+
+@pytest.fixture
+def fetch_sheet_index_mocked(mocker):
+    return mocker.patch("gpy.sheet_cache.fetch_sheet_index", return_value=INDEX)
+
+
+def test_cache_round_trip_keeps_row_positions(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    index = SheetIndex()
+    index.append("foo/b.jpg", 1)
+    index.append("", 2)  # row without ID
+    index.append("foo/a.jpg", -3)
+
+    write_cache(path, CachedSheet(version="7", index=index))
+
+    assert read_cache(path) == CachedSheet(version="7", index=index)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        pytest.param(None, id="missing"),
+        pytest.param("", id="empty"),
+        pytest.param('{"version": "7"}\n["foo/a.jpg", 1', id="truncated"),
+        pytest.param('{"version": "7"}\n{"id": "foo/a.jpg"}\n', id="old_format"),
+        pytest.param('["foo/a.jpg", 1]\n', id="no_version"),
+    ],
+)
+def test_read_cache_ignores(tmp_path, content):
+    path = tmp_path / "cache.jsonl"
+    if content is not None:
+        path.write_text(content)
+
+    assert read_cache(path) is None
+
+
+def test_fetch_version(spreadsheet):
+    assert fetch_version(spreadsheet) == "7"
+
+    spreadsheet.client.request.assert_called_once_with(
+        "get",
+        "https://www.googleapis.com/drive/v3/files/sheet-id",
+        params={"fields": "version", "supportsAllDrives": True},
+    )
+
+
+def test_fetch_cached_index_reuses_rows_of_same_version(
+    tmp_path, spreadsheet, fetch_sheet_index_mocked
+):
+    path = tmp_path / "cache.jsonl"
+
+    first = fetch_cached_index(spreadsheet, path)
+    second = fetch_cached_index(spreadsheet, path)
+
+    assert first == second == INDEX
+    assert fetch_sheet_index_mocked.call_count == 1
+
+
+def test_fetch_cached_index_fetches_rows_of_new_version(
+    tmp_path, spreadsheet, fetch_sheet_index_mocked
+):
+    path = tmp_path / "cache.jsonl"
+    write_cache(path, CachedSheet(version="6", index=SheetIndex()))
+
+    assert fetch_cached_index(spreadsheet, path) == INDEX
+    assert fetch_sheet_index_mocked.call_count == 1
+    assert read_cache(path) == CachedSheet(version="7", index=INDEX)
+
+
+def test_fetch_cached_index_refresh(tmp_path, spreadsheet, fetch_sheet_index_mocked):
+    path = tmp_path / "cache.jsonl"
+    write_cache(path, CachedSheet(version="7", index=SheetIndex()))
+
+    assert fetch_cached_index(spreadsheet, path, refresh=True) == INDEX
+    assert fetch_sheet_index_mocked.call_count == 1
+
+
+def test_update_cache_stores_version_after_upload(tmp_path, spreadsheet):
+    path = tmp_path / "cache.jsonl"
+    spreadsheet.client.request.return_value.json.return_value = {"version": "8"}
+
+    update_cache(spreadsheet, path, INDEX)
+
+    assert read_cache(path) == CachedSheet(version="8", index=INDEX)
+
+
+def test_update_shard_caches_keeps_shards_of_previous_version(
+    tmp_path, mocker, spreadsheet
+):
+    mocker.patch.object(config, "SHEET_CACHE_DIR", tmp_path)
+    for title, version in (("Shard 1", "7"), ("Shard 2", "7"), ("Shard 3", "6")):
+        path = shard_cache_path(spreadsheet.id, title)
+        write_cache(path, CachedSheet(version=version, index=SheetIndex()))
+    spreadsheet.client.request.return_value.json.return_value = {"version": "8"}
+
+    update_shard_caches(spreadsheet, {"Shard 1": INDEX}, version="7")
+
+    assert read_cache(shard_cache_path(spreadsheet.id, "Shard 1")) == CachedSheet(
+        version="8", index=INDEX
+    )
+    assert read_cache(shard_cache_path(spreadsheet.id, "Shard 2")) == CachedSheet(
+        version="8", index=SheetIndex()
+    )
+    assert not shard_cache_path(spreadsheet.id, "Shard 3").exists()
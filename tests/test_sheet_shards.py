@@ -0,0 +1,151 @@
+import pytest
+
+from gpy.google_sheet import HEADER
+from gpy.sheet_shards import (
+    INDEX_TITLE,
+    ShardLayout,
+    ShardLayoutError,
+    fetch_all_rows,
+    fetch_layout,
+    plan_shards,
+    reshard,
+)
+from tests.test_google_sheet import file_report, sheet_of
+
+REPORTS = [
+    file_report(i, directory=directory)
+    for directory, count in (("/photos/a", 3), ("/photos/b", 1), ("/photos/c", 4))
+    for i in range(count)
+]
+
+
+@pytest.fixture
+def sh():
+    return sheet_of(REPORTS)
+
+
+LAYOUT = ShardLayout(
+    first_directories=("/photos/b", "/photos/d"), titles=("Shard 1", "Shard 2")
+)
+
+
+@pytest.mark.parametrize(
+    "directory, shard",
+    [
+        ("/photos/a", "Shard 1"),  # before the first directory
+        ("/photos/b", "Shard 1"),
+        ("/photos/b/2020", "Shard 1"),
+        ("/photos/c", "Shard 1"),
+        ("/photos/d", "Shard 2"),
+        ("/videos", "Shard 2"),
+    ],
+)
+def test_shard_of(directory, shard):
+    assert LAYOUT.shard_of(directory) == shard
+
+
+def test_split_keeps_report_order():
+    report = [file_report(1, directory="/photos/d"), REPORTS[5], REPORTS[0]]
+
+    assert LAYOUT.split(report) == {
+        "Shard 2": [report[0]],
+        "Shard 1": [REPORTS[5], REPORTS[0]],
+    }
+
+
+def test_layout_first_directories_must_be_sorted():
+    with pytest.raises(ValueError):
+        ShardLayout(first_directories=("b", "a"), titles=("Shard 1", "Shard 2"))
+
+
+@pytest.mark.parametrize(
+    "shard_rows, shards",
+    [
+        (1, [["a"], ["b"], ["c"]]),
+        (4, [["a", "b"], ["c"]]),
+        (5, [["a", "b"], ["c"]]),
+        (8, [["a", "b", "c"]]),
+    ],
+)
+def test_plan_shards(shard_rows, shards):
+    assert plan_shards({"c": 4, "a": 3, "b": 1}, shard_rows) == shards
+
+
+def test_plan_shards_of_empty_sheet():
+    assert plan_shards({}) == [[]]
+
+
+def test_fetch_layout_of_unsharded_sheet(sh):
+    assert fetch_layout(sh) is None
+
+
+def test_reshard_unsharded_sheet(sh):
+    gsheet = fetch_all_rows(sh, None)
+
+    layout, shards = reshard(sh, shard_rows=4)
+
+    assert layout == ShardLayout(
+        first_directories=("/photos/a", "/photos/c"), titles=("Shard 1", "Shard 2")
+    )
+    assert fetch_layout(sh) == layout
+    assert [w.title for w in sh.worksheets()] == ["Shard 1", "Shard 2", INDEX_TITLE]
+    assert fetch_all_rows(sh, layout) == gsheet
+    assert [len(rows) for rows in shards.values()] == [4, 4]
+
+    shard = sh.worksheet("Shard 1")
+    assert shard.grid[0] == list(HEADER)
+    assert (shard.row_count, len(shard.grid[0])) == (5, len(HEADER))
+
+
+def test_reshard_sharded_sheet(sh):
+    gsheet = fetch_all_rows(sh, None)
+    reshard(sh, shard_rows=8)
+
+    layout, _ = reshard(sh, shard_rows=1)
+
+    assert layout.titles == ("Shard 2", "Shard 3", "Shard 4")
+    assert fetch_layout(sh) == layout
+    assert {w.title for w in sh.worksheets()} == {INDEX_TITLE, *layout.titles}
+    assert fetch_all_rows(sh, layout) == gsheet
+
+    # Back to a single shard, which leaves blank rows at the end of the index
+    layout, _ = reshard(sh, shard_rows=8)
+    assert fetch_layout(sh) == layout
+    assert len(layout.titles) == 1
+    assert fetch_all_rows(sh, layout) == gsheet
+
+
+def test_reshard_skips_missing_shards(sh):
+    reshard(sh, shard_rows=4)
+    sh.del_worksheet(sh.worksheet("Shard 1"))
+
+    layout, _ = reshard(sh, shard_rows=8)
+
+    assert fetch_all_rows(sh, layout) == {
+        report.id: report.to_gsheet_row() for report in REPORTS[4:]
+    }
+
+
+def test_fetch_layout_of_empty_index(sh):
+    reshard(sh, shard_rows=4)
+    index = sh.worksheet(INDEX_TITLE)
+    index.grid = index.grid[:1]
+
+    with pytest.raises(ShardLayoutError, match="lists no shards"):
+        fetch_layout(sh)
+    with pytest.raises(ShardLayoutError, match="lists no shards"):
+        reshard(sh, shard_rows=4)
+
+
+def test_fetch_layout_of_index_out_of_order(sh):
+    gsheet = fetch_all_rows(sh, None)
+    reshard(sh, shard_rows=4)
+    grid = sh.worksheet(INDEX_TITLE).grid
+    grid[1], grid[2] = grid[2], grid[1]
+
+    with pytest.raises(ShardLayoutError, match="sorted.*gpy reshard_sheet"):
+        fetch_layout(sh)
+
+    layout, _ = reshard(sh, shard_rows=4)
+    assert fetch_layout(sh) == layout
+    assert fetch_all_rows(sh, layout) == gsheet
@@ -0,0 +1,288 @@
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+from gspread.models import Spreadsheet
+
+from gpy.google_sheet import GSheetRow, SheetChanges, upload_changes
+from gpy.sheets_client import (
+    RateLimitedClient,
+    RetryPolicy,
+    TokenBucket,
+    is_idempotent,
+)
+
+SHEETS_API_URL = "https://sheets.googleapis.com"
+
+
+class FakeSheetsAPI(ThreadingHTTPServer):
+    """Local Sheets API endpoint which answers with the queued failures first.
+
+    Each failure is a (status code, headers) pair. Once there are none left,
+    requests succeed with an empty JSON object.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeSheetsHandler)
+        self.failures: List[Tuple[int, Dict[str, str]]] = []
+        self.requests: List[Tuple[str, str, Any]] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        port = self.server_address[1]
+        return f"http://127.0.0.1:{port}"
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    server: FakeSheetsAPI
+
+    def do_GET(self) -> None:
+        self._respond()
+
+    def do_POST(self) -> None:
+        self._respond()
+
+    def _respond(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, body))
+            failure = self.server.failures.pop(0) if self.server.failures else None
+
+        status, headers = failure or (200, {})
+        payload = {"error": {"code": status}} if failure else {}
+        data = json.dumps(payload).encode()
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class LocalSession(requests.Session):
+    """Session which sends the Sheets API requests to a local endpoint."""
+
+    def __init__(self, url: str) -> None:
+        super().__init__()
+        self.url = url
+
+    def request(self, method, url, *args, **kwargs):
+        url = url.replace(SHEETS_API_URL, self.url)
+        return super().request(method, url, *args, **kwargs)
+
+
+@pytest.fixture
+def sheets_api() -> Iterator[FakeSheetsAPI]:
+    server = FakeSheetsAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def client_for(sheets_api, clock, **kwargs):
+    bucket = TokenBucket(rate=1, capacity=100, clock=clock, sleep=clock.sleep)
+    return RateLimitedClient(
+        None,
+        session=LocalSession(sheets_api.url),
+        bucket=bucket,
+        sleep=clock.sleep,
+        rng=random.Random(0),
+        **kwargs,
+    )
+
+
+def test_token_bucket_allows_bursts_then_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits == [0, 0, 0, 0.5, 0.5]
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+
+    clock.now += 10
+
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 1]
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 5, 10])
+def test_retry_policy_delay_is_jittered_and_capped(attempt):
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    rng = random.Random(0)
+
+    delays = [policy.delay(attempt, rng) for _ in range(100)]
+
+    assert all(0 <= d <= min(8, 2**attempt) for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_client_retries_throttled_requests(sheets_api):
+    clock = FakeClock()
+    sheets_api.failures = [(429, {}), (503, {})]
+    client = client_for(sheets_api, clock, retry=RetryPolicy(base_delay=2))
+
+    response = client.request("get", f"{SHEETS_API_URL}/v4/spreadsheets/id")
+
+    assert response.json() == {}
+    assert len(sheets_api.requests) == 3
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 2
+    assert 0 <= clock.sleeps[1] <= 4
+
+
+def test_client_waits_as_told_by_retry_after(sheets_api):
+    clock = FakeClock()
+    sheets_api.failures = [(429, {"Retry-After": "7"})]
+    client = client_for(sheets_api, clock)
+
+    client.request("get", f"{SHEETS_API_URL}/v4/spreadsheets/id")
+
+    assert clock.sleeps == [7]
+
+
+def test_client_gives_up_after_retries(sheets_api):
+    clock = FakeClock()
+    sheets_api.failures = [(500, {})] * 4
+    client = client_for(sheets_api, clock, retry=RetryPolicy(retries=2))
+
+    with pytest.raises(APIError):
+        client.request("get", f"{SHEETS_API_URL}/v4/spreadsheets/id")
+
+    assert len(sheets_api.requests) == 3
+
+
+def test_client_does_not_retry_client_errors(sheets_api):
+    clock = FakeClock()
+    sheets_api.failures = [(400, {})]
+    client = client_for(sheets_api, clock)
+
+    with pytest.raises(APIError):
+        client.request("get", f"{SHEETS_API_URL}/v4/spreadsheets/id")
+
+    assert len(sheets_api.requests) == 1
+    assert clock.sleeps == []
+
+
+def test_client_limits_request_rate(sheets_api):
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=2, clock=clock, sleep=clock.sleep)
+    client = RateLimitedClient(
+        None, session=LocalSession(sheets_api.url), bucket=bucket, sleep=clock.sleep
+    )
+
+    for _ in range(4):
+        client.request("get", f"{SHEETS_API_URL}/v4/spreadsheets/id")
+
+    assert clock.sleeps == [2, 2]
+
+
+def test_upload_changes_through_throttled_client(sheets_api, mocker):
+    clock = FakeClock()
+    sheets_api.failures = [(429, {}), (429, {})]
+    client = client_for(sheets_api, clock)
+    sh = Spreadsheet(client, {"id": "sheet-id", "title": "Photo backup tracker"})
+    worksheet = mocker.patch.object(Spreadsheet, "sheet1")
+    worksheet.title = "Sheet1"
+    worksheet.row_count = 1000
+
+    rows = {
+        n: GSheetRow(
+            id=f"photos/IMG_{n:06}.jpg",
+            last_filename=f"IMG_{n:06}.jpg",
+            last_dir="photos",
+            dates_match=True,
+            has_ghotos_timestamp=False,
+            uploaded=False,
+        )
+        for n in range(2, 102)
+    }
+
+    requests = upload_changes(sh, SheetChanges(modified=rows), batch_bytes=2000)
+
+    posts = [r for r in sheets_api.requests if r[0] == "POST"]
+    assert len(posts) == requests + 2
+    assert {path for _, path, _ in posts} == {
+        "/v4/spreadsheets/sheet-id/values:batchUpdate"
+    }
+    written = [
+        row
+        for _, _, body in posts[2:]
+        for data in body["data"]
+        for row in data["values"]
+    ]
+    assert written == [row.to_gsheet() for row in rows.values()]
+    assert all(len(json.dumps(body["data"])) < 4000 for _, _, body in posts)
+
+
+@pytest.mark.parametrize(
+    "method, path, idempotent",
+    [
+        ("get", "/v4/spreadsheets/id/values:batchGet", True),
+        ("put", "/v4/spreadsheets/id/values/A1", True),
+        ("post", "/v4/spreadsheets/id/values:batchUpdate", True),
+        ("post", "/v4/spreadsheets/id/values/Sheet1:clear", True),
+        ("post", "/v4/spreadsheets/id:batchUpdate", False),
+        ("post", "/v4/spreadsheets/id/values/Sheet1:append", False),
+        ("delete", "/drive/v3/files/id", False),
+    ],
+)
+def test_is_idempotent(method, path, idempotent):
+    assert is_idempotent(method, f"{SHEETS_API_URL}{path}") is idempotent
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_client_does_not_retry_server_errors_of_non_idempotent_requests(
+    sheets_api, status
+):
+    clock = FakeClock()
+    sheets_api.failures = [(status, {})]
+    client = client_for(sheets_api, clock)
+
+    with pytest.raises(APIError):
+        client.request("post", f"{SHEETS_API_URL}/v4/spreadsheets/id:batchUpdate")
+
+    assert len(sheets_api.requests) == 1
+
+
+def test_client_retries_throttled_non_idempotent_requests(sheets_api):
+    clock = FakeClock()
+    sheets_api.failures = [(429, {})]
+    client = client_for(sheets_api, clock)
+
+    client.request("post", f"{SHEETS_API_URL}/v4/spreadsheets/id:batchUpdate")
+
+    assert len(sheets_api.requests) == 2
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 
-from gpy.types import Report, _compare_dates, structure, unstructure
+from gpy.types import Report, compare_dates, structure, unstructure
 
 
 @pytest.mark.parametrize(
@@ -33,10 +33,28 @@ from gpy.types import Report, _compare_dates, structure, unstructure
             False,
             id="both_dates_are_missing",
         ),
+        pytest.param(
+            datetime.datetime(2019, 1, 1, 8, 50, 24, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2019, 1, 1, 9, 50, 24),
+            True,
+            id="aware_date_is_local_time",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 7, 1, 8, 50, 24, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2019, 7, 1, 10, 50, 24),
+            True,
+            id="aware_date_is_local_summer_time",
+        ),
+        pytest.param(
+            datetime.datetime(2019, 1, 1, 8, 50, 24, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2019, 1, 1, 8, 50, 24),
+            False,
+            id="aware_date_is_not_local_time",
+        ),
     ],
 )
 def test_compare_dates(date_a, date_b, expected_result):
-    actual_result = _compare_dates(date_a, date_b)
+    actual_result = compare_dates(date_a, date_b)
 
     assert actual_result == expected_result
 